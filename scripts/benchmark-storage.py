@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Benchmark loading data.json: json.load() versus the streaming storage.read_data().
+
+Writes synthetic histories with the given numbers of threads, then loads
+each one in a fresh Python process per loader so that peak RSS (ru_maxrss)
+is not skewed by earlier runs. With --damaged the file is also cut in half
+and loaded in salvage mode.
+
+    scripts/benchmark-storage.py                       # 1k, 10k and 100k threads
+    scripts/benchmark-storage.py --threads 5000 --messages 40 --keep /tmp/bench
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORAGE_PY = os.path.join(SCRIPT_DIR, "..", "src", "storage.py")
+
+WORDS = (
+    "안녕하세요 오늘 날씨 파이썬 함수 예제 설명 리눅스 하모니카 설치 방법 "
+    "the quick brown fox jumps over lazy dog error install package update"
+).split()
+
+
+def load_storage():
+    # storage.py는 표준 라이브러리만 쓰므로 GTK 없이 파일에서 바로 불러온다
+    spec = importlib.util.spec_from_file_location("storage", STORAGE_PY)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def generate(path, threads, messages, seed=0):
+    """Write a data.json with threads chats, one chat at a time."""
+    storage = load_storage()
+    rng = random.Random(seed)
+    rest = storage.default_data()
+    rest.pop("chats")
+    head = json.dumps(rest)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(head[:-1] + ', "chats": [')
+        for index in range(threads):
+            chat = storage.new_chat(index + 1, f"New Chat {index + 1}")
+            for turn in range(messages):
+                chat["content"].append({
+                    "role": "User" if turn % 2 == 0 else "Assistant",
+                    "type": storage.MESSAGE_TEXT,
+                    "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 80))),
+                    "time": "2025-01-01 12:00",
+                    "model": "benchmark",
+                })
+            if index:
+                f.write(", ")
+            f.write(json.dumps(chat))
+        f.write("]}")
+
+
+def child(mode, path):
+    """Load path once and print time and peak RSS as JSON (runs in a subprocess)."""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if mode == "json":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        damaged = False
+    else:
+        data, damaged = load_storage().read_data(path)
+    seconds = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "seconds": seconds,
+        "peak_kb": peak,
+        "baseline_kb": before,
+        "chats": len(data.get("chats", [])),
+        "damaged": damaged,
+    }))
+
+
+def measure(mode, path):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def report(label, size, result):
+    print(
+        f"{label:<22} {size / 1e6:9.1f} MB {result['seconds']:8.2f} s"
+        f" {result['peak_kb'] / 1024:9.1f} MB peak"
+        f" {(result['peak_kb'] - result['baseline_kb']) / 1024:9.1f} MB over baseline"
+        f" {result['chats']:>8} chats{' (salvaged)' if result['damaged'] else ''}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--messages", type=int, default=10, help="messages per thread")
+    parser.add_argument("--damaged", action="store_true", help="also load a truncated copy")
+    parser.add_argument("--keep", metavar="DIR", help="write the generated files to DIR and keep them")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.keep or tmp
+        os.makedirs(directory, exist_ok=True)
+        for threads in args.threads:
+            path = os.path.join(directory, f"data-{threads}.json")
+            generate(path, threads, args.messages)
+            size = os.path.getsize(path)
+            print(f"== {threads} threads x {args.messages} messages")
+            report("json.load", size, measure("json", path))
+            report("storage.read_data", size, measure("stream", path))
+
+            if args.damaged:
+                damaged = os.path.join(directory, f"data-{threads}-damaged.json")
+                with open(path, "rb") as src, open(damaged, "wb") as dst:
+                    dst.write(src.read(size // 2))
+                report("read_data (truncated)", size // 2, measure("stream", damaged))
+
+
+if __name__ == "__main__":
+    main()
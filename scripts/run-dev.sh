@@ -133,6 +133,11 @@ if __name__ == '__main__':
     import gi
 
     from gi.repository import Gio
+    # 헤드리스 모드: GTK 창/리소스 없이 공급자만 사용
+    if '--no-gui' in sys.argv[1:]:
+        from hamonikr_chatbot import cli
+        sys.exit(cli.main(VERSION))
+
     gresource_path = os.path.join(pkgdatadir, 'hamonikr-chatbot.gresource')
     if os.path.exists(gresource_path):
         resource = Gio.Resource.load(gresource_path)
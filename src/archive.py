@@ -0,0 +1,190 @@
+"""Cold tier for threads nobody has opened or changed in a while.
+
+An archived chat stays in data.json as a stub: its id, uid, title, star
+and timestamps, an empty "content" and an "archived" entry naming a
+compressed per-thread file under <data dir>/archive. Startup therefore
+parses, and keeps in memory, only the stub. rehydrate() reads the messages
+back when the thread is opened. zstd is used when the zstandard module is
+installed, gzip otherwise; both can always be read back if the module that
+wrote them is available.
+"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+
+from . import blob_store, storage
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+archive_dir = os.path.join(storage.data_dir, "archive")
+
+# 이 기간(일) 동안 바뀌지도 열리지도 않은 스레드를 보관한다 (설정 archive-after-days)
+ARCHIVE_AFTER_DAYS = 30
+
+
+def archive_path(name):
+    return os.path.join(archive_dir, name)
+
+
+def is_archived(chat):
+    return bool(chat.get("archived"))
+
+
+def last_used(chat):
+    """When the chat was last changed or opened (seconds since the epoch)."""
+    return max(chat.get("updated", 0), chat.get("opened", 0))
+
+
+def write_thread(meta, content):
+    """Compress one thread to its archive file; returns the chat's "archived" entry."""
+    uid = storage.chat_uid(meta)
+    raw = json.dumps({"chat": meta, "content": content}).encode("utf-8")
+    if zstandard is not None:
+        name = f"{uid}.json.zst"
+        data = zstandard.ZstdCompressor(level=10).compress(raw)
+    else:
+        name = f"{uid}.json.gz"
+        data = gzip.compress(raw, compresslevel=6)
+    storage.write_atomic(archive_path(name), data)
+    # 이미지 blob 정리 때 압축을 풀지 않고도 참조를 알 수 있게 남긴다
+    blobs = sorted(blob_store.referenced(content))
+    return {"file": name, "messages": len(content), "size": len(data), "blobs": blobs}
+
+
+def read_thread(chat):
+    """Messages of an archived chat; raises OSError or ValueError if the file is unusable."""
+    name = chat["archived"]["file"]
+    with open(archive_path(name), "rb") as f:
+        data = f.read()
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise OSError(f"zstandard is needed to read {name}")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = gzip.decompress(data)
+    return json.loads(raw)["content"]
+
+
+def thread_blobs(chat):
+    """Blob digests an archived chat refers to (older archives are read to find out)."""
+    entry = chat["archived"]
+    if "blobs" in entry:
+        return set(entry["blobs"])
+    return blob_store.referenced(read_thread(chat))
+
+
+def remove_thread(chat):
+    """Delete the archive files of a chat (after it was deleted)."""
+    uid = storage.chat_uid(chat)
+    for name in (f"{uid}.json.zst", f"{uid}.json.gz"):
+        try:
+            os.remove(archive_path(name))
+        except OSError:
+            pass
+
+
+class Archiver:
+    """Moves idle threads to the archive and brings them back.
+
+    Compression runs on a worker thread from a snapshot of each chat; the
+    result is applied with schedule() (GLib.idle_add in the app) on the
+    main thread, and skipped for chats that changed in the meantime.
+    """
+
+    def __init__(self, storage, schedule):
+        self.storage = storage
+        self.schedule = schedule
+        self.running = False
+
+    def candidates(self, days, keep=()):
+        """Unarchived chats with messages, unused for days, whose ids are not in keep."""
+        cutoff = time.time() - days * 86400
+        return [
+            chat for chat in self.storage.data["chats"]
+            if not is_archived(chat)
+            and chat.get("content")
+            and last_used(chat) < cutoff
+            and chat.get("id") not in keep
+            and not storage.is_streaming(chat)
+        ]
+
+    def archive_async(self, days=ARCHIVE_AFTER_DAYS, keep=(), on_done=None):
+        """Archive idle chats in the background; on_done(archived chats) runs on the main thread."""
+        if self.running or days <= 0:
+            return False
+        self.collect()
+        snapshot = []
+        for chat in self.candidates(days, keep):
+            meta = {key: value for key, value in chat.items() if key != "content"}
+            snapshot.append((chat, meta, list(chat["content"])))
+        if not snapshot:
+            return False
+        self.running = True
+
+        def run():
+            results = []
+            for chat, meta, content in snapshot:
+                try:
+                    results.append((chat, meta, content, write_thread(meta, content)))
+                except (OSError, ValueError) as e:
+                    print(f"Failed to archive chat {meta.get('id')}: {e}", file=sys.stderr)
+            self.schedule(self._apply, results, on_done)
+
+        threading.Thread(target=run, name="archive", daemon=True).start()
+        return True
+
+    def _apply(self, results, on_done):
+        present = {id(chat) for chat in self.storage.data["chats"]}
+        archived = []
+        for chat, meta, content, entry in results:
+            # 그사이 삭제되었거나, 바뀌었거나, 열린 채팅은 그대로 둔다
+            if (
+                id(chat) not in present
+                or last_used(chat) != last_used(meta)
+                or len(chat.get("content", [])) != len(content)
+            ):
+                continue
+            chat["content"] = []
+            chat["archived"] = entry
+            self.storage.chat_archived(chat)
+            archived.append(chat)
+        self.running = False
+        if on_done is not None:
+            on_done(archived)
+        return False
+
+    def rehydrate(self, chat):
+        """Load an archived chat's messages back (main thread); False if that failed.
+
+        The archive file is kept: other instances may still have the stub.
+        """
+        if not is_archived(chat):
+            return True
+        try:
+            content = read_thread(chat)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Failed to read archived chat {chat.get('id')}: {e}", file=sys.stderr)
+            return False
+        chat["content"] = content
+        del chat["archived"]
+        chat["opened"] = time.time()
+        self.storage.chat_rehydrated(chat)
+        return True
+
+    def collect(self):
+        """Remove archive files of chats deleted here or by another instance."""
+        deleted = self.storage.data.get("deleted", {})
+        if not deleted or not os.path.isdir(archive_dir):
+            return
+        present = {storage.chat_uid(chat) for chat in self.storage.data["chats"]}
+        for uid in deleted:
+            if uid not in present:  # 삭제 후 다른 인스턴스에서 다시 바뀐 채팅은 남아 있다
+                remove_thread({"uid": uid})
+
@@ -0,0 +1,173 @@
+"""Batch prompt runner used by ``hamonikr-chatbot --no-gui --batch FILE``.
+
+Prompts come one per line, either as plain text or as JSON objects with a
+"prompt" key (plus optional "id", "system", "provider" and "model"). They
+are sent through the provider classes with a bounded number of requests in
+flight, and one JSON result per prompt is written as soon as it finishes.
+"""
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .metrics import StreamMetrics
+
+
+def read_prompts(stream):
+    """Yield prompt dicts from a JSONL or plain text stream, skipping blank lines."""
+    for index, line in enumerate(stream):
+        text = line.strip()
+        if not text:
+            continue
+        item = None
+        if text.startswith("{"):
+            try:
+                item = json.loads(text)
+            except ValueError:
+                item = None
+        if not isinstance(item, dict) or "prompt" not in item:
+            item = {"prompt": text}
+        item.setdefault("index", index)
+        yield item
+
+
+class RateLimiter:
+    """Spaces request starts to at most rate per second across all workers."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BatchRunner:
+    def __init__(self, app, provider=None, model=None, system_prompt=None,
+                 concurrency=4, rate=None):
+        self.app = app
+        self.default_provider = provider or app.current_provider
+        self.default_model = model
+        self.system_prompt = system_prompt
+        self.concurrency = max(1, int(concurrency))
+        self.limiter = RateLimiter(rate)
+
+    def provider_for(self, slug, model):
+        # 공급자는 호출마다 상태(모델, 히스토리, 오류)를 바꾸므로 작업마다 새로 만든다
+        # (연결 풀은 http_session()으로 공유됨)
+        provider = self.app.create_provider(slug, model)
+        if provider is None:
+            raise ValueError(f"Unknown provider: {slug}")
+        return provider
+
+    def run_one(self, item):
+        slug = item.get("provider") or self.default_provider
+        model = item.get("model") or self.default_model
+        system_prompt = item.get("system") or self.system_prompt
+        prompt = str(item["prompt"])
+
+        result = {
+            "index": item["index"],
+            "id": item.get("id"),
+            "provider": slug,
+            "model": model,
+            "prompt": prompt,
+        }
+
+        try:
+            provider = self.provider_for(slug, model)
+        except Exception as e:
+            # 이 작업만 실패로 기록하고 나머지는 계속 실행한다
+            result.update(error=str(e), response=None)
+            return result
+        result["model"] = getattr(provider, "model", model)
+
+        chat = self.app.build_chat(prompt, system_prompt=system_prompt)
+        self.limiter.wait()
+        metrics = StreamMetrics().start()
+        try:
+            response = provider.generate(
+                prompt, chat, callback=metrics.on_chunk, system_prompt=system_prompt
+            )
+            # 공급자는 인증/할당량 오류 등을 답변 문자열로 돌려주므로 last_error로 구분한다
+            error = provider.last_error
+            if error is not None:
+                response = None
+        except Exception as e:
+            response, error = None, str(e)
+        metrics.finish(response)
+
+        if response is not None and not isinstance(response, str):
+            response, error = None, error or "non-text response"
+        stats = metrics.as_dict()
+        if error is not None:
+            # 실패한 호출의 속도/토큰 수는 성능 지표에 섞이지 않게 비운다
+            stats = {key: (value if key == "duration" else None) for key, value in stats.items()}
+        result.update(response=response, error=error, **stats)
+        return result
+
+    def run(self, items, output):
+        """Run every item, writing JSONL results to output. Returns a summary dict."""
+        started = time.monotonic()
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = set()
+            for item in items:
+                # 입력이 매우 커도 메모리에 전부 올리지 않도록 큐 길이를 제한
+                while len(pending) >= self.concurrency * 4:
+                    finished = next(as_completed(pending))
+                    pending.discard(finished)
+                    done, failed = self._write(finished, output, done, failed)
+                pending.add(pool.submit(self.run_one, item))
+            for finished in as_completed(pending):
+                done, failed = self._write(finished, output, done, failed)
+
+        elapsed = time.monotonic() - started
+        return {
+            "prompts": done,
+            "failed": failed,
+            "elapsed": round(elapsed, 3),
+            "prompts_per_second": round(done / elapsed, 3) if elapsed > 0 else None,
+            "concurrency": self.concurrency,
+        }
+
+    @staticmethod
+    def _write(future, output, done, failed):
+        result = future.result()
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        return done + 1, failed + (1 if result.get("error") else 0)
+
+
+def run_batch(app, args):
+    """Entry point for the CLI; returns the process exit code."""
+    source = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+    output = sys.stdout if not args.output else open(args.output, "w", encoding="utf-8")
+    try:
+        runner = BatchRunner(
+            app,
+            provider=args.provider,
+            model=args.model,
+            system_prompt=args.system,
+            concurrency=args.concurrency,
+            rate=args.rate,
+        )
+        summary = runner.run(read_prompts(source), output)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["failed"] else 0
@@ -0,0 +1,164 @@
+"""Content-addressed store for binary message payloads such as generated images.
+
+Blobs live under ``<data dir>/blobs/<first two hex chars>/<sha256>`` with the
+exact bytes the provider returned. Chat messages only keep the digest in a
+"blob" field, so data.json stays small and an image is only decoded when the
+message is shown.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+from . import storage
+
+blobs_dir = os.path.join(storage.data_dir, "blobs")
+# image_cache가 만드는 축소판 ({digest}-{size}.png); blob이 지워지면 함께 지운다
+thumbnails_dir = os.path.join(storage.user_cache_dir, "hamonikr-chatbot", "thumbnails")
+
+# 이미지 메시지의 content (공급자에게 히스토리로 보낼 때 사용되는 텍스트)
+IMAGE_PLACEHOLDER = "[image]"
+
+# 이보다 최근에 쓰였거나 다시 쓰인 blob은 참조가 없어 보여도 지우지 않는다
+# (다른 인스턴스가 아직 저장하지 않은 메시지가 가리킬 수 있다)
+COLLECT_GRACE = 24 * 60 * 60
+
+
+def blob_path(digest):
+    return os.path.join(blobs_dir, digest[:2], digest)
+
+
+def exists(digest):
+    return bool(digest) and os.path.exists(blob_path(digest))
+
+
+def put(data):
+    """Store data and return its sha256 hex digest; existing blobs are not rewritten."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if os.path.exists(path):
+        # 다시 쓰인 blob은 collect()의 유예 기간을 새로 시작한다
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return digest
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return digest
+
+
+def get(digest):
+    with open(blob_path(digest), "rb") as f:
+        return f.read()
+
+
+def size(digest):
+    try:
+        return os.path.getsize(blob_path(digest))
+    except OSError:
+        return 0
+
+
+def referenced(messages):
+    """Digests of the blobs the messages point to."""
+    return {
+        message["blob"] for message in messages
+        if message.get("type") == storage.MESSAGE_IMAGE and message.get("blob")
+    }
+
+
+def collect(keep, grace=COLLECT_GRACE):
+    """Delete blobs (and stale temporary files) not in keep and untouched for grace seconds.
+
+    Thumbnails of blobs that no longer exist are deleted as well. Returns
+    (files removed, bytes freed).
+    """
+    cutoff = time.time() - grace
+    removed = freed = 0
+    try:
+        shards = os.listdir(blobs_dir)
+    except OSError:
+        return removed, freed
+    for shard in shards:
+        directory = os.path.join(blobs_dir, shard)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            if name in keep:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime >= cutoff:
+                    continue
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            freed += stat.st_size
+        try:
+            os.rmdir(directory)  # 비었을 때만 지워진다
+        except OSError:
+            pass
+    count, size = collect_thumbnails()
+    return removed + count, freed + size
+
+
+def collect_thumbnails():
+    """Delete thumbnails whose blob is gone; returns (files removed, bytes freed)."""
+    removed = freed = 0
+    try:
+        names = os.listdir(thumbnails_dir)
+    except OSError:
+        return removed, freed
+    for name in names:
+        if exists(name.split("-", 1)[0]):
+            continue
+        path = os.path.join(thumbnails_dir, name)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def open_image(data):
+    """Open image bytes with PIL, remembering the original encoding for put_image."""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.original_bytes = data
+    return image
+
+
+def image_bytes(image):
+    """Original bytes of an image from open_image, or a lossless PNG re-encode."""
+    data = getattr(image, "original_bytes", None)
+    if data:
+        return data
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def put_image(image):
+    return put(image_bytes(image))
@@ -0,0 +1,276 @@
+# cli.py
+#
+# Copyright 2023
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Headless entry point: ``hamonikr-chatbot --no-gui -p PROMPT``.
+
+Nothing from views/ or widgets/ is imported here, so no window, template or
+GResource is loaded; only the selected provider module is imported and its
+answer is streamed to stdout.
+"""
+
+import argparse
+import builtins
+import gettext
+import sys
+
+import gi
+
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+
+from gi.repository import Gio
+
+if not hasattr(builtins, "_"):
+    gettext.install('hamonikr-chatbot')  # fallback when running out of tree
+
+from .constants import app_id
+from .providers import PROVIDER_MODULES, load_provider_class, create_provider, build_chat
+from .clipboard import CLIPBOARD_SYSTEM_PROMPT, get_clipboard_content
+from .batch import run_batch
+from .server import serve
+from . import storage, transfer
+
+
+def load_settings():
+    """Return the app's Gio.Settings, or None if the schema is not installed."""
+    source = Gio.SettingsSchemaSource.get_default()
+    if source is None or source.lookup(app_id, True) is None:
+        return None
+    return Gio.Settings(schema_id=app_id)
+
+
+class HeadlessApplication:
+    """Stand-in for BavarderApplication that provider classes can run against.
+
+    Providers only read app.data, app.bot_name and app.user_name, so this
+    loads data.json and the relevant settings and instantiates providers on
+    first use instead of all of them at startup. data.json is never written.
+    """
+
+    win = None
+
+    def __init__(self):
+        self.data_path = storage.data_file
+        self.data = storage.load_data(self.data_path)
+
+        settings = load_settings()
+        if settings is not None:
+            self.current_provider = settings.get_string("current-provider") or "ollama"
+            self.bot_name = settings.get_string("bot-name")
+            self.user_name = settings.get_string("user-name")
+        else:
+            self.current_provider = "ollama"
+            self.bot_name = "Assistant"
+            self.user_name = "User"
+
+        self.providers = {}
+
+    def get_provider(self, slug):
+        """Return the shared provider instance for slug, importing it on demand."""
+        if slug not in self.providers:
+            self.providers[slug] = load_provider_class(slug)(self, self.win)
+        return self.providers[slug]
+
+    def create_provider(self, slug, model=None):
+        """Return a fresh provider instance, optionally pinned to model."""
+        return create_provider(self, slug, model)
+
+    def build_chat(self, prompt, history=None, system_prompt=None):
+        """Chat payload in the same shape the window passes to providers."""
+        return build_chat(self, prompt, history, system_prompt)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="hamonikr-chatbot",
+        description=_("Ask the configured provider without starting the user interface"),
+    )
+    parser.add_argument("--no-gui", action="store_true",
+                        help=_("Run without the user interface"))
+    parser.add_argument("-p", "--prompt",
+                        help=_("Prompt to send (read from stdin when omitted)"))
+    parser.add_argument("-c", "--clipboard", action="store_true",
+                        help=_("Use clipboard content as prompt"))
+    parser.add_argument("--provider",
+                        help=_("Provider to use (defaults to the current provider)"))
+    parser.add_argument("--model",
+                        help=_("Model to use (defaults to the provider's model)"))
+    parser.add_argument("--system",
+                        help=_("System prompt to send with the request"))
+    parser.add_argument("-o", "--output",
+                        help=_("File to write image responses or batch results to"))
+    parser.add_argument("--batch", metavar="FILE",
+                        help=_("Run every prompt in FILE (JSONL or one per line, - for stdin)"))
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help=_("Number of batch prompts in flight at once"))
+    parser.add_argument("--rate", type=float,
+                        help=_("Maximum batch requests started per second"))
+    parser.add_argument("--serve", action="store_true",
+                        help=_("Serve an OpenAI-compatible API for the enabled providers"))
+    parser.add_argument("--host", default="127.0.0.1",
+                        help=_("Address the API server listens on"))
+    parser.add_argument("--port", type=int, default=8765,
+                        help=_("Port the API server listens on"))
+    parser.add_argument("--list-providers", action="store_true",
+                        help=_("List provider ids and exit"))
+    parser.add_argument("--export", metavar="FILE",
+                        help=_("Export threads to FILE and exit"))
+    parser.add_argument("--import", metavar="FILE", dest="import_file",
+                        help=_("Import threads from a JSONL export and exit"))
+    parser.add_argument("--format", choices=transfer.FORMATS,
+                        help=_("Export format (defaults to the FILE extension)"))
+    parser.add_argument("--search", metavar="QUERY",
+                        help=_("Export only threads containing QUERY"))
+    parser.add_argument("--starred", action="store_true",
+                        help=_("Export only starred threads"))
+    return parser
+
+
+def read_prompt(args):
+    """Return (prompt, system_prompt) from -p, -c or stdin."""
+    system_prompt = args.system
+    if args.prompt:
+        return args.prompt.strip(), system_prompt
+    if args.clipboard:
+        clip = get_clipboard_content()
+        if clip and clip.strip():
+            return clip.strip(), system_prompt or CLIPBOARD_SYSTEM_PROMPT
+        return "", system_prompt
+    if not sys.stdin.isatty():
+        return sys.stdin.read().strip(), system_prompt
+    return "", system_prompt
+
+
+def write_image(image, path):
+    if not path:
+        print(_("The provider returned an image, use --output to save it"), file=sys.stderr)
+        return 1
+    image.save(path)
+    print(path)
+    return 0
+
+
+def print_progress(done, total):
+    sys.stderr.write(f"\r{done}/{total}" if total else f"\r{done}")
+    sys.stderr.flush()
+
+
+def export_threads(args):
+    # 저널에만 있는 변경도 포함하되 data.json은 건드리지 않는다
+    data = storage.load_data(storage.data_file)
+    storage.replay_journal(data, storage.journal_path(storage.data_file))
+    chats = transfer.select_chats(data.get("chats", []), args.search, args.starred)
+    progress = print_progress if sys.stderr.isatty() else None
+    try:
+        count = transfer.export_threads(chats, args.export, args.format, progress)
+    except OSError as e:
+        print(_("Export failed: {}").format(e), file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    if progress is not None:
+        sys.stderr.write("\n")
+    print(_("Exported {} threads to {}").format(count, args.export), file=sys.stderr)
+    return 0
+
+
+def import_threads(args):
+    store = storage.Storage(storage.data_file)
+    chats = store.data["chats"]
+    existing = {storage.chat_uid(chat) for chat in chats}
+    count = 0
+    try:
+        for batch in transfer.import_batches(args.import_file, existing):
+            transfer.number_chats(batch, chats)
+            chats.extend(batch)
+            store.chats_added(batch)
+            count += len(batch)
+            if sys.stderr.isatty():
+                print_progress(count, 0)
+    except OSError as e:
+        print(_("Import failed: {}").format(e), file=sys.stderr)
+        return 1
+    finally:
+        # 중간에 실패해도 이미 가져온 묶음은 저장한다
+        store.flush()
+    if sys.stderr.isatty() and count:
+        sys.stderr.write("\n")
+    print(_("Imported {} threads").format(count), file=sys.stderr)
+    return 0
+
+
+def main(version, argv=None):
+    args = build_parser().parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.list_providers:
+        for slug in PROVIDER_MODULES:
+            print(slug)
+        return 0
+
+    if args.export:
+        return export_threads(args)
+
+    if args.import_file:
+        return import_threads(args)
+
+    if args.serve:
+        return serve(HeadlessApplication(), args.host, args.port)
+
+    if args.batch:
+        app = HeadlessApplication()
+        if (args.provider or app.current_provider) not in PROVIDER_MODULES:
+            print(_("Unknown provider: {}").format(args.provider or app.current_provider), file=sys.stderr)
+            return 2
+        return run_batch(app, args)
+
+    prompt, system_prompt = read_prompt(args)
+    if not prompt:
+        print(_("No prompt given, use -p, -c or pipe text on stdin"), file=sys.stderr)
+        return 2
+
+    app = HeadlessApplication()
+    slug = args.provider or app.current_provider
+    if slug not in PROVIDER_MODULES:
+        print(_("Unknown provider: {}").format(slug), file=sys.stderr)
+        return 2
+
+    provider = app.create_provider(slug, args.model)
+    chat = app.build_chat(prompt, system_prompt=system_prompt)
+
+    streamed = {"any": False}
+
+    def on_chunk(chunk_text):
+        if chunk_text:
+            streamed["any"] = True
+            sys.stdout.write(chunk_text)
+            sys.stdout.flush()
+
+    try:
+        response = provider.generate(prompt, chat, callback=on_chunk, system_prompt=system_prompt)
+    except KeyboardInterrupt:
+        return 130
+
+    if response is not None and not isinstance(response, str):
+        return write_image(response, args.output)
+
+    if not streamed["any"] and response:
+        sys.stdout.write(response)
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+    return 0
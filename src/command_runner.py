@@ -0,0 +1,186 @@
+"""Asynchronous command execution for code blocks.
+
+Runs a command with Gio.Subprocess on the main loop without blocking it:
+merged stdout/stderr is streamed to a callback as it arrives, output past a
+size limit is dropped (the pipe is still drained so the child never blocks),
+and the run can be cancelled or stopped by a timeout.
+
+Stopping sends SIGTERM first and only SIGKILL after KILL_GRACE seconds:
+inside Flatpak the child is flatpak-spawn, which forwards SIGTERM to the
+host command but cannot forward SIGKILL. --watch-bus additionally ends the
+host command if flatpak-spawn dies anyway.
+"""
+
+import codecs
+import os
+import signal
+import time
+
+from gi.repository import Gio, GLib
+
+RUN_TIMEOUT = 120  # seconds
+MAX_OUTPUT = 256 * 1024  # characters kept in the output view
+READ_SIZE = 8192
+KILL_GRACE = 3  # SIGTERM 후 SIGKILL까지 기다리는 시간(초)
+
+
+def build_argv(command, allow_escaping=False):
+    """Wrap command with flatpak-spawn when running sandboxed inside Flatpak."""
+    if allow_escaping and os.environ.get("FLATPAK_ID"):
+        return ["flatpak-spawn", "--host", "--watch-bus"] + list(command)
+    return list(command)
+
+
+def _is_noise(line):
+    # flatpak-spawn 자체 경고는 출력에서 제외
+    stripped = line.strip()
+    return stripped.startswith("** (flatpak-spawn:") or stripped.startswith("(flatpak-spawn:")
+
+
+class CommandRunner:
+    """One run of a command.
+
+    on_output(text) is called with each chunk of complete lines, and
+    on_finished(runner) once the process has exited and its output is read;
+    the runner's exit_status, duration, timed_out, cancelled, truncated and
+    error attributes then describe the run.
+    """
+
+    def __init__(self, argv, on_output, on_finished, timeout=RUN_TIMEOUT, max_output=MAX_OUTPUT):
+        self.argv = argv
+        self.on_output = on_output
+        self.on_finished = on_finished
+        self.timeout = timeout
+        self.max_output = max_output
+
+        self.process = None
+        self.cancellable = Gio.Cancellable()
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.pending_line = ""
+        self.output_size = 0
+
+        self.started = None
+        self.duration = None
+        self.exit_status = None
+        self.timed_out = False
+        self.cancelled = False
+        self.truncated = False
+        self.error = None
+
+        self._timeout_id = 0
+        self._kill_id = 0
+        self._eof = False
+        self._exited = False
+        self._finished = False
+
+    @property
+    def running(self):
+        return self.process is not None and not self._finished
+
+    def start(self):
+        self.started = time.monotonic()
+        try:
+            self.process = Gio.Subprocess.new(
+                self.argv,
+                Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_MERGE,
+            )
+        except GLib.Error as e:
+            self.error = e.message
+            self._eof = self._exited = True
+            self._maybe_finish()
+            return
+
+        if self.timeout:
+            self._timeout_id = GLib.timeout_add_seconds(self.timeout, self._on_timeout)
+        self.process.wait_async(self.cancellable, self._on_exit)
+        self._read_next()
+
+    def cancel(self):
+        if not self.running:
+            return
+        self.cancelled = True
+        self.stop()
+
+    def _on_timeout(self):
+        self._timeout_id = 0
+        if self.running:
+            self.timed_out = True
+            self.stop()
+        return False
+
+    def stop(self):
+        """SIGTERM now (forwarded to the host command by flatpak-spawn), SIGKILL after KILL_GRACE."""
+        if self._kill_id:
+            return
+        self.process.send_signal(signal.SIGTERM)
+        self._kill_id = GLib.timeout_add_seconds(KILL_GRACE, self._on_kill_timeout)
+
+    def _on_kill_timeout(self):
+        self._kill_id = 0
+        if self.running:
+            self.process.force_exit()
+        return False
+
+    def _read_next(self):
+        self.process.get_stdout_pipe().read_bytes_async(
+            READ_SIZE, GLib.PRIORITY_DEFAULT, self.cancellable, self._on_read
+        )
+
+    def _on_read(self, stream, result):
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error:
+            data = b""
+        if not data:
+            self._emit(self.decoder.decode(b"", final=True), final=True)
+            self._eof = True
+            self._maybe_finish()
+            return
+        self._emit(self.decoder.decode(data))
+        self._read_next()
+
+    def _emit(self, text, final=False):
+        text = self.pending_line + text
+        if final:
+            self.pending_line = ""
+        else:
+            # 줄 단위로 내보내 flatpak-spawn 경고 줄을 걸러낼 수 있게 한다
+            head, sep, tail = text.rpartition("\n")
+            self.pending_line = tail
+            text = head + sep
+        if not text:
+            return
+
+        text = "".join(line for line in text.splitlines(True) if not _is_noise(line))
+        if self.truncated or not text:
+            return
+        room = self.max_output - self.output_size
+        if len(text) > room:
+            text = text[:room]
+            self.truncated = True
+        self.output_size += len(text)
+        if text:
+            self.on_output(text)
+
+    def _on_exit(self, process, result):
+        try:
+            process.wait_finish(result)
+            if process.get_if_exited():
+                self.exit_status = process.get_exit_status()
+        except GLib.Error as e:
+            self.error = e.message
+        self._exited = True
+        self._maybe_finish()
+
+    def _maybe_finish(self):
+        if self._finished or not (self._eof and self._exited):
+            return
+        self._finished = True
+        if self._timeout_id:
+            GLib.source_remove(self._timeout_id)
+            self._timeout_id = 0
+        if self._kill_id:
+            GLib.source_remove(self._kill_id)
+            self._kill_id = 0
+        self.duration = time.monotonic() - (self.started or time.monotonic())
+        self.on_finished(self)
@@ -0,0 +1,166 @@
+"""D-Bus interface exported by the running application.
+
+Launchers, clipboard helpers and panel applets can send prompts to the
+already running (and warmed up) instance instead of starting a new Python
+and GTK process for every query::
+
+    gdbus call --session --dest <app-id> --object-path <app-path> \
+        --method <app-id>.Assistant.Ask "프롬프트" "" ""
+
+Ask returns a request id right away; the answer arrives as Chunk signals
+followed by a single Done signal carrying the full response (or an error).
+"""
+
+import itertools
+
+from gi.repository import Gio, GLib
+
+from .constants import app_id
+from .hamonikr_threading import KillableThread
+from .providers.base import ProviderType
+
+INTERFACE_NAME = f"{app_id}.Assistant"
+
+INTERFACE_XML = f"""
+<node>
+  <interface name="{INTERFACE_NAME}">
+    <method name="Ask">
+      <arg type="s" name="prompt" direction="in"/>
+      <arg type="s" name="provider" direction="in"/>
+      <arg type="s" name="model" direction="in"/>
+      <arg type="s" name="request_id" direction="out"/>
+    </method>
+    <method name="Cancel">
+      <arg type="s" name="request_id" direction="in"/>
+    </method>
+    <method name="ListProviders">
+      <arg type="as" name="providers" direction="out"/>
+    </method>
+    <signal name="Chunk">
+      <arg type="s" name="request_id"/>
+      <arg type="s" name="text"/>
+    </signal>
+    <signal name="Done">
+      <arg type="s" name="request_id"/>
+      <arg type="s" name="response"/>
+      <arg type="s" name="error"/>
+    </signal>
+  </interface>
+</node>
+"""
+
+
+class AssistantService:
+    """Implements the Assistant interface on top of the application's providers."""
+
+    def __init__(self, app):
+        self.app = app
+        self.connection = None
+        self.object_path = None
+        self.registration_id = 0
+        self.requests = {}
+        self._ids = itertools.count(1)
+
+    def register(self, connection, object_path):
+        node = Gio.DBusNodeInfo.new_for_xml(INTERFACE_XML)
+        self.registration_id = connection.register_object(
+            object_path, node.interfaces[0], self.on_method_call, None, None
+        )
+        self.connection = connection
+        self.object_path = object_path
+
+    def unregister(self):
+        # 진행 중인 요청은 Done(cancelled)을 보내고 hold()를 풀어 앱이 종료될 수 있게 한다
+        for request_id in list(self.requests):
+            self.cancel(request_id)
+        if self.connection is not None and self.registration_id:
+            self.connection.unregister_object(self.registration_id)
+        self.connection = None
+        self.registration_id = 0
+
+    def on_method_call(self, connection, sender, object_path, interface_name,
+                       method_name, parameters, invocation):
+        try:
+            if method_name == "Ask":
+                prompt, slug, model = parameters.unpack()
+                request_id = self.ask(prompt, slug, model)
+                invocation.return_value(GLib.Variant("(s)", (request_id,)))
+            elif method_name == "Cancel":
+                self.cancel(parameters.unpack()[0])
+                invocation.return_value(None)
+            elif method_name == "ListProviders":
+                invocation.return_value(GLib.Variant("(as)", (self.list_providers(),)))
+            else:
+                invocation.return_dbus_error(
+                    "org.freedesktop.DBus.Error.UnknownMethod", method_name
+                )
+        except Exception as e:
+            invocation.return_dbus_error(f"{INTERFACE_NAME}.Error", str(e))
+
+    def list_providers(self):
+        return [
+            p.slug for p in getattr(self.app, "providers", {}).values()
+            if p.enabled and p.provider_type == ProviderType.CHAT
+        ]
+
+    def provider_for(self, slug, model):
+        # 공급자는 호출마다 상태를 바꾸므로 요청마다 새로 만든다 (연결 풀은 http_session()으로 공유)
+        return self.app.create_provider(slug, model or None)
+
+    def ask(self, prompt, slug="", model=""):
+        prompt = prompt.strip()
+        if not prompt:
+            raise ValueError("Empty prompt")
+        slug = slug or self.app.current_provider
+        provider = self.provider_for(slug, model)
+        if provider is None:
+            raise ValueError(f"Unknown provider: {slug}")
+        if not getattr(provider, "enabled", True):
+            raise ValueError(f"Provider is not enabled: {slug}")
+
+        request_id = str(next(self._ids))
+        chat = self.app.build_chat(prompt)
+
+        def on_chunk(chunk_text):
+            if chunk_text:
+                self.emit("Chunk", GLib.Variant("(ss)", (request_id, chunk_text)))
+
+        def run():
+            response, error = "", ""
+            try:
+                result = provider.generate(prompt, chat, callback=on_chunk)
+                if isinstance(result, str):
+                    response = result
+                elif result is not None:
+                    error = "non-text response"
+            except Exception as e:
+                error = str(e)
+            GLib.idle_add(self._finish, request_id, response, error)
+
+        # 응답이 끝날 때까지 서비스로 실행된 프로세스가 종료되지 않도록 유지
+        self.app.hold()
+        thread = KillableThread(target=run, daemon=True)
+        self.requests[request_id] = thread
+        thread.start()
+        return request_id
+
+    def cancel(self, request_id):
+        thread = self.requests.get(request_id)
+        if thread is not None:
+            # 종료된 워커는 _finish를 예약하지 못하므로 여기서 마무리한다
+            thread.kill()
+            self._finish(request_id, "", "cancelled")
+
+    def emit(self, name, parameters):
+        # GDBusConnection은 스레드 안전하므로 워커에서 바로 내보낸다
+        if self.connection is not None:
+            self.connection.emit_signal(
+                None, self.object_path, INTERFACE_NAME, name, parameters
+            )
+
+    def _finish(self, request_id, response, error):
+        if self.requests.pop(request_id, None) is None:
+            return False  # already cancelled
+        self.emit("Done", GLib.Variant("(sss)", (request_id, response, error)))
+        self.app.release()
+        return False
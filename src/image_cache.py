@@ -0,0 +1,118 @@
+"""Off-main-thread image decoding for chat messages.
+
+Images from the blob store are decoded and scaled on a small worker pool.
+The scaled PNG is kept as an on-disk thumbnail and the resulting Gdk.Texture
+in an in-memory LRU, both keyed by the blob's content hash, so re-opening a
+thread or scrolling back never decodes the same image twice.
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from gi.repository import Gdk, GLib
+
+from . import blob_store
+from .blob_store import thumbnails_dir
+
+THUMBNAIL_SIZE = 540  # 메시지 카드(270px)의 2배, HiDPI 대응
+MAX_TEXTURES = 64
+
+
+class ImageCache:
+    def __init__(self, max_textures=MAX_TEXTURES, workers=2):
+        self.max_textures = max_textures
+        self.textures = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-cache")
+
+    def thumbnail_path(self, digest, size):
+        return os.path.join(thumbnails_dir, f"{digest}-{size}.png")
+
+    def lookup(self, digest, size=THUMBNAIL_SIZE):
+        """Return the cached texture or None; main thread only."""
+        texture = self.textures.get((digest, size))
+        if texture is not None:
+            self.textures.move_to_end((digest, size))
+        return texture
+
+    def load(self, digest, callback, size=THUMBNAIL_SIZE):
+        """Call callback(texture) on the main thread once the image is decoded.
+
+        callback receives None if the blob is missing or cannot be decoded.
+        Concurrent requests for the same image share one decode.
+        """
+        texture = self.lookup(digest, size)
+        if texture is not None:
+            callback(texture)
+            return
+
+        key = (digest, size)
+        with self.lock:
+            if key in self.pending:
+                self.pending[key].append(callback)
+                return
+            self.pending[key] = [callback]
+        self.pool.submit(self._decode, key)
+
+    def _decode(self, key):
+        digest, size = key
+        try:
+            texture = Gdk.Texture.new_from_bytes(GLib.Bytes.new(self._thumbnail_bytes(digest, size)))
+        except Exception:
+            texture = None
+        GLib.idle_add(self._deliver, key, texture)
+
+    def _thumbnail_bytes(self, digest, size):
+        path = self.thumbnail_path(digest, size)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            pass
+
+        from PIL import Image
+
+        image = Image.open(blob_store.blob_path(digest))
+        image.thumbnail((size, size))
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG")
+        data = buffered.getvalue()
+
+        try:
+            os.makedirs(thumbnails_dir, exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # 캐시 쓰기 실패는 무시 (다음에 다시 디코딩)
+        return data
+
+    def _deliver(self, key, texture):
+        if texture is not None:
+            self.textures[key] = texture
+            self.textures.move_to_end(key)
+            while len(self.textures) > self.max_textures:
+                self.textures.popitem(last=False)
+        with self.lock:
+            callbacks = self.pending.pop(key, [])
+        for callback in callbacks:
+            try:
+                callback(texture)
+            except Exception:
+                pass
+        return False
+
+
+_default = None
+
+
+def get_default():
+    global _default
+    if _default is None:
+        _default = ImageCache()
+    return _default
@@ -19,10 +19,8 @@
 
 import sys
 import gi
-import time
 import os
-import subprocess
-import inspect
+import threading
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
@@ -37,51 +35,22 @@ except Exception:
 from .views.window import BavarderWindow
 from .views.about_window import AboutWindow
 from .views.preferences_window import PreferencesWindow
+from .views.compare_window import CompareWindow
 from .constants import app_id
-from .providers import PROVIDERS
+from .providers import PROVIDERS, create_provider, build_chat
+from .dbus_service import AssistantService
+from .clipboard import CLIPBOARD_SYSTEM_PROMPT, get_clipboard_content
+from .storage import user_cache_dir
+from . import archive, retention, storage
 
-import json
 
 
-def get_clipboard_content():
-    """Return clipboard text using xclip or xsel if available, else None.
-    Tries up to 3 times with short delays to accommodate clipboard readiness.
-    """
-    for attempt in range(3):
-        try:
-            content = subprocess.check_output(
-                ['xclip', '-selection', 'clipboard', '-o'], text=True
-            )
-            if content.strip() != "":
-                return content
-        except Exception:
-            time.sleep(1)
-
-        try:
-            content = subprocess.check_output(
-                ['xsel', '--clipboard', '--output'], text=True
-            )
-            if content.strip() != "":
-                return content
-        except Exception:
-            time.sleep(1)
-
-    return None
-
-user_config_dir = os.environ.get(
-    "XDG_CONFIG_HOME", os.environ["HOME"] + "/.config"
-)
-
-user_data_dir = os.environ.get(
-    "XDG_DATA_HOME", os.environ["HOME"] + "/.local/share"
-)
-
-user_cache_dir = os.environ.get(
-    "XDG_CACHE_HOME", os.environ["HOME"] + "/.cache"
-)
-
 model_path = os.path.join(user_cache_dir, "hamonikr-chatbot", "models")
 
+# 시작 후 처음 보관 작업까지의 시간과 그 뒤의 주기(초)
+ARCHIVE_FIRST_DELAY = 60
+ARCHIVE_INTERVAL = 6 * 60 * 60
+
 class BavarderApplication(Adw.Application):
     """The main application singleton class."""
 
@@ -90,6 +59,8 @@ class BavarderApplication(Adw.Application):
     model = None
     action_running_in_background = False
     number_of_win = 0
+    providers = {}
+    assistant_service = None
 
     def __init__(self):
         super().__init__(application_id=app_id,
@@ -102,6 +73,9 @@ class BavarderApplication(Adw.Application):
         # 키 입력은 위젯 단에서 처리(Enter=전송, Ctrl/Shift+Enter=줄바꿈)
         self.create_action('ask', self.on_ask)
         self.create_action('new_window', self.on_new_window, ["<primary><shift>n"])
+        self.create_action('compare', self.on_compare_action, ["<primary><shift>m"])
+        self.create_action('export_threads', self.on_export_threads_action)
+        self.create_action('import_threads', self.on_import_threads_action)
 
         # CLI 옵션: -p/--prompt 초기 프롬프트 지원
         try:
@@ -130,35 +104,34 @@ class BavarderApplication(Adw.Application):
         self.initial_prompt_from_clipboard = False
         self.initial_system_injection = None
 
-        self.data_path = os.path.join(user_data_dir, "hamonikr-chatbot")
-
-        if not os.path.exists(self.data_path):
-            os.makedirs(self.data_path)
+        if not os.path.exists(storage.data_dir):
+            os.makedirs(storage.data_dir)
 
         if not os.path.exists(model_path):
             os.makedirs(model_path)
 
-        self.data_path = os.path.join(self.data_path, "data.json")
-
-        self.data = {
-            "chats": [],
-            "providers": {
-                "ollama": {"enabled": True, "data": {}},
-                "google-flan-t5-xxl": {"enabled": False, "data": {}},
-                "gpt-2": {"enabled": False, "data": {}},
-
-            },
-            "models": {}
-        }
+        self.settings = Gio.Settings(schema_id=app_id)
 
-        if os.path.exists(self.data_path):
+        self.data_path = storage.data_file
+        # 변경 훅을 받아 data.json을 백그라운드에서 모아서 저장한다
+        # (journal-storage: 변경마다 저널에 한 줄씩 덧붙이고 주기적으로 압축)
+        self.storage = None
+        if self.settings.get_boolean("journal-storage"):
             try:
-                with open(self.data_path, "r", encoding="utf-8") as f:
-                    self.data = json.load(f)
-            except Exception: # if there is an error, we use a plain config
-                pass
-
-        self.settings = Gio.Settings(schema_id=app_id)
+                self.storage = storage.JournalStorage(self.data_path)
+            except storage.JournalBusy:
+                # 다른 인스턴스가 저널을 쓰고 있으면 data.json을 직접 저장한다
+                print("Journal in use by another instance, saving data.json directly", file=sys.stderr)
+        if self.storage is None:
+            self.storage = storage.Storage(self.data_path)
+        self.data = self.storage.data
+        self.setup_storage_monitor()
+
+        # 오래 쓰지 않은 스레드는 압축 파일로 옮기고, 열 때 다시 불러온다
+        self.archiver = archive.Archiver(self.storage, GLib.idle_add)
+        # 보관 뒤에 기록 크기/기간 제한을 적용하고 쓰이지 않는 이미지를 지운다
+        self.janitor = retention.Janitor(self.storage, GLib.idle_add)
+        GLib.timeout_add_seconds(ARCHIVE_FIRST_DELAY, self.start_archiving)
 
         self.local_mode = self.settings.get_boolean("local-mode")
         self.current_provider = self.settings.get_string("current-provider")
@@ -288,13 +261,13 @@ class BavarderApplication(Adw.Application):
         Gio.SimpleAction.set_state(self.lookup_action("set_provider_model"), args[0])
 
     def save(self):
-        with open(self.data_path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f)
-            self.settings.set_boolean("local-mode", self.local_mode)
-            self.settings.set_string("current-provider", self.current_provider)
-            self.settings.set_string("model", self.model_name)
-            self.settings.set_string("bot-name", self.bot_name)
-            self.settings.set_string("user-name", self.user_name)
+        """Write everything now; changes during the session are saved by self.storage."""
+        self.storage.save_all()
+        self.settings.set_boolean("local-mode", self.local_mode)
+        self.settings.set_string("current-provider", self.current_provider)
+        self.settings.set_string("model", self.model_name)
+        self.settings.set_string("bot-name", self.bot_name)
+        self.settings.set_string("user-name", self.user_name)
 
     def on_quit(self, action, *args, **kwargs):
         """Called when the user activates the Quit action."""
@@ -314,15 +287,11 @@ class BavarderApplication(Adw.Application):
             if chat["id"] > chat_id:
                 chat_id = chat["id"]
         chat_id += 1
-        chat = {
-            "id": chat_id,
-            "title": "New Chat " + str(chat_id),
-            "starred": False,
-            "content": [],
-        }
+        chat = storage.new_chat(chat_id, "New Chat " + str(chat_id))
 
         self.data["chats"].append(chat)
-        self.win.load_threads()
+        self.storage.chat_added(chat)
+        self.win.add_thread(chat)
 
     def do_activate(self):
         """Called when the application is activated.
@@ -366,6 +335,43 @@ class BavarderApplication(Adw.Application):
     def on_new_window(self, widget, _):
         self.new_window()
 
+    def create_provider(self, slug, model=None):
+        """Return a fresh instance of the provider registered as slug (see providers.create_provider)."""
+        return create_provider(self, slug, model)
+
+    def build_chat(self, prompt, history=None, system_prompt=None):
+        """Chat payload in the same shape the window passes to providers."""
+        return build_chat(self, prompt, history, system_prompt)
+
+    def do_dbus_register(self, connection, object_path):
+        """Export the Assistant interface next to the Gio.Application one."""
+        if not Adw.Application.do_dbus_register(self, connection, object_path):
+            return False
+        try:
+            self.assistant_service = AssistantService(self)
+            self.assistant_service.register(connection, object_path)
+        except Exception as e:
+            print(f"Failed to export D-Bus interface: {e}")
+            self.assistant_service = None
+        return True
+
+    def do_dbus_unregister(self, connection, object_path):
+        if self.assistant_service is not None:
+            self.assistant_service.unregister()
+            self.assistant_service = None
+        Adw.Application.do_dbus_unregister(self, connection, object_path)
+
+    def on_compare_action(self, widget, _):
+        """Callback for the app.compare action."""
+        compare = CompareWindow(self.win)
+        compare.present()
+
+
+    def on_export_threads_action(self, *args):
+        self.win.export_threads()
+
+    def on_import_threads_action(self, *args):
+        self.win.import_threads()
 
     def on_about_action(self, widget, _):
         """Callback for the app.about action."""
@@ -431,37 +437,7 @@ class BavarderApplication(Adw.Application):
                         self.initial_prompt = clip.strip()
                         self.initial_prompt_from_clipboard = True
                         # 시스템 프롬프트 동적 주입 텍스트
-                        self.initial_system_injection = (
-                            "다음 문장을 분석해주세요:\n"
-                            "1. 프로그램 소스코드인 경우: 코드에 대한 설명을 제공해주세요.\n"
-                            "2. 오류 메시지인 경우: \n"
-                            "    하모니카OS(우분투 커널 기반, 리눅스 민트의 시나몬 데스크톱 환경 포함)를 사용하는 질문자가 특정 문제를 제기한 상황입니다.\n\n"
-                            "    하모니카, 하모니카OS, HamoniKR, HamoniKR OS 등의 단어는 모두 하모니카OS를 의미합니다.\n"
-                            "    하모니카OS 는 linuxmint 를 기반으로, 한국 사용자들의 환경에 적합한 여러 프로그램을 추가하고 개작한 운영체제입니다.\n"
-                            "    하모니카 5.0은 linuxmint 20.1 Ulyssa 기반이며, Ubuntu 20.04 Focal 과 동일한 패키지입니다. 코드네임은 한라(Hanla) 입니다.\n"
-                            "    하모니카 6.0은 linuxmint 20.3 Una 기반이며, Ubuntu 20.4 Focal 과 동일한 패키지입니다. 코드네임은 금강(kumkang) 입니다.\n"
-                            "    하모니카 7.0은 linuxmint 21.2 Victoria 기반이며, Ubuntu 22.04 jammy 과 동일한 패키지입니다. 코드네임은 태백(taebaek) 입니다.\n"
-                            "    하모니카 8.0은 linuxmint 22 Wilma 기반이며, Ubuntu 24.04 Noble 과 동일한 패키지입니다. 코드네임은 백두(paektu) 입니다.\n\n"
-                            "    정보를 제공할 때 다음의 우선순위로 웹사이트에서 정보를 검색하여 답변에 포함합니다:\n"
-                            "    - 하모니카 매뉴얼 사이트 (버전별):\n"
-                            "    - https://docs.hamonikr.org/hamonikr\n"
-                            "    - https://docs.hamonikr.org/hamonikr-5.0\n"
-                            "    - https://docs.hamonikr.org/hamonikr-6.0\n"
-                            "    - https://docs.hamonikr.org/hamonikr-7.0\n"
-                            "    - https://docs.hamonikr.org/hamonikr-8.0\n"
-                            "    - 하모니카 커뮤니티 질의응답 게시글:\n"
-                            "    - https://hamonikr.org/hamoni_board\n"
-                            "    - 우분투와 리눅스 민트의 질의응답 사이트:\n"
-                            "    - https://askubuntu.com/\n"
-                            "    - https://forums.linuxmint.com/\n\n"
-                            "    a. 질문자가 제공한 정보가 충분하다면, 해당 문제를 해결하기 위한 구체적인 방법을 한글로 자세히 설명합니다. 반드시 사용한 정보의 출처를 명확하게 제공하세요.\n"
-                            "    b. 질문이 하모니카OS, 리눅스, 또는 시나몬 데스크톱 환경과 관련이 없거나, 제공된 정보로 정확한 출처를 명확하게 제시할 수 없는 경우에는 일반적인 응답을 해주세요.\n"
-                            "    c. 이 답변이 AI 가 작성한 것을 알려주고, 인공지능 답변을 그대로 사용하는 위험에 대해서 알려주세요.\n\n"
-                            "    주의사항: 코드를 설명하는 부분은 bash, python 등의 문구를 붙이지 말고 평문으로 출력해주세요.\n"
-                            "    주의사항: 강조를 위해 ** 으로 표시하는 부분은 평문으로 출력해주세요.\n"
-                            "    주의사항: 항상 친절하고 이해하기 쉬운 언어를 사용하여 답변하며, 하모니카OS, 리눅스 민트, 시나몬 데스크톱 환경과 관련된 문제 해결에 중점을 둡니다.\n"
-                            "    주의사항: 답변을 하기 전 전체 답변 내용을 검토해서, 제대로 구성되지 않은 문장이나, 문맥상 이상한 부분을 자연스럽게 수정하는 과정을 수행 후, 리눅스 전문가가 말하듯이 해주세요."
-                        )
+                        self.initial_system_injection = CLIPBOARD_SYSTEM_PROMPT
         except Exception:
             self.initial_prompt = None
 
@@ -527,69 +503,32 @@ class BavarderApplication(Adw.Application):
                 )
 
         else:
-            l = list(self.providers.values())
-
-            for p in l:
-                if p.enabled and p.slug == self.current_provider:
-                    # One-off system prompt injection support
-                    sys_prompt = None
-                    try:
-                        sys_prompt = getattr(self, "transient_system_prompt", None)
-                    except Exception:
-                        sys_prompt = None
-                    # Clear after capturing to avoid leaking into next request
-                    try:
-                        self.transient_system_prompt = None
-                    except Exception:
-                        pass
-
-                    # Build a temporary chat payload if system prompt exists (do not mutate UI chat)
-                    chat_payload = chat
-                    try:
-                        if sys_prompt:
-                            chat_payload = {"content": list(chat["content"]) }
-                            chat_payload["content"].insert(0, {"role": "system", "content": sys_prompt})
-                    except Exception:
-                        chat_payload = chat
-
-                    if stream and callback:
-                        # Use streaming if supported
-                        if hasattr(self.providers[self.current_provider], 'ask_stream'):
-                            # Try to pass system_prompt if supported
-                            try:
-                                sig = inspect.signature(self.providers[self.current_provider].ask_stream)
-                                if 'system_prompt' in sig.parameters and sys_prompt:
-                                    response = self.providers[self.current_provider].ask_stream(prompt, chat_payload, callback=callback, system_prompt=sys_prompt)
-                                else:
-                                    response = self.providers[self.current_provider].ask_stream(prompt, chat_payload, callback)
-                            except Exception:
-                                response = self.providers[self.current_provider].ask_stream(prompt, chat_payload, callback)
-                        else:
-                            # Fallback to non-streaming ask
-                            try:
-                                sig = inspect.signature(self.providers[self.current_provider].ask)
-                                if 'system_prompt' in sig.parameters and sys_prompt:
-                                    response = self.providers[self.current_provider].ask(prompt, chat_payload, system_prompt=sys_prompt)
-                                else:
-                                    response = self.providers[self.current_provider].ask(prompt, chat_payload)
-                            except Exception:
-                                response = self.providers[self.current_provider].ask(prompt, chat_payload)
-                            if callback and response:
-                                callback(response)
-                    else:
-                        # Regular non-streaming path
-                        try:
-                            sig = inspect.signature(self.providers[self.current_provider].ask)
-                            if 'system_prompt' in sig.parameters and sys_prompt:
-                                response = self.providers[self.current_provider].ask(prompt, chat_payload, system_prompt=sys_prompt)
-                            else:
-                                response = self.providers[self.current_provider].ask(prompt, chat_payload)
-                        except Exception:
-                            response = self.providers[self.current_provider].ask(prompt, chat_payload)
-                    break
-                else:
-                    response = _("Please enable a provider from the Dot Menu")
-                
+            provider = self.providers.get(self.current_provider)
+            if provider is None or not provider.enabled:
+                return _("Please enable a provider from the Dot Menu")
+
+            # One-off system prompt injection support
+            sys_prompt = getattr(self, "transient_system_prompt", None)
+            # Clear after capturing to avoid leaking into next request
+            self.transient_system_prompt = None
+
+            # Build a temporary chat payload if system prompt exists (do not mutate UI chat)
+            chat_payload = chat
+            try:
+                if sys_prompt:
+                    chat_payload = {"content": list(chat["content"]) }
+                    chat_payload["content"].insert(0, {"role": "system", "content": sys_prompt})
+            except Exception:
+                chat_payload = chat
+
+            # 스트리밍 미지원 공급자는 generate 내부에서 콜백을 한 번만 호출한다
+            response = provider.generate(
+                prompt,
+                chat_payload,
+                callback=callback if stream else None,
+                system_prompt=sys_prompt,
+            )
+
         return response
 
     @property
@@ -602,6 +541,7 @@ class BavarderApplication(Adw.Application):
             except KeyError:
                 self.data["models"] = {}
                 self.data["models"][self.model_name] = {}
+            self.storage.changed()
 
         return self.data["models"][self.model_name]
 
@@ -628,11 +568,98 @@ class BavarderApplication(Adw.Application):
         return False
 
     def clear_all_chats(self):
+        chats = self.data["chats"]
         self.data["chats"] = []
+        self.storage.chats_cleared(chats)
         self.win.load_threads()
 
+    def start_archiving(self):
+        self.archive_idle_threads()
+        GLib.timeout_add_seconds(ARCHIVE_INTERVAL, self.archive_idle_threads)
+        return False
+
+    def open_chat_ids(self):
+        keep = set()
+        for window in self.get_windows():
+            if hasattr(window, "open_chat_ids"):
+                keep |= window.open_chat_ids()
+        return keep
+
+    def archive_idle_threads(self):
+        """Archive threads unused for archive-after-days (0 turns it off), then enforce retention."""
+        started = self.archiver.archive_async(
+            self.settings.get_int("archive-after-days"),
+            self.open_chat_ids(),
+            on_done=lambda archived: self.enforce_retention(),
+        )
+        if not started:
+            self.enforce_retention()
+        return True
+
+    def enforce_retention(self):
+        """Apply the history-max-size-mb / history-max-age-days limits (0 turns each off)."""
+        self.janitor.run_async(
+            self.settings.get_int("history-max-size-mb") * 1024 * 1024,
+            self.settings.get_int("history-max-age-days"),
+            self.settings.get_boolean("history-keep-starred"),
+            self.open_chat_ids(),
+            on_done=self.on_retention_done,
+        )
+
+    def on_retention_done(self, archived, removed):
+        if not removed:
+            return
+        print(f"Removed {len(removed)} threads past the history limits", file=sys.stderr)
+        for window in self.get_windows():
+            if hasattr(window, "drop_thread"):
+                for chat in removed:
+                    window.drop_thread(chat)
+
+    def setup_storage_monitor(self):
+        """Watch data.json for writes by another instance of the app."""
+        self.storage_reload_id = 0
+        try:
+            self.storage_monitor = Gio.File.new_for_path(self.data_path).monitor_file(
+                Gio.FileMonitorFlags.WATCH_MOVES, None
+            )
+        except GLib.Error as e:
+            print(f"Cannot watch {self.data_path}: {e.message}", file=sys.stderr)
+            self.storage_monitor = None
+            return
+        self.storage_monitor.connect("changed", self.on_storage_file_changed)
+
+    def on_storage_file_changed(self, monitor, file, other_file, event):
+        # 원자적 저장은 임시 파일 생성/이름 바꾸기로 여러 이벤트를 내므로 잠시 모아서 처리
+        if self.storage_reload_id:
+            GLib.source_remove(self.storage_reload_id)
+        self.storage_reload_id = GLib.timeout_add(300, self.reload_storage)
+
+    def reload_storage(self):
+        self.storage_reload_id = 0
+
+        def run():
+            # 우리가 쓴 파일이면 read_external()이 None을 돌려준다
+            external = self.storage.read_external()
+            if external is not None:
+                GLib.idle_add(self.apply_external_storage, *external)
+
+        threading.Thread(target=run, name="storage-reload", daemon=True).start()
+        return False
+
+    def apply_external_storage(self, stamp, disk):
+        added, updated, removed, renumbered = self.storage.merge_external(stamp, disk)
+        if added or updated or removed or renumbered:
+            for window in self.get_windows():
+                if hasattr(window, "apply_external_changes"):
+                    window.apply_external_changes(added, updated, removed, renumbered)
+        return False
+
 def main(version):
     """The application's entry point."""
+    if "--no-gui" in sys.argv[1:]:
+        from . import cli
+        return cli.main(version)
+
     app = BavarderApplication()
     return app.run(sys.argv)
 
@@ -0,0 +1,79 @@
+import time
+
+
+class StreamMetrics:
+    """Timing for one streamed response: time to first token and throughput.
+
+    Providers don't report token usage consistently, so each streamed delta
+    is counted as one token. Non-streaming providers deliver a single chunk;
+    in that case tokens are estimated from the text length.
+    """
+
+    def __init__(self):
+        self.started = None
+        self.first_chunk = None
+        self.finished = None
+        self.chunks = 0
+        self.chars = 0
+
+    def start(self):
+        self.started = time.monotonic()
+        return self
+
+    def on_chunk(self, text):
+        if self.first_chunk is None:
+            self.first_chunk = time.monotonic()
+        self.chunks += 1
+        self.chars += len(text or "")
+
+    def finish(self, response=None):
+        self.finished = time.monotonic()
+        # 콜백 없이 끝난 경우(비스트리밍) 최종 응답으로 보정
+        if not self.chars and isinstance(response, str):
+            self.chars = len(response)
+            if self.first_chunk is None:
+                self.first_chunk = self.finished
+        return self
+
+    @property
+    def ttft(self):
+        if self.started is None or self.first_chunk is None:
+            return None
+        return self.first_chunk - self.started
+
+    @property
+    def duration(self):
+        if self.started is None:
+            return None
+        end = self.finished if self.finished is not None else time.monotonic()
+        return end - self.started
+
+    @property
+    def tokens(self):
+        if self.chunks > 1:
+            return self.chunks
+        return max(1, self.chars // 4) if self.chars else 0
+
+    @property
+    def tokens_per_second(self):
+        # 첫 토큰 이후 구간 기준 (대기 시간 제외)
+        if self.first_chunk is None:
+            return None
+        end = self.finished if self.finished is not None else time.monotonic()
+        elapsed = end - self.first_chunk
+        if elapsed <= 0:
+            return None
+        return self.tokens / elapsed
+
+    def as_dict(self):
+        def _round(value):
+            return round(value, 3) if value is not None else None
+
+        return {
+            "ttft": _round(self.ttft),
+            "duration": _round(self.duration),
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "tokens": self.tokens,
+            "tokens_per_second": _round(self.tokens_per_second),
+        }
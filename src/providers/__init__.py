@@ -1,39 +1,69 @@
-from .openai import OpenAIProvider
-from .stablediffusion import StableDiffusionProvider 
-from .openaiimage import DallE2, DallE3
-from .anthropic import AnthropicProvider
-from .mistral import MistralLargeProvider
-from .gemini import GeminiProvider
-from .perplexity import PerplexityProvider
-from .groq import GroqProvider
-from .openrouter import OpenRouterProvider
-from .ollama import (
-    OllamaProvider,
-)
-from .vllm import VLLMProvider
-from .huggingface import (
-    HuggingFaceProvider,
-)
-from .together import (
-    TogetherProvider,
-)
-
-PROVIDERS = {
+import importlib
+
+# slug -> (모듈, 클래스). 헤드리스 실행 시 필요한 공급자 모듈만 import 하기 위한 목록
+# (slug는 BaseProvider.slugify(name) 결과와 같아야 함)
+PROVIDER_MODULES = {
     # 통합형 프로바이더(벤더 단일 항목만 노출)
-    OpenAIProvider,
-    AnthropicProvider,
-    MistralLargeProvider,  # 라벨은 "Mistral"
-    GeminiProvider,
-    GroqProvider,
-    PerplexityProvider,
-    OpenRouterProvider,
-    HuggingFaceProvider,
-    OllamaProvider,
+    "openai": ("openai", "OpenAIProvider"),
+    "anthropic": ("anthropic", "AnthropicProvider"),
+    "mistral": ("mistral", "MistralLargeProvider"),  # 라벨은 "Mistral"
+    "gemini": ("gemini", "GeminiProvider"),
+    "groq": ("groq", "GroqProvider"),
+    "perplexity": ("perplexity", "PerplexityProvider"),
+    "openrouter": ("openrouter", "OpenRouterProvider"),
+    "huggingface": ("huggingface", "HuggingFaceProvider"),
+    "ollama": ("ollama", "OllamaProvider"),
 
     # 로컬/이미지/기타
-    StableDiffusionProvider,
-    DallE2,
-    DallE3,
-    VLLMProvider,
-    TogetherProvider,
-}
\ No newline at end of file
+    "stable-diffusion": ("stablediffusion", "StableDiffusionProvider"),
+    "dalle-2": ("openaiimage", "DallE2"),
+    "dalle-3": ("openaiimage", "DallE3"),
+    "vllm": ("vllm", "VLLMProvider"),
+    "together-ai": ("together", "TogetherProvider"),
+}
+
+
+def load_provider_class(slug):
+    """Import and return the provider class registered as slug."""
+    module, name = PROVIDER_MODULES[slug]
+    return getattr(importlib.import_module(f".{module}", __name__), name)
+
+
+def create_provider(app, slug, model=None):
+    """Return a fresh instance of the provider registered as slug, or None for unknown slugs.
+
+    Shared by the window app and the headless one so both build providers
+    the same way. The compare view, batch runs, the gateway and D-Bus
+    requests run several calls at once, so each gets its own instance
+    instead of the shared one in app.providers.
+    """
+    shared = app.providers.get(slug)
+    if shared is not None:
+        provider_class = type(shared)
+    elif slug in PROVIDER_MODULES:
+        # D-Bus 요청은 창이 열리기 전에도 들어올 수 있다
+        provider_class = load_provider_class(slug)
+    else:
+        return None
+    provider = provider_class(app, app.win)
+    if model:
+        provider.model = model
+    return provider
+
+
+def build_chat(app, prompt, history=None, system_prompt=None):
+    """Chat payload in the same shape the window passes to providers."""
+    content = list(history or [])
+    content.append({"role": app.user_name, "content": prompt})
+    if system_prompt:
+        content.insert(0, {"role": "system", "content": system_prompt})
+    return {"content": content}
+
+
+def __getattr__(name):
+    # PROVIDERS는 처음 접근할 때 전체 공급자 모듈을 import 한다
+    if name == "PROVIDERS":
+        providers = {load_provider_class(slug) for slug in PROVIDER_MODULES}
+        globals()["PROVIDERS"] = providers
+        return providers
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -22,7 +22,7 @@ class AnthropicBaseProvider(BaseProvider):
             messages.append({"role": role, "content": c["content"]})
 
         if not self.data.get("api_key"):
-            return _("No model selected, you can choose one in preferences")
+            return self.failed(_("No model selected, you can choose one in preferences"))
 
         headers = {
             "x-api-key": self.data.get("api_key", ""),
@@ -40,7 +40,7 @@ class AnthropicBaseProvider(BaseProvider):
             payload["stream"] = True
 
         try:
-            resp = requests.post(
+            resp = self.http.post(
                 "https://api.anthropic.com/v1/messages",
                 headers=headers,
                 json=payload,
@@ -80,7 +80,7 @@ class AnthropicBaseProvider(BaseProvider):
                     return block.get("text", "") if isinstance(block, dict) else str(block)
                 return str(data)
         except requests.exceptions.RequestException:
-            return _("I'm having trouble connecting to the API, please check your internet connection.")
+            return self.failed(_("I'm having trouble connecting to the API, please check your internet connection."))
 
     def ask_stream(self, prompt, chat, callback=None):
         """Stream-enabled version for Anthropic providers"""
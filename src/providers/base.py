@@ -1,9 +1,34 @@
 import unicodedata
+import inspect
 import re
+import threading
 from typing import List, Dict
+import requests
+from requests.adapters import HTTPAdapter
 from gi.repository import Gtk, Adw, GLib
 from enum import Enum
 
+_http_session = None
+_http_lock = threading.Lock()
+
+
+def http_session():
+    """Process-wide requests.Session shared by every provider.
+
+    Keeps TCP/TLS connections to the provider APIs pooled across requests
+    instead of reconnecting for each requests.post call.
+    """
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+
 class ProviderType(Enum):
     IMAGE = _("Image")
     CHAT = _("Chat")
@@ -22,6 +47,8 @@ class BaseProvider:
     has_auth: bool = False
     require_authentification: bool = False
     base_url = "https://github.com/hamonikr/hamonikr-chatbot"
+    # 마지막 generate()가 실패했으면 사용자에게 보여 줄 오류 메시지 (성공하면 None)
+    last_error = None
     
     def __init__(self, app, window):
         self.slug = self.slugify(self.name)
@@ -49,6 +76,10 @@ class BaseProvider:
         finally:
             return self.app.data["providers"][self.slug]["data"]
 
+    @property
+    def http(self):
+        return http_session()
+
     @property
     def enabled(self):
         return  self.app.data["providers"][self.slug]["enabled"]
@@ -83,11 +114,42 @@ class BaseProvider:
             callback: Function to call with each token/chunk
         """
         # Fallback to non-streaming for providers that don't support it
-        response = self.ask(prompt, chat, stream=False)
-        if callback and response:
+        # (several providers only accept ask(prompt, chat))
+        response = self.ask(prompt, chat)
+        if callback and response and isinstance(response, str):
             callback(response)
         return response
 
+    def failed(self, message):
+        """Record message as the error of this call and return it.
+
+        ask() returns errors as text the chat shows like an answer; callers
+        that must tell them apart (batch runs) check last_error afterwards.
+        """
+        self.last_error = message
+        return message
+
+    def generate(self, prompt, chat, callback=None, system_prompt=None):
+        """
+        Ask the provider, streaming chunks to callback when one is given.
+
+        system_prompt is only forwarded to providers whose ask/ask_stream
+        accept it, so callers don't need to inspect each provider themselves.
+        last_error is set if the provider reported a failure.
+        """
+        self.last_error = None
+        method = self.ask_stream if callback else self.ask
+        kwargs = {}
+        if system_prompt:
+            try:
+                if "system_prompt" in inspect.signature(method).parameters:
+                    kwargs["system_prompt"] = system_prompt
+            except (TypeError, ValueError):
+                pass
+        if callback:
+            kwargs["callback"] = callback
+        return method(prompt, chat, **kwargs)
+
     def load_authentification(self):
         """Must set self.has_auth to True when auth is done"""
         raise NotImplementedError()
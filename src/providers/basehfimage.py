@@ -1,9 +1,8 @@
 from .baseimage import BaseImageProvider
-import requests
+from ..blob_store import open_image
 import json
 from gi.repository import Gtk, Adw, GLib
-from PIL import Image, UnidentifiedImageError
-import io
+from PIL import UnidentifiedImageError
 
 
 class BaseHFImageProvider(BaseImageProvider):
@@ -17,14 +16,14 @@ class BaseHFImageProvider(BaseImageProvider):
         def query(payload):
             if self.data.get('api_key'):
                 headers = {"Authorization": f"Bearer {self.data['api_key']}"}
-                response = requests.post(API_URL, json=payload, headers=headers)
+                response = self.http.post(API_URL, json=payload, headers=headers)
             else:
-                response = requests.post(API_URL, json=payload)
+                response = self.http.post(API_URL, json=payload)
 
             if response.status_code == 403:
-                return _("You've reached the rate limit! Please add a token to the preferences. You can get the token by following this [guide](https://github.com/hamonikr/hamonikr-chatbot)")
+                return self.failed(_("You've reached the rate limit! Please add a token to the preferences. You can get the token by following this [guide](https://github.com/hamonikr/hamonikr-chatbot)"))
             elif response.status_code != 200:
-                return _("Sorry, I don't know what to say! (Error: {response.status_code})")
+                return self.failed(_("Sorry, I don't know what to say! (Error: {response.status_code})"))
 
             return response.content
        
@@ -36,7 +35,7 @@ class BaseHFImageProvider(BaseImageProvider):
 
         if output:
             try:
-                return Image.open(io.BytesIO(output))
+                return open_image(output)
             except UnidentifiedImageError:
                 return output
 
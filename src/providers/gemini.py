@@ -23,7 +23,7 @@ class GeminiProvider(BaseProvider):
     
     def ask(self, prompt, chat):
         if not self.api_key:
-            return _("Please configure your Gemini API key in preferences.")
+            return self.failed(_("Please configure your Gemini API key in preferences."))
         
         try:
             model = genai.GenerativeModel(self.model)
@@ -46,13 +46,13 @@ class GeminiProvider(BaseProvider):
             
         except Exception as e:
             if "API_KEY_INVALID" in str(e):
-                return _("Your API key is invalid, please check your preferences.")
+                return self.failed(_("Your API key is invalid, please check your preferences."))
             elif "RATE_LIMIT" in str(e):
-                return _("Rate limit exceeded. Please try again later.")
+                return self.failed(_("Rate limit exceeded. Please try again later."))
             elif "quota" in str(e).lower():
-                return _("You exceeded your current quota, please check your plan and billing details.")
+                return self.failed(_("You exceeded your current quota, please check your plan and billing details."))
             else:
-                return _(f"Error: {str(e)}")
+                return self.failed(_(f"Error: {str(e)}"))
     
     def get_settings_rows(self):
         self.rows = []
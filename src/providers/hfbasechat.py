@@ -1,7 +1,5 @@
 from .base import BaseProvider, ProviderType
 
-import requests
-
 from gi.repository import Gtk, Adw, GLib
 
 
@@ -17,9 +15,9 @@ class BaseHFChatProvider(BaseProvider):
         def query(payload):
             if self.data.get('api_key'):
                 headers = {"Authorization": f"Bearer {self.data['api_key']}"}
-                response = requests.post(API_URL, json=payload, headers=headers)
+                response = self.http.post(API_URL, json=payload, headers=headers)
             else:
-                response = requests.post(API_URL, json=payload)
+                response = self.http.post(API_URL, json=payload)
 
             return response.json()
             
@@ -42,12 +40,12 @@ class BaseHFChatProvider(BaseProvider):
         elif 'error' in output:
             match output['error']:
                 case "Rate limit reached. Please log in or use your apiToken":
-                    return _("You've reached the rate limit! Please add a token to the preferences. You can get the token by following this [guide](https://github.com/hamonikr/hamonikr-chatbot)")
+                    return self.failed(_("You've reached the rate limit! Please add a token to the preferences. You can get the token by following this [guide](https://github.com/hamonikr/hamonikr-chatbot)"))
         elif isinstance(output, list):
             if 'generated_text' in output[0]:
                 return output[0]['generated_text']
         else:
-            return _("Sorry, I don't know what to say! (Error: {output})")
+            return self.failed(_("Sorry, I don't know what to say! (Error: {output})"))
 
     def get_settings_rows(self):
         self.rows = []
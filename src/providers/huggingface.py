@@ -21,7 +21,7 @@ class HuggingFaceProvider(BaseProvider):
     
     def ask(self, prompt, chat):
         if not self.api_key:
-            return _("Please configure your HuggingFace API token in preferences.")
+            return self.failed(_("Please configure your HuggingFace API token in preferences."))
         
         # Build conversation context
         context = ""
@@ -49,7 +49,7 @@ class HuggingFaceProvider(BaseProvider):
         }
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}/{self.model}",
                 headers=headers,
                 json=data,
@@ -57,11 +57,11 @@ class HuggingFaceProvider(BaseProvider):
             )
             
             if response.status_code == 401:
-                return _("Your API token is invalid, please check your preferences.")
+                return self.failed(_("Your API token is invalid, please check your preferences."))
             elif response.status_code == 429:
-                return _("Rate limit exceeded. Please try again later.")
+                return self.failed(_("Rate limit exceeded. Please try again later."))
             elif response.status_code == 503:
-                return _("Model is loading. Please try again in a few seconds.")
+                return self.failed(_("Model is loading. Please try again in a few seconds."))
             elif response.status_code == 200:
                 result = response.json()
                 if isinstance(result, list) and len(result) > 0:
@@ -72,14 +72,14 @@ class HuggingFaceProvider(BaseProvider):
                     return str(result)
             else:
                 error_msg = response.json().get("error", response.text)
-                return _(f"Error: {error_msg}")
+                return self.failed(_(f"Error: {error_msg}"))
                 
         except requests.exceptions.ConnectionError:
-            return _("I'm having trouble connecting to the API, please check your internet connection.")
+            return self.failed(_("I'm having trouble connecting to the API, please check your internet connection."))
         except requests.exceptions.Timeout:
-            return _("Request timed out. Please try again.")
+            return self.failed(_("Request timed out. Please try again."))
         except Exception as e:
-            return _(f"Error: {str(e)}")
+            return self.failed(_(f"Error: {str(e)}"))
     
     def get_settings_rows(self):
         self.rows = []
@@ -24,7 +24,7 @@ class MistralBaseProvider(BaseProvider):
             messages.append({"role": role, "content": c["content"]})
 
         if not self.data.get("api_key"):
-            return _("No model selected, you can choose one in preferences")
+            return self.failed(_("No model selected, you can choose one in preferences"))
 
         headers = {
             "Authorization": f"Bearer {self.data.get('api_key', '')}",
@@ -32,7 +32,7 @@ class MistralBaseProvider(BaseProvider):
         }
 
         try:
-            resp = requests.post(
+            resp = self.http.post(
                 "https://api.mistral.ai/v1/chat/completions",
                 headers=headers,
                 json={
@@ -48,7 +48,7 @@ class MistralBaseProvider(BaseProvider):
             message = choice.get("message", {})
             return message.get("content", "")
         except requests.exceptions.RequestException:
-            return _("I'm having trouble connecting to the API, please check your internet connection.")
+            return self.failed(_("I'm having trouble connecting to the API, please check your internet connection."))
 
     def get_settings_rows(self):
         self.rows = []
@@ -46,7 +46,7 @@ class OllamaProvider(BaseProvider):
         }
 
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}/api/chat",
                 headers=headers,
                 json=data,
@@ -55,9 +55,9 @@ class OllamaProvider(BaseProvider):
             )
 
             if response.status_code == 404:
-                return _(f"Model '{self.model}' not found. Please pull it first with: ollama pull {self.model}")
+                return self.failed(_(f"Model '{self.model}' not found. Please pull it first with: ollama pull {self.model}"))
             if response.status_code != 200:
-                return _(f"Error: {response.status_code} - {response.text}")
+                return self.failed(_(f"Error: {response.status_code} - {response.text}"))
 
             if stream and callback:
                 full_text = ""
@@ -90,11 +90,11 @@ class OllamaProvider(BaseProvider):
                     return str(result)
 
         except requests.exceptions.ConnectionError:
-            return _("Cannot connect to Ollama. Make sure Ollama is running (ollama serve).")
+            return self.failed(_("Cannot connect to Ollama. Make sure Ollama is running (ollama serve)."))
         except requests.exceptions.Timeout:
-            return _("Request timed out. The model might be loading or processing.")
+            return self.failed(_("Request timed out. The model might be loading or processing."))
         except Exception as e:
-            return _(f"Error: {str(e)}")
+            return self.failed(_(f"Error: {str(e)}"))
 
     def ask_stream(self, prompt, chat, callback=None, system_prompt=None):
         # Convenience wrapper to enable streaming
@@ -102,7 +102,7 @@ class OllamaProvider(BaseProvider):
     
     def get_available_models(self):
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.http.get(f"{self.base_url}/api/tags", timeout=5)
             if response.status_code == 200:
                 models = response.json().get("models", [])
                 return [model["name"] for model in models]
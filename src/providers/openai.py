@@ -39,7 +39,7 @@ class BaseOpenAIProvider(BaseProvider):
 
     def ask(self, prompt, chat, stream=False, callback=None):
         if not self.client:
-            return _("OpenAI client not initialized. Please check your API key in preferences.")
+            return self.failed(_("OpenAI client not initialized. Please check your API key in preferences."))
             
         _chat = []
         for c in chat["content"]:
@@ -75,17 +75,17 @@ class BaseOpenAIProvider(BaseProvider):
                             ).choices[0].message.content
                     return response
             except openai.AuthenticationError:
-                return _("Your API key is invalid, please check your preferences.")
+                return self.failed(_("Your API key is invalid, please check your preferences."))
             except openai.BadRequestError:
-                return _("You don't have access to this model, please check your plan and billing details.")
+                return self.failed(_("You don't have access to this model, please check your plan and billing details."))
             except openai.RateLimitError:
-                return _("You exceeded your current quota, please check your plan and billing details.")
+                return self.failed(_("You exceeded your current quota, please check your plan and billing details."))
             except openai.APIConnectionError:
-                return _("I'm having trouble connecting to the API, please check your internet connection.")
+                return self.failed(_("I'm having trouble connecting to the API, please check your internet connection."))
             except socket.gaierror:
-                return _("I'm having trouble connecting to the API, please check your internet connection.")
+                return self.failed(_("I'm having trouble connecting to the API, please check your internet connection."))
         else:
-            return _("No model selected, you can choose one in preferences")
+            return self.failed(_("No model selected, you can choose one in preferences"))
 
     def ask_stream(self, prompt, chat, callback=None):
         """Stream-enabled version for OpenAI providers"""
@@ -1,13 +1,12 @@
 from .baseimage import BaseImageProvider
+from ..blob_store import open_image
 import openai
 from openai import OpenAI
 import socket
 import os
 import json
-import io
 import base64
-import requests
-from PIL import Image, UnidentifiedImageError
+from PIL import UnidentifiedImageError
 from gettext import gettext as _
 
 from gi.repository import Gtk, Adw, GLib
@@ -44,10 +43,10 @@ class BaseOpenAIImageProvider(BaseImageProvider):
 
     def ask(self, prompt, chat):
         if not self.client:
-            return _("OpenAI client not initialized. Please check your API key in preferences.")
+            return self.failed(_("OpenAI client not initialized. Please check your API key in preferences."))
         
         if not self.model:
-            return _("No model selected, you can choose one in preferences")
+            return self.failed(_("No model selected, you can choose one in preferences"))
 
         # 이미지 생성은 프롬프트를 문자열로 전달해야 함
         prompt_str = str(prompt)
@@ -82,29 +81,29 @@ class BaseOpenAIImageProvider(BaseImageProvider):
             if image_bytes is None:
                 image_url = getattr(data0, "url", None)
                 if image_url:
-                    image_bytes = requests.get(image_url, timeout=30).content
+                    image_bytes = self.http.get(image_url, timeout=30).content
 
             if image_bytes:
                 try:
-                    return Image.open(io.BytesIO(image_bytes))
+                    return open_image(image_bytes)
                 except UnidentifiedImageError:
                     try:
                         error = json.loads(image_bytes).get("error")
                         return str(error)
                     except Exception:
-                        return _("Failed to decode image data")
+                        return self.failed(_("Failed to decode image data"))
             return None
 
         except openai.AuthenticationError:
-            return _("Your API key is invalid, please check your preferences.")
+            return self.failed(_("Your API key is invalid, please check your preferences."))
         except openai.BadRequestError as e:
-            return _("You don't have access to this model, please check your plan and billing details.")
+            return self.failed(_("You don't have access to this model, please check your plan and billing details."))
         except openai.RateLimitError:
-            return _("You exceeded your current quota, please check your plan and billing details.")
+            return self.failed(_("You exceeded your current quota, please check your plan and billing details."))
         except openai.APIConnectionError:
-            return _("I'm having trouble connecting to the API, please check your internet connection.")
+            return self.failed(_("I'm having trouble connecting to the API, please check your internet connection."))
         except socket.gaierror:
-            return _("I'm having trouble connecting to the API, please check your internet connection.")
+            return self.failed(_("I'm having trouble connecting to the API, please check your internet connection."))
 
 
     def get_settings_rows(self):
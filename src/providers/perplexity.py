@@ -21,7 +21,7 @@ class PerplexityProvider(BaseProvider):
     
     def ask(self, prompt, chat):
         if not self.api_key:
-            return _("Please configure your Perplexity API key in preferences.")
+            return self.failed(_("Please configure your Perplexity API key in preferences."))
         
         # Convert chat history to Perplexity format
         messages = []
@@ -48,7 +48,7 @@ class PerplexityProvider(BaseProvider):
         }
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}/chat/completions",
                 headers=headers,
                 json=data,
@@ -56,21 +56,21 @@ class PerplexityProvider(BaseProvider):
             )
             
             if response.status_code == 401:
-                return _("Your API key is invalid, please check your preferences.")
+                return self.failed(_("Your API key is invalid, please check your preferences."))
             elif response.status_code == 429:
-                return _("Rate limit exceeded. Please try again later.")
+                return self.failed(_("Rate limit exceeded. Please try again later."))
             elif response.status_code == 200:
                 result = response.json()
                 return result["choices"][0]["message"]["content"]
             else:
-                return _(f"Error: {response.status_code} - {response.text}")
+                return self.failed(_(f"Error: {response.status_code} - {response.text}"))
                 
         except requests.exceptions.ConnectionError:
-            return _("I'm having trouble connecting to the API, please check your internet connection.")
+            return self.failed(_("I'm having trouble connecting to the API, please check your internet connection."))
         except requests.exceptions.Timeout:
-            return _("Request timed out. Please try again.")
+            return self.failed(_("Request timed out. Please try again."))
         except Exception as e:
-            return _(f"Error: {str(e)}")
+            return self.failed(_(f"Error: {str(e)}"))
     
     def get_settings_rows(self):
         self.rows = []
@@ -1,7 +1,6 @@
 from .base import BaseProvider
 
 import json
-import requests
 
 class BasePetalsProvider(BaseProvider):
     provider = None
@@ -24,9 +23,9 @@ class BasePetalsProvider(BaseProvider):
             
         r = f"{API_URL}?model={self.model}&do_sample=1&temperature=0.75&top_p=0.9&max_length=1000&inputs={prompt}"
         
-        output = requests.post(r).json()
+        output = self.http.post(r).json()
 
         if output["ok"]:
             return output["outputs"]
         else:
-            return _("I'm sorry, I don't know what to say!")
\ No newline at end of file
+            return self.failed(_("I'm sorry, I don't know what to say!"))
\ No newline at end of file
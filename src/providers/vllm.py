@@ -48,7 +48,7 @@ class VLLMProvider(BaseProvider):
         }
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}/v1/chat/completions",
                 headers=headers,
                 json=data,
@@ -59,18 +59,18 @@ class VLLMProvider(BaseProvider):
                 result = response.json()
                 return result["choices"][0]["message"]["content"]
             elif response.status_code == 404:
-                return _(f"Model '{self.model}' not found. Please check the model name and ensure it's loaded in vLLM.")
+                return self.failed(_(f"Model '{self.model}' not found. Please check the model name and ensure it's loaded in vLLM."))
             elif response.status_code == 401:
-                return _("Authentication failed. Please check your API key if required.")
+                return self.failed(_("Authentication failed. Please check your API key if required."))
             else:
-                return _(f"Error: {response.status_code} - {response.text}")
+                return self.failed(_(f"Error: {response.status_code} - {response.text}"))
                 
         except requests.exceptions.ConnectionError:
-            return _("Cannot connect to vLLM server. Make sure vLLM is running at the specified URL.")
+            return self.failed(_("Cannot connect to vLLM server. Make sure vLLM is running at the specified URL."))
         except requests.exceptions.Timeout:
-            return _("Request timed out. The model might be loading or processing.")
+            return self.failed(_("Request timed out. The model might be loading or processing."))
         except Exception as e:
-            return _(f"Error: {str(e)}")
+            return self.failed(_(f"Error: {str(e)}"))
     
     def get_settings_rows(self):
         self.rows = []
@@ -0,0 +1,199 @@
+"""Retention policies that keep the history within a size and age budget.
+
+The budget covers everything the history occupies on disk: the chats in
+data.json, their archive files and the image blobs they refer to (a blob
+shared by several messages is counted once). Janitor.run_async() enforces
+it on a worker thread:
+
+1. threads not used for max_days are deleted;
+2. while over max_bytes, the oldest threads are archived (compressing them
+   out of data.json), then, if that is not enough, deleted;
+3. blobs no chat refers to any more are removed from the blob store,
+   together with their cached thumbnails.
+
+Starred threads are exempt when keep_starred is set, and threads open in a
+window are never touched. Like the Archiver, the worker only works from a
+snapshot; deletions and archive stubs are applied on the main thread and
+skipped for chats that changed in the meantime. A deleted thread leaves a
+tombstone, so other instances drop it too.
+"""
+
+import json
+import sys
+import threading
+import time
+
+from . import archive, blob_store, storage
+
+
+def chat_size(chat, content):
+    """Bytes the chat takes in data.json plus its archive file."""
+    meta = {key: value for key, value in chat.items() if key != "content"}
+    size = len(json.dumps(meta).encode("utf-8"))
+    if archive.is_archived(chat):
+        return size + chat["archived"].get("size", 0)
+    return size + len(json.dumps(content).encode("utf-8"))
+
+
+class Janitor:
+    """Enforces max_bytes / max_days on the storage's chats (see module docstring)."""
+
+    def __init__(self, storage, schedule):
+        self.storage = storage
+        self.schedule = schedule
+        self.running = False
+
+    def run_async(self, max_bytes=0, max_days=0, keep_starred=True, keep=(), on_done=None):
+        """Start a pass; on_done(archived, removed) runs on the main thread. 0 turns a limit off."""
+        if self.running:
+            return False
+        snapshot = []
+        for chat in self.storage.data["chats"]:
+            meta = {key: value for key, value in chat.items() if key != "content"}
+            snapshot.append((chat, meta, list(chat.get("content", []))))
+        self.running = True
+
+        def run():
+            try:
+                plan = self.plan(snapshot, max_bytes, max_days, keep_starred, keep)
+            except Exception as e:
+                print(f"Retention pass failed: {e}", file=sys.stderr)
+                plan = ([], [], None)
+            self.schedule(self._apply, snapshot, plan, on_done)
+
+        threading.Thread(target=run, name="retention", daemon=True).start()
+        return True
+
+    def exempt(self, chat, keep_starred, keep):
+        return (
+            (keep_starred and chat.get("starred"))
+            or chat.get("id") in keep
+            or storage.is_streaming(chat)
+        )
+
+    def plan(self, snapshot, max_bytes, max_days, keep_starred, keep):
+        """Decide what to archive and delete (worker thread).
+
+        Returns (archive results, chats to delete, id(chat) -> blob digests
+        or None where they are unknown).
+        """
+        sizes = {}
+        blobs = {}
+        for chat, meta, content in snapshot:
+            sizes[id(chat)] = chat_size(meta, content)
+            try:
+                blobs[id(chat)] = archive.thread_blobs(meta) if archive.is_archived(meta) else blob_store.referenced(content)
+            except (OSError, ValueError, KeyError) as e:
+                # 참조를 모르는 blob은 지우면 안 되므로 이번 blob 정리는 건너뛴다
+                print(f"Failed to read archived chat {meta.get('id')}: {e}", file=sys.stderr)
+                blobs[id(chat)] = None
+
+        # blob은 가리키는 채팅이 모두 지워져야 공간이 돌아온다
+        users = {}
+        for digests in blobs.values():
+            for digest in digests or ():
+                users[digest] = users.get(digest, 0) + 1
+        blob_sizes = {digest: blob_store.size(digest) for digest in users}
+        total = sum(sizes.values()) + sum(blob_sizes.values())
+
+        candidates = sorted(
+            (entry for entry in snapshot if not self.exempt(entry[1], keep_starred, keep)),
+            key=lambda entry: archive.last_used(entry[1]),
+        )
+        removed = []
+
+        def remove(entry):
+            nonlocal total
+            chat = entry[0]
+            removed.append(chat)
+            total -= sizes[id(chat)]
+            for digest in blobs[id(chat)] or ():
+                users[digest] -= 1
+                if not users[digest]:
+                    total -= blob_sizes[digest]
+
+        if max_days > 0:
+            cutoff = time.time() - max_days * 86400
+            for entry in candidates:
+                if archive.last_used(entry[1]) < cutoff:
+                    remove(entry)
+            gone = {id(chat) for chat in removed}
+            candidates = [entry for entry in candidates if id(entry[0]) not in gone]
+
+        archived = []
+        if max_bytes > 0 and total > max_bytes:
+            # 먼저 보관해 data.json을 줄이고, 그래도 넘치면 오래된 것부터 지운다
+            for chat, meta, content in candidates:
+                if total <= max_bytes:
+                    break
+                if archive.is_archived(meta) or not content:
+                    continue
+                try:
+                    entry = archive.write_thread(meta, content)
+                except (OSError, ValueError) as e:
+                    print(f"Failed to archive chat {meta.get('id')}: {e}", file=sys.stderr)
+                    continue
+                archived.append((chat, meta, content, entry))
+                stub = dict(meta, archived=entry)
+                total += chat_size(stub, []) - sizes[id(chat)]
+                sizes[id(chat)] = chat_size(stub, [])
+            for entry in candidates:
+                if total <= max_bytes:
+                    break
+                remove(entry)
+
+        return archived, removed, blobs
+
+    def _apply(self, snapshot, plan, on_done):
+        archived_results, planned, blobs = plan
+        present = {id(chat) for chat in self.storage.data["chats"]}
+        meta_of = {id(chat): meta for chat, meta, _content in snapshot}
+
+        removed = []
+        for chat in planned:
+            meta = meta_of[id(chat)]
+            # 그사이 지워졌거나, 바뀌었거나, 열린 채팅은 남긴다
+            if id(chat) not in present or archive.last_used(chat) != archive.last_used(meta):
+                continue
+            self.storage.data["chats"].remove(chat)
+            self.storage.chat_removed(chat)
+            archive.remove_thread(chat)
+            removed.append(chat)
+        gone = {id(chat) for chat in removed}
+
+        archived = []
+        for chat, meta, content, entry in archived_results:
+            if (
+                id(chat) in gone
+                or id(chat) not in present
+                or archive.is_archived(chat)
+                or archive.last_used(chat) != archive.last_used(meta)
+                or len(chat.get("content", [])) != len(content)
+            ):
+                continue
+            chat["content"] = []
+            chat["archived"] = entry
+            self.storage.chat_archived(chat)
+            archived.append(chat)
+
+        # 지우지 않은 채팅이 가리키는 blob만 남긴다
+        # (참조를 모르는 채팅이 있거나 data.json이 손상되어 일부만 읽었으면 건너뜀)
+        kept = [digests for key, digests in (blobs or {}).items() if key not in gone]
+        if blobs and not self.storage.recovered and all(digests is not None for digests in kept):
+            keep = set().union(*kept)
+            threading.Thread(target=self._collect, args=(keep,), name="retention-blobs", daemon=True).start()
+        else:
+            self.running = False
+
+        if on_done is not None:
+            on_done(archived, removed)
+        return False
+
+    def _collect(self, keep):
+        try:
+            count, freed = blob_store.collect(keep)
+            if count:
+                print(f"Removed {count} unused images and thumbnails ({freed} bytes)", file=sys.stderr)
+        finally:
+            self.running = False
+
@@ -0,0 +1,326 @@
+"""In-process full-text index over chat titles and messages.
+
+Korean (and other CJK) text is indexed as overlapping character bigrams,
+since users rarely type the same word boundaries the model used; Latin
+text and digits are indexed as lower-cased words. A query matches a chat
+when every query term occurs in it, the last term also matching as a
+prefix while the user is still typing, and chats are ranked by tf-idf
+with title hits weighted above message hits.
+
+The index listens to storage.Storage hooks and is updated incrementally
+as messages are appended; only edits and deletions re-index a whole chat.
+Archived chats are indexed from their archive file, so they stay
+searchable without their messages being kept in memory.
+"""
+
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from . import archive
+from .storage import MESSAGE_TEXT, STATUS_STREAMING
+
+TITLE_WEIGHT = 3
+
+_CJK = "ㄱ-ㆎ가-힣぀-ヿ一-鿿"
+_re_token = re.compile(rf"([{_CJK}]+)|((?:(?![{_CJK}])[^\W_])+)")
+_re_cjk = re.compile(rf"[{_CJK}]")
+
+
+def is_cjk(token):
+    return bool(_re_cjk.match(token))
+
+
+def tokenize(text):
+    """Split text into index terms: CJK bigrams and lower-cased words."""
+    tokens = []
+    for cjk, word in _re_token.findall(str(text).lower()):
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def _message_text(message):
+    # 이미지/오류 메시지는 검색 대상에서 제외
+    if message.get("type", MESSAGE_TEXT) != MESSAGE_TEXT:
+        return ""
+    content = message.get("content", "")
+    return content if isinstance(content, str) else ""
+
+
+class SearchIndex:
+    """Inverted index keyed by chat id.
+
+    Mutations are cheap and meant to be called from the main thread right
+    after the data changes; rebuild_async() does the initial full build on a
+    worker thread, and changes made while it runs are re-applied once it
+    finishes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready = False
+        self._reset()
+        self._stale = {}
+        self._generation = 0
+
+    def _reset(self):
+        self.postings = defaultdict(dict)  # token -> {chat id: weight}
+        self.titles = {}  # chat id -> Counter
+        self.bodies = {}  # chat id -> Counter
+        self.indexed = {}  # chat id -> number of messages indexed
+        self.cjk_chars = defaultdict(set)  # 한 글자 -> 그 글자를 포함한 bigram
+        self._vocab = None
+
+    # 빌드
+
+    def rebuild_async(self, chats, on_ready=None):
+        """Index chats on a worker thread; on_ready() is called from that thread."""
+        with self.lock:
+            self.ready = False
+            self._stale = {}
+            self._generation += 1
+            generation = self._generation
+        chats = list(chats)
+
+        def run():
+            fresh = SearchIndex()
+            for chat in chats:
+                fresh._add_chat(chat)
+            with self.lock:
+                if generation != self._generation:
+                    return  # 더 새로운 빌드가 시작됨
+                self.postings = fresh.postings
+                self.titles = fresh.titles
+                self.bodies = fresh.bodies
+                self.indexed = fresh.indexed
+                self.cjk_chars = fresh.cjk_chars
+                self._vocab = None
+                for key, chat in self._stale.items():
+                    self._remove_chat(key)
+                    if chat is not None:
+                        self._add_chat(chat)
+                self._stale = {}
+                self.ready = True
+            if on_ready is not None:
+                on_ready()
+
+        threading.Thread(target=run, name="search-index", daemon=True).start()
+
+    def clear(self):
+        with self.lock:
+            self._generation += 1
+            self._reset()
+            self._stale = {}
+            self.ready = True
+
+    # 증분 갱신 (Storage 리스너 훅과 같은 이름)
+
+    def chat_added(self, chat):
+        self._update(chat.get("id"), chat)
+
+    def chats_added(self, chats):
+        for chat in chats:
+            self._update(chat.get("id"), chat)
+
+    def chat_updated(self, chat):
+        self._update(chat.get("id"), chat)
+
+    def chat_removed(self, chat):
+        self._update(chat.get("id"), None)
+
+    def chats_cleared(self):
+        self.clear()
+
+    def chat_archived(self, chat):
+        pass  # 본문은 이미 색인되어 있다
+
+    def chat_rehydrated(self, chat):
+        pass
+
+    def message_added(self, chat, message=None):
+        """Index messages appended to chat since the last call."""
+        key = chat.get("id")
+        with self.lock:
+            if not self.ready:
+                self._stale[key] = chat
+                return
+            if key not in self.indexed:
+                self._add_chat(chat)
+            else:
+                self._index_tail(key, chat)
+
+    def message_updated(self, chat, message=None):
+        if message is not None and message.get("status") == STATUS_STREAMING:
+            return  # 스트리밍 중간 저장은 무시하고 끝났을 때 색인
+        key = chat.get("id")
+        with self.lock:
+            pending_tail = self.ready and self.indexed.get(key, 0) < len(chat.get("content", []))
+        if pending_tail:
+            # 스트리밍이 끝난 마지막 메시지처럼 아직 색인되지 않은 꼬리만 추가
+            self.message_added(chat, message)
+        else:
+            self._update(key, chat)
+
+    def message_removed(self, chat, message=None):
+        self._update(chat.get("id"), chat)
+
+    def _update(self, key, chat):
+        with self.lock:
+            if not self.ready:
+                self._stale[key] = chat
+                return
+            body = None
+            if chat is not None and archive.is_archived(chat) and key in self.bodies:
+                # 보관된 채팅의 제목/별표가 바뀐 경우 본문 파일은 다시 읽지 않는다
+                body = (self.bodies[key], self.indexed[key])
+            self._remove_chat(key)
+            if chat is not None:
+                self._add_chat(chat, body)
+
+    def _add_chat(self, chat, body=None):
+        key = chat.get("id")
+        counts = Counter(tokenize(chat.get("title", "")))
+        self.titles[key] = counts
+        self._apply(key, counts, TITLE_WEIGHT)
+        if body is None and archive.is_archived(chat):
+            body = self._archived_body(chat)
+        if body is not None:
+            counts, indexed = body
+            self.bodies[key] = Counter(counts)
+            self._apply(key, counts, 1)
+            self.indexed[key] = indexed
+            return
+        self.bodies[key] = Counter()
+        self.indexed[key] = 0
+        self._index_tail(key, chat)
+
+    def _archived_body(self, chat):
+        try:
+            content = archive.read_thread(chat)
+        except (OSError, ValueError, KeyError):
+            return Counter(), 0
+        counts = Counter()
+        for message in content:
+            counts.update(tokenize(_message_text(message)))
+        # 다시 불러오면 content가 이 메시지들이 되므로, 이후 추가분만 꼬리로 색인된다
+        return counts, len(content)
+
+    def _index_tail(self, key, chat):
+        content = chat.get("content", [])
+        end = len(content)
+        # 스트리밍 중인(또는 아직 빈) 어시스턴트 메시지는 완료된 뒤에 색인한다
+        if end and (not content[-1].get("content") or content[-1].get("status") == STATUS_STREAMING):
+            end -= 1
+        start = self.indexed.get(key, 0)
+        if end <= start:
+            return
+        counts = Counter()
+        for message in content[start:end]:
+            counts.update(tokenize(_message_text(message)))
+        self.bodies[key].update(counts)
+        self._apply(key, counts, 1)
+        self.indexed[key] = end
+
+    def _remove_chat(self, key):
+        self._apply(key, self.titles.pop(key, Counter()), -TITLE_WEIGHT)
+        self._apply(key, self.bodies.pop(key, Counter()), -1)
+        self.indexed.pop(key, None)
+
+    def _apply(self, key, counts, weight):
+        for token, count in counts.items():
+            docs = self.postings[token]
+            value = docs.get(key, 0) + count * weight
+            if value > 0:
+                if not docs:
+                    self._new_token(token)
+                docs[key] = value
+            else:
+                docs.pop(key, None)
+                if not docs:
+                    del self.postings[token]
+                    self._drop_token(token)
+
+    def _new_token(self, token):
+        if is_cjk(token):
+            for char in token:
+                self.cjk_chars[char].add(token)
+        else:
+            self._vocab = None
+
+    def _drop_token(self, token):
+        if is_cjk(token):
+            for char in token:
+                self.cjk_chars[char].discard(token)
+        else:
+            self._vocab = None
+
+    # 검색
+
+    def search(self, query, limit=None):
+        """Return [(chat id, score)] best first, or None while the index is building."""
+        terms = tokenize(query)
+        with self.lock:
+            if not self.ready:
+                return None
+            if not terms:
+                return []
+            result = None
+            for position, term in enumerate(terms):
+                scores = self._term_scores(term, prefix=position == len(terms) - 1)
+                if result is None:
+                    result = scores
+                else:
+                    result = {key: score + scores[key] for key, score in result.items() if key in scores}
+                if not result:
+                    return []
+        hits = sorted(result.items(), key=lambda hit: hit[1], reverse=True)
+        return hits[:limit] if limit else hits
+
+    def _term_scores(self, term, prefix=False):
+        total = max(len(self.titles), 1)
+        scores = {}
+        for token in self._expand(term, prefix):
+            docs = self.postings.get(token)
+            if not docs:
+                continue
+            idf = math.log(1 + total / len(docs))
+            for key, weight in docs.items():
+                score = (1 + math.log(weight)) * idf
+                if score > scores.get(key, 0):
+                    scores[key] = score
+        return scores
+
+    def _expand(self, term, prefix):
+        if is_cjk(term):
+            if len(term) == 1:
+                # 한 글자 검색어는 그 글자가 들어간 모든 bigram과 일치
+                return [term] + list(self.cjk_chars.get(term, ()))
+            return [term]
+        if not prefix:
+            return [term]
+        if self._vocab is None:
+            self._vocab = sorted(token for token in self.postings if not is_cjk(token))
+        tokens = []
+        index = bisect_left(self._vocab, term)
+        while index < len(self._vocab) and self._vocab[index].startswith(term):
+            tokens.append(self._vocab[index])
+            index += 1
+        return tokens
+
+
+_default = None
+
+
+def get_default():
+    global _default
+    if _default is None:
+        _default = SearchIndex()
+    return _default
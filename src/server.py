@@ -0,0 +1,284 @@
+"""Local OpenAI-compatible gateway: ``hamonikr-chatbot --no-gui --serve``.
+
+Exposes ``GET /v1/models`` and ``POST /v1/chat/completions`` (streaming and
+non-streaming) on localhost and routes each request to one of the providers
+enabled in data.json. Models are addressed as ``<provider>/<model>`` (or just
+``<provider>`` for its configured model); a bare model id goes to the
+current provider. Each request gets its own provider instance, since
+providers keep per-call state; all of them share the pooled HTTP session
+from providers.base.
+"""
+
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .metrics import StreamMetrics
+from .providers import PROVIDER_MODULES, load_provider_class
+from .providers.base import ProviderType
+
+MODELS_TTL = 300
+
+
+class Gateway:
+    """Routing and caches shared by all request handler threads."""
+
+    def __init__(self, app):
+        self.app = app
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def enabled_slugs(self):
+        providers = self.app.data.get("providers", {})
+        return [
+            slug for slug in PROVIDER_MODULES
+            if providers.get(slug, {}).get("enabled")
+        ]
+
+    def provider(self, slug, model=None):
+        """New provider instance for one request (providers are not thread-safe)."""
+        return self.app.create_provider(slug, model or None)
+
+    def resolve(self, name):
+        """Map an OpenAI model name to (slug, model) or None."""
+        name = (name or "").strip()
+        enabled = self.enabled_slugs()
+        if "/" in name:
+            slug, model = name.split("/", 1)
+            if slug in enabled:
+                return slug, model or None
+        if name in enabled:
+            return name, None
+        if self.app.current_provider in enabled:
+            return self.app.current_provider, name or None
+        return None
+
+    def list_models(self):
+        """Every enabled chat provider and its models, cached for MODELS_TTL seconds."""
+        entries = []
+        now = time.time()
+        for slug in self.enabled_slugs():
+            if load_provider_class(slug).provider_type != ProviderType.CHAT:
+                continue
+            with self._lock:
+                cached = self._models.get(slug)
+            if cached is None or now - cached[0] > MODELS_TTL:
+                provider = self.provider(slug)
+                models = []
+                if hasattr(provider, "get_available_models"):
+                    try:
+                        models = list(provider.get_available_models() or [])
+                    except Exception:
+                        models = []
+                current = getattr(provider, "model", None)
+                if current and current not in models:
+                    models.insert(0, current)
+                cached = (now, models)
+                with self._lock:
+                    self._models[slug] = cached
+            entries.append(slug)
+            entries.extend(f"{slug}/{model}" for model in cached[1])
+        return entries
+
+    def build_chat(self, messages):
+        """Split OpenAI messages into (prompt, chat payload, system prompt)."""
+        system = "\n\n".join(
+            str(m.get("content", "")) for m in messages if m.get("role") == "system"
+        ) or None
+        history = []
+        for m in messages:
+            role = m.get("role")
+            if role == "system":
+                continue
+            name = self.app.bot_name if role == "assistant" else self.app.user_name
+            history.append({"role": name, "content": _message_text(m.get("content"))})
+        if not history or history[-1]["role"] != self.app.user_name:
+            return None, None, system
+        prompt = history[-1]["content"]
+        chat = self.app.build_chat(prompt, history=history[:-1], system_prompt=system)
+        return prompt, chat, system
+
+
+def _message_text(content):
+    # OpenAI content can be a list of parts; only text parts are forwarded
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )
+    return "" if content is None else str(content)
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "hamonikr-chatbot"
+
+    @property
+    def gateway(self):
+        return self.server.gateway
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message, kind="invalid_request_error"):
+        self.send_json(status, {"error": {"message": message, "type": kind}})
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            created = int(time.time())
+            self.send_json(200, {
+                "object": "list",
+                "data": [
+                    {"id": mid, "object": "model", "created": created, "owned_by": mid.split("/")[0]}
+                    for mid in self.gateway.list_models()
+                ],
+            })
+        else:
+            self.send_error_json(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_error_json(404, f"Unknown path {self.path}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error_json(400, "Request body is not valid JSON")
+            return
+        if not isinstance(body, dict):
+            self.send_error_json(400, "Request body must be a JSON object")
+            return
+        messages = body.get("messages") or []
+        if not isinstance(messages, list) or not all(isinstance(m, dict) for m in messages):
+            self.send_error_json(400, "messages must be a list of objects")
+            return
+
+        route = self.gateway.resolve(body.get("model"))
+        if route is None:
+            self.send_error_json(404, f"No enabled provider for model {body.get('model')!r}")
+            return
+        slug, model = route
+
+        prompt, chat, system = self.gateway.build_chat(messages)
+        if prompt is None:
+            self.send_error_json(400, "The last message must come from the user")
+            return
+
+        provider = self.gateway.provider(slug, model)
+        if provider is None:
+            self.send_error_json(404, f"Unknown provider {slug!r}")
+            return
+        model_name = f"{slug}/{getattr(provider, 'model', None) or model or ''}".rstrip("/")
+
+        if body.get("stream"):
+            self.stream_completion(provider, model_name, prompt, chat, system)
+        else:
+            self.completion(provider, model_name, prompt, chat, system)
+
+    def completion(self, provider, model_name, prompt, chat, system):
+        metrics = StreamMetrics().start()
+        try:
+            response = provider.generate(prompt, chat, system_prompt=system)
+        except Exception as e:
+            self.send_error_json(502, str(e), "provider_error")
+            return
+        metrics.finish(response)
+        if not isinstance(response, str):
+            self.send_error_json(502, "The provider did not return text", "provider_error")
+            return
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        self.send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model_name,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": response},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": metrics.tokens,
+                "total_tokens": prompt_tokens + metrics.tokens,
+            },
+        })
+
+    def stream_completion(self, provider, model_name, prompt, chat, system):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        # 스트리밍 응답은 길이를 알 수 없으므로 전송 후 연결을 닫는다
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send_event(delta, finish_reason=None):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model_name,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        sent = {"any": False}
+
+        def on_chunk(chunk_text):
+            if chunk_text:
+                sent["any"] = True
+                send_event({"content": chunk_text})
+
+        try:
+            send_event({"role": "assistant"})
+            try:
+                response = provider.generate(prompt, chat, callback=on_chunk, system_prompt=system)
+            except Exception as e:
+                # 헤더는 이미 보냈으므로 오류도 이벤트로 전달한다
+                error = {"error": {"message": str(e), "type": "provider_error"}}
+                self.wfile.write(f"data: {json.dumps(error, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                return
+            if not sent["any"] and isinstance(response, str) and response:
+                send_event({"content": response})
+            send_event({}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away
+
+
+def serve(app, host="127.0.0.1", port=8765, verbose=False):
+    """Run the gateway until interrupted; returns the process exit code."""
+    httpd = ThreadingHTTPServer((host, port), GatewayHandler)
+    httpd.daemon_threads = True
+    httpd.gateway = Gateway(app)
+    httpd.verbose = verbose
+    print(f"Serving OpenAI-compatible API on http://{host}:{port}/v1", file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+    return 0
@@ -0,0 +1,1169 @@
+import base64
+import binascii
+import copy
+import fcntl
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+user_config_dir = os.environ.get(
+    "XDG_CONFIG_HOME", os.environ["HOME"] + "/.config"
+)
+
+user_data_dir = os.environ.get(
+    "XDG_DATA_HOME", os.environ["HOME"] + "/.local/share"
+)
+
+user_cache_dir = os.environ.get(
+    "XDG_CACHE_HOME", os.environ["HOME"] + "/.cache"
+)
+
+data_dir = os.path.join(user_data_dir, "hamonikr-chatbot")
+data_file = os.path.join(data_dir, "data.json")
+
+# data.json 스키마 버전. 올릴 때마다 migrate()에 단계를 추가한다
+DATA_VERSION = 2
+
+# 첫 변경 후 이 시간(초) 동안의 변경을 모아 한 번에 저장
+SAVE_DELAY = 2.0
+
+# 저널이 이 크기를 넘으면 스냅샷(data.json)으로 압축
+JOURNAL_LIMIT = 4 * 1024 * 1024
+
+# 스트리밍 로더가 한 번에 읽는 양(문자). 값 하나가 이보다 크면 두 배씩 늘려 읽는다
+READ_CHUNK = 1024 * 1024
+
+# 다른 인스턴스가 삭제를 알 수 있도록 삭제 기록(tombstone)을 남겨 두는 기간
+TOMBSTONE_DAYS = 30
+
+# 메시지 "type" 값
+MESSAGE_TEXT = "text"
+MESSAGE_IMAGE = "image"
+MESSAGE_ERROR = "error"
+
+# 메시지 "status" 값: 답변이 생성되는 동안과, 끝나지 못하고 중단된 경우
+STATUS_STREAMING = "streaming"
+STATUS_INTERRUPTED = "interrupted"
+
+_re_space = re.compile(r"[ \t\n\r]*")
+# Storage가 쓰는 채팅은 항상 id(또는 uid)로 시작하고, 문자열 안의 따옴표는
+# 이스케이프되므로 이 패턴은 채팅의 시작에서만 나온다
+_re_chat_start = re.compile(r'\{"(?:id|uid)": ')
+_re_chats_key = re.compile(r'"chats"\s*:\s*\[')
+_decoder = json.JSONDecoder()
+
+_re_base64 = re.compile(r"^[A-Za-z0-9+/]{120,}={0,2}$")
+_image_signatures = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"RIFF")
+
+
+def default_data():
+    return {
+        "version": DATA_VERSION,
+        "chats": [],
+        "providers": {
+            "ollama": {"enabled": True, "data": {}},
+            "google-flan-t5-xxl": {"enabled": False, "data": {}},
+            "gpt-2": {"enabled": False, "data": {}},
+
+        },
+        "models": {}
+    }
+
+
+def new_chat(chat_id, title):
+    """A fresh, empty chat with its own uid and timestamps."""
+    now = time.time()
+    return {
+        "id": chat_id,
+        "uid": uuid.uuid4().hex,
+        "title": title,
+        "starred": False,
+        "content": [],
+        "created": now,
+        "updated": now,
+    }
+
+
+def chat_uid(chat):
+    """Identity of a chat across instances (ids can collide, uids don't)."""
+    return chat.get("uid") or f"legacy-{chat.get('id')}"
+
+
+def load_data(path=data_file):
+    """Read data.json, falling back to a plain config if it is missing or unreadable.
+
+    A damaged file yields whatever chats could be salvaged (see read_data()).
+    """
+    try:
+        data, _damaged = read_data(path)
+    except OSError:
+        return default_data()
+    migrate(data)
+    return data
+
+
+class _JsonStream:
+    """Sliding window over a text file for json's raw_decode().
+
+    Only the value being decoded and one chunk ahead are kept in memory;
+    text before the current position is dropped on the next read.
+    """
+
+    def __init__(self, f, chunk=READ_CHUNK):
+        self.f = f
+        self.chunk = chunk
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        if self.eof:
+            return False
+        text = self.f.read(size or self.chunk)
+        if not text:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-blank character, or "" at the end of the file."""
+        while True:
+            self.pos = _re_space.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next JSON value, reading on until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # 버퍼 끝에서 잘린 값(\uXXXX 이스케이프, true/null 포함)이면 더 읽어서 다시;
+                # 그보다 앞에서 난 오류는 손상
+                incomplete = e.pos >= len(self.buf) - 16 or e.msg.startswith("Unterminated string")
+                # 큰 값은 읽는 양을 두 배씩 늘려 재시도 횟수를 로그 수준으로 유지
+                if incomplete and self.fill(max(self.chunk, len(self.buf) - self.pos)):
+                    continue
+                raise
+            # 숫자는 청크 경계에서 잘려도 ("1.5e10" -> "1.") 더 짧은 숫자로 읽히므로,
+            # 버퍼 끝 가까이에서 끝났으면 더 읽어서 다시 (오류 경로와 같은 여유)
+            if end >= len(self.buf) - 16 and not isinstance(value, (dict, list, str)) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def seek(self, pattern, start):
+        """Move to the next match of pattern at or after start; False if there is none."""
+        self.pos = start
+        while True:
+            match = pattern.search(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return True
+            # 경계에 걸친 패턴을 놓치지 않게 끝부분은 남긴다
+            self.pos = max(self.pos, len(self.buf) - 32)
+            if not self.fill():
+                return False
+
+
+def _read_chats(stream):
+    """Decode a chats array one chat at a time, skipping damaged ones.
+
+    Returns (chats, complete).
+    """
+    chats = []
+    complete = True
+    stream.expect("[")
+    if stream.peek() == "]":
+        stream.pos += 1
+        return chats, complete
+    while True:
+        start = stream.pos
+        try:
+            chat = stream.value()
+            if not isinstance(chat, dict):
+                raise ValueError("chat is not an object")
+            chats.append(chat)
+            char = stream.peek()
+            if char == "]":
+                stream.pos += 1
+                return chats, complete
+            if char != ",":
+                raise ValueError("expected ',' or ']'")
+            stream.pos += 1
+        except ValueError:
+            complete = False
+            if not stream.seek(_re_chat_start, start + 1):
+                return chats, complete
+
+
+def read_data(path=data_file):
+    """Stream data.json into memory one chat at a time.
+
+    Unlike json.load() the whole text is never held at once, so peak
+    memory stays close to the size of the resulting data. A truncated or
+    corrupted file does not fail the load: every well-formed chat is kept
+    and missing top-level keys come from default_data(). Returns
+    (data, damaged); raises OSError if the file cannot be read.
+    """
+    data = {}
+    damaged = False
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        stream = _JsonStream(f)
+        try:
+            stream.expect("{")
+            while stream.peek() != "}":
+                key = stream.value()
+                if not isinstance(key, str):
+                    raise ValueError("expected a key")
+                stream.expect(":")
+                if key == "chats":
+                    data["chats"], complete = _read_chats(stream)
+                    if not complete:
+                        raise ValueError("damaged chats")
+                else:
+                    data[key] = stream.value()
+                if stream.peek() == ",":
+                    stream.pos += 1
+                elif stream.peek() != "}":
+                    raise ValueError("expected ',' or '}'")
+        except ValueError:
+            damaged = True
+            if "chats" not in data and stream.seek(_re_chats_key, stream.pos):
+                stream.pos = stream.buf.index("[", stream.pos)
+                data["chats"], _complete = _read_chats(stream)
+
+    if damaged:
+        # 잃어버린 키는 기본값으로; 버전을 모르면 모든 migrate 단계를 다시 거친다
+        data.setdefault("version", 0)
+        for key, value in default_data().items():
+            data.setdefault(key, value)
+    return data, damaged
+
+
+def backup_damaged(path):
+    """Keep a copy of a damaged data.json before a save replaces it; returns its path."""
+    backup = f"{path}.damaged-{time.strftime('%Y%m%d-%H%M%S')}"
+    try:
+        shutil.copy2(path, backup)
+    except OSError:
+        try:
+            os.replace(path, backup)  # 복사할 공간이 없으면 이름만 바꾼다
+        except OSError as e:
+            print(f"Failed to back up {path}: {e}", file=sys.stderr)
+            return None
+    return backup
+
+
+def migrate(data):
+    """Upgrade data loaded from an older data.json in place.
+
+    Returns True if anything changed, so the caller knows a save is due.
+    """
+    version = data.get("version", 0)
+    if version >= DATA_VERSION:
+        return False
+
+    if version < 1:
+        # 모든 메시지에 type을 붙이고, content에 인라인된 base64 이미지는 blob 저장소로 옮긴다
+        complete = True
+        for chat in data.get("chats", []):
+            for message in chat.get("content", []):
+                try:
+                    classify_message(message)
+                except OSError:
+                    complete = False  # blob을 쓰지 못한 메시지는 다음 실행 때 다시 시도
+        if not complete:
+            return True
+
+    if version < 2:
+        # 여러 인스턴스의 변경을 합칠 수 있도록 채팅마다 uid와 시각을 붙인다.
+        # 기존 채팅의 uid는 id에서 만들어 어느 인스턴스가 migrate해도 같게 한다
+        for chat in data.get("chats", []):
+            chat.setdefault("uid", chat_uid(chat))
+            chat.setdefault("created", 0)
+            chat.setdefault("updated", 0)
+
+    data["version"] = DATA_VERSION
+    return True
+
+
+def mark_interrupted(data):
+    """Mark answers still streaming when the app last stopped as interrupted.
+
+    Returns the chats that changed.
+    """
+    changed = []
+    for chat in data.get("chats", []):
+        for message in chat.get("content", []):
+            if message.get("status") == STATUS_STREAMING:
+                message["status"] = STATUS_INTERRUPTED
+                if not changed or changed[-1] is not chat:
+                    changed.append(chat)
+    return changed
+
+
+def classify_message(message):
+    """Set message["type"] for a message written before types existed."""
+    if message.get("type"):
+        return message
+    if message.get("blob"):
+        message["type"] = MESSAGE_IMAGE
+        return message
+
+    content = message.get("content")
+    image = _inline_image_bytes(content)
+    if image is not None:
+        from . import blob_store  # blob_store imports this module
+
+        message["blob"] = blob_store.put(image)
+        message["content"] = blob_store.IMAGE_PLACEHOLDER
+        message["type"] = MESSAGE_IMAGE
+    else:
+        message["type"] = MESSAGE_TEXT
+    return message
+
+
+def _inline_image_bytes(content):
+    # 이전 버전은 생성된 이미지를 base64 JPEG 문자열로 content에 저장했다
+    if not isinstance(content, str) or not _re_base64.match(content):
+        return None
+    try:
+        data = base64.b64decode(content, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return data if data.startswith(_image_signatures) else None
+
+
+def write_atomic(path, text):
+    """Replace path with text (str or bytes): write a temp file, fsync it, then rename over path."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".data-", suffix=".tmp", dir=directory)
+    try:
+        with (os.fdopen(fd, "wb") if isinstance(text, bytes) else os.fdopen(fd, "w", encoding="utf-8")) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # rename 자체도 디스크에 남도록 디렉터리를 fsync
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def read_snapshot(path):
+    """Another instance's data.json, or None if it is missing or damaged."""
+    try:
+        data, damaged = read_data(path)
+    except OSError:
+        return None
+    return None if damaged else data
+
+
+def file_stamp(path):
+    """What changes whenever path is replaced or rewritten, or None if it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def lock_path(path=data_file):
+    return os.path.splitext(path)[0] + ".lock"
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive advisory lock (flock) on path for the with block."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # 닫으면 잠금도 풀린다
+
+
+def try_lock(path):
+    """Take an exclusive lock on path without waiting; returns the fd, or None if it is held."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def merge_deleted(ours, theirs):
+    """Union of two tombstone maps (uid -> time), dropping ones older than TOMBSTONE_DAYS."""
+    cutoff = time.time() - TOMBSTONE_DAYS * 86400
+    merged = {}
+    for deleted in (ours, theirs):
+        for uid, when in (deleted or {}).items():
+            if when >= cutoff and when > merged.get(uid, 0):
+                merged[uid] = when
+    return merged
+
+
+def merge_disk(entries, rest, disk):
+    """Merge the chats we are about to write with what another instance wrote.
+
+    entries is [(uid, updated, json)] in our order. Per uid the side with the
+    newer "updated" wins, chats only on disk are kept unless we deleted them
+    after their last change, and ours are dropped if the other instance
+    deleted them later. Returns (entries, rest, foreign) where foreign tells
+    whether the result holds anything our in-memory data does not.
+    """
+    deleted = merge_deleted(rest.get("deleted"), disk.get("deleted"))
+    theirs = {}
+    for chat in disk.get("chats", []):
+        theirs[chat_uid(chat)] = chat
+
+    merged = []
+    foreign = False
+    for uid, updated, text in entries:
+        chat = theirs.pop(uid, None)
+        if deleted.get(uid, -1) >= updated:
+            foreign = True  # 다른 인스턴스에서 삭제됨
+        elif chat is not None and chat.get("updated", 0) > updated:
+            merged.append((uid, chat.get("updated", 0), json.dumps(chat)))
+            foreign = True
+        else:
+            merged.append((uid, updated, text))
+    for uid, chat in theirs.items():
+        if deleted.get(uid, -1) >= chat.get("updated", 0):
+            continue
+        merged.append((uid, chat.get("updated", 0), json.dumps(chat)))
+        foreign = True
+
+    rest = dict(rest)
+    rest["deleted"] = deleted
+    if "journal_seq" in disk or "journal_seq" in rest:
+        rest["journal_seq"] = max(rest.get("journal_seq", 0), disk.get("journal_seq", 0))
+    return merged, rest, foreign
+
+
+def assemble(entries, rest):
+    """data.json text from encoded chats and the other top-level keys."""
+    head = json.dumps(rest)
+    chats_text = '"chats": [' + ", ".join(text for _uid, _updated, text in entries) + "]"
+    if head == "{}":
+        return "{" + chats_text + "}"
+    return head[:-1] + ", " + chats_text + "}"
+
+
+def journal_path(path=data_file):
+    return os.path.splitext(path)[0] + ".journal"
+
+
+def replay_journal(data, path):
+    """Apply journal records newer than data["journal_seq"] to data.
+
+    The rotated journal (path + ".old") left by an unfinished compaction is
+    replayed first. A torn last line from a crash ends that file's replay.
+    Returns the last sequence number applied (or the snapshot's).
+    """
+    last = data.get("journal_seq", 0)
+    chats = None
+    for journal in (path + ".old", path):
+        try:
+            f = open(journal, "r", encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                seq = record.get("seq", 0)
+                if seq <= last:
+                    continue
+                if chats is None:
+                    chats = {chat.get("id"): chat for chat in data.get("chats", [])}
+                apply_record(data, chats, record)
+                last = seq
+    return last
+
+
+def apply_record(data, chats, record):
+    """Apply one journal record; chats maps chat id to chat and is kept in sync."""
+    op = record.get("op")
+    if op == "chat":
+        chat = record["chat"]
+        old = chats.get(chat.get("id"))
+        if old is not None:
+            data["chats"][data["chats"].index(old)] = chat
+        else:
+            data.setdefault("chats", []).append(chat)
+        chats[chat.get("id")] = chat
+    elif op == "chats":
+        for chat in record["chats"]:
+            data.setdefault("chats", []).append(chat)
+            chats[chat.get("id")] = chat
+    elif op == "meta":
+        chat = chats.get(record["chat"].get("id"))
+        if chat is None:
+            return
+        content = chat.get("content", [])
+        chat.clear()
+        chat.update(record["chat"])
+        if record.get("length") is not None:
+            chat["content"] = content[:record["length"]]
+    elif op == "remove":
+        chat = chats.pop(record.get("id"), None)
+        if chat is not None:
+            data["chats"].remove(chat)
+        data["deleted"] = merge_deleted(data.get("deleted"), record.get("deleted"))
+    elif op == "clear":
+        data["chats"] = []
+        chats.clear()
+        data["deleted"] = merge_deleted(data.get("deleted"), record.get("deleted"))
+    elif op == "message":
+        chat = chats.get(record.get("id"))
+        if chat is not None:
+            chat.setdefault("content", []).append(record["message"])
+            chat["updated"] = record.get("updated", chat.get("updated", 0))
+    elif op == "message_update":
+        chat = chats.get(record.get("id"))
+        if chat is not None and record["index"] < len(chat.get("content", [])):
+            chat["content"][record["index"]] = record["message"]
+            chat["updated"] = record.get("updated", chat.get("updated", 0))
+    elif op == "data":
+        data.update(record["data"])
+
+
+class Storage:
+    """Owner of data.json with coalesced background saves.
+
+    Code that changes the data calls the matching hook (chat_added,
+    message_added, ...). The first change starts a SAVE_DELAY timer and
+    everything changed until it fires is written in one go from the timer
+    thread. Each chat is encoded separately and unchanged chats reuse their
+    previous encoding, so a save only re-serializes what changed and the
+    writer never holds the interpreter for long. The file is replaced
+    atomically, so a crash leaves either the old or the new data.json.
+
+    Several instances may share data.json. Writes hold an flock on
+    data.lock, and if another instance wrote since we last looked, its
+    chats are merged in by uid (the newer "updated" wins, deletions are
+    kept as tombstones in "deleted") instead of being overwritten.
+    read_external() and merge_external() bring such changes into our own
+    data.
+
+    Listeners added with add_listener() get the same hook calls, e.g. the
+    search index.
+    """
+
+    def __init__(self, path=data_file, delay=SAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self.lock_path = lock_path(path)
+        # 읽기 전에 stamp를 잡아, 그 사이 다른 인스턴스가 쓴 것은 다음 저장 때 합친다
+        self.disk_stamp = file_stamp(path)
+        self.data = self.load()
+        self.data.setdefault("deleted", {})
+        self.listeners = []
+
+        self.lock = threading.Lock()  # dirty / pending / timer / disk_stamp
+        self.write_lock = threading.Lock()  # 한 번에 하나의 쓰기만
+        self.timer = None
+        self.dirty = set()  # 다시 인코딩할 채팅 id
+        self.pending = False
+        self.encoded = {}  # chat id -> (chat, json)
+
+        # JournalStorage로 기록하다 종료된 변경이 남아 있으면 먼저 반영
+        # (저널을 쓰는 인스턴스가 실행 중이면 그 인스턴스의 몫)
+        self.journal_path = journal_path(path)
+        self.journal_lock = self.open_journal()
+        self.seq = replay_journal(self.data, self.journal_path) if self.journal_lock is not None else 0
+        self.journal_replayed = self.journal_lock is not None and self.seq != self.data.get("journal_seq", 0)
+
+        if self.journal_replayed:
+            self.data["journal_seq"] = self.seq
+            self.mark_dirty()
+        for chat in mark_interrupted(self.data):
+            self.mark_dirty(chat)
+
+    def load(self):
+        # 손상된 파일은 복구할 수 있는 만큼 읽고, 저장이 덮어쓰기 전에 사본을 남긴다
+        self.damaged = False
+        self.damaged_backup = None
+        try:
+            data, self.damaged = read_data(self.path)
+        except FileNotFoundError:
+            data = default_data()
+        except OSError as e:
+            print(f"Failed to read {self.path}: {e}", file=sys.stderr)
+            data, self.damaged = default_data(), True
+        if self.damaged:
+            self.damaged_backup = backup_damaged(self.path)
+            print(
+                f"{self.path} is damaged, recovered {len(data.get('chats', []))} chats"
+                f" (original kept as {self.damaged_backup})",
+                file=sys.stderr,
+            )
+        # damaged는 알림용이고, recovered는 이번 실행 내내 남아 일부만 읽었음을 알린다
+        # (blob 정리처럼 전체 기록을 알아야 하는 작업은 이때 건너뛴다)
+        self.recovered = self.damaged
+        migrate(data)
+        return data
+
+    def open_journal(self):
+        """Truthy if we may replay the journal, i.e. no JournalStorage is using it."""
+        fd = try_lock(self.journal_path + ".lock")
+        if fd is not None:
+            os.close(fd)
+            return True
+        return None
+
+    def add_listener(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # 변경 훅
+
+    def changed(self):
+        """Something outside the chats (providers, models, ...) changed."""
+        self.mark_dirty()
+
+    def chat_added(self, chat):
+        chat.setdefault("uid", uuid.uuid4().hex)
+        chat.setdefault("created", time.time())
+        self.touch(chat)
+        self.mark_dirty(chat)
+        self._notify("chat_added", chat)
+
+    def chats_added(self, chats):
+        """Several chats were appended at once, e.g. by an import."""
+        for chat in chats:
+            chat.setdefault("uid", uuid.uuid4().hex)
+            chat.setdefault("created", time.time())
+            chat.setdefault("updated", chat["created"])
+            self.mark_dirty(chat)
+        self._notify("chats_added", chats)
+
+    def chat_updated(self, chat):
+        """Title, star or the chat's content as a whole changed."""
+        self.touch(chat)
+        self.mark_dirty(chat)
+        self._notify("chat_updated", chat)
+
+    def chat_removed(self, chat):
+        self.data["deleted"][chat_uid(chat)] = time.time()
+        self.mark_dirty(chat)
+        self._notify("chat_removed", chat)
+
+    def chats_cleared(self, chats=()):
+        """All chats were removed; chats are the ones that were there."""
+        now = time.time()
+        for chat in chats:
+            self.data["deleted"][chat_uid(chat)] = now
+        self.mark_dirty()
+        self._notify("chats_cleared")
+
+    def chat_archived(self, chat):
+        """The chat's messages moved to the archive (see archive.py); not a change to the chat."""
+        self.mark_dirty(chat)
+        self._notify("chat_archived", chat)
+
+    def chat_rehydrated(self, chat):
+        """An archived chat's messages were loaded back."""
+        self.mark_dirty(chat)
+        self._notify("chat_rehydrated", chat)
+
+    def message_added(self, chat, message):
+        self.touch(chat)
+        self.mark_dirty(chat)
+        self._notify("message_added", chat, message)
+
+    def message_updated(self, chat, message):
+        self.touch(chat)
+        self.mark_dirty(chat)
+        self._notify("message_updated", chat, message)
+
+    def message_removed(self, chat, message):
+        self.touch(chat)
+        self.mark_dirty(chat)
+        self._notify("message_removed", chat, message)
+
+    def touch(self, chat):
+        chat["updated"] = time.time()
+
+    def _notify(self, name, *args):
+        for listener in self.listeners:
+            try:
+                getattr(listener, name)(*args)
+            except Exception as e:
+                print(f"Storage listener {name} failed: {e}", file=sys.stderr)
+
+    # 저장
+
+    def mark_dirty(self, chat=None):
+        with self.lock:
+            if chat is not None:
+                self.dirty.add(chat.get("id"))
+            self.pending = True
+            if self.timer is None:
+                self.timer = threading.Timer(self.delay, self._on_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _on_timer(self):
+        with self.lock:
+            self.timer = None
+        self.write()
+
+    def flush(self):
+        """Write pending changes now, blocking until they are on disk."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        return self.write()
+
+    def save_all(self):
+        """Re-encode everything and write it now (used on quit)."""
+        with self.lock:
+            self.encoded = {}
+            self.pending = True
+        return self.flush()
+
+    def write(self):
+        with self.write_lock:
+            with self.lock:
+                if not self.pending:
+                    return True
+                dirty, self.dirty = self.dirty, set()
+                self.pending = False
+            try:
+                entries, rest = self.encode(dirty)
+                self.commit(entries, rest)
+            except Exception as e:
+                with self.lock:
+                    self.dirty |= dirty
+                    self.pending = True
+                print(f"Failed to save {self.path}: {e}", file=sys.stderr)
+                return False
+            if self.journal_replayed:
+                # 반영한 저널은 이제 스냅샷에 들어 있다
+                self.journal_replayed = False
+                self.remove_journal()
+            return True
+
+    def remove_journal(self):
+        fd = try_lock(self.journal_path + ".lock")
+        if fd is None:
+            return  # 그새 저널을 쓰는 인스턴스가 시작됨
+        try:
+            for journal in (self.journal_path + ".old", self.journal_path):
+                try:
+                    os.remove(journal)
+                except OSError:
+                    pass
+        finally:
+            os.close(fd)
+
+    def encode(self, dirty):
+        """Encode each chat, reusing cached text for unchanged ones.
+
+        Returns ([(uid, updated, json)], rest) where rest holds the other
+        top-level keys.
+        """
+        return self.encode_snapshot(*self.snapshot(dirty))
+
+    def snapshot(self, dirty, detach=False):
+        """What encode_snapshot() needs: ([(chat, source, cached json or None)], rest).
+
+        With detach, chats that must be re-encoded and rest are copied, so
+        encode_snapshot() can run on another thread while this one keeps
+        changing the data. Copying is much cheaper than encoding.
+        """
+        # 목록/사전 복사는 C 수준에서 한 번에 일어나므로 메인 스레드의 변경과 겹치지 않는다
+        chats = []
+        for chat in list(self.data.get("chats", [])):
+            key = chat.get("id")
+            cached = self.encoded.get(key)
+            if key in dirty or cached is None or cached[0] is not chat:
+                chats.append((chat, copy_chat(chat) if detach else chat, None))
+            else:
+                chats.append((chat, chat, cached[1]))
+        rest = dict(self.data)
+        rest.pop("chats", None)
+        rest["deleted"] = dict(rest.get("deleted", {}))
+        if detach:
+            rest = copy.deepcopy(rest)
+        return chats, rest
+
+    def encode_snapshot(self, chats, rest):
+        encoded = {}
+        entries = []
+        for chat, source, text in chats:
+            if text is None:
+                text = json.dumps(source)
+            encoded[source.get("id")] = (chat, text)
+            entries.append((chat_uid(source), source.get("updated", 0), text))
+        self.encoded = encoded
+        return entries, rest
+
+    def commit(self, entries, rest):
+        """Write encoded data under the lock, merging in another instance's writes."""
+        with locked(self.lock_path):
+            stamp = file_stamp(self.path)
+            foreign = False
+            with self.lock:
+                known = self.disk_stamp
+            if stamp is not None and stamp != known:
+                disk = read_snapshot(self.path)
+                if disk is not None:
+                    entries, rest, foreign = merge_disk(entries, rest, disk)
+            write_atomic(self.path, assemble(entries, rest))
+            with self.lock:
+                # 합친 내용이 아직 메모리에 없으면 stamp를 남기지 않아 merge_external()이 가져가게 한다
+                self.disk_stamp = None if foreign else file_stamp(self.path)
+
+    # 다른 인스턴스의 변경
+
+    def read_external(self):
+        """Read data.json if another instance wrote it since we last did.
+
+        Safe to call from a worker thread; returns (stamp, data) for
+        merge_external(), or None.
+        """
+        stamp = file_stamp(self.path)
+        with self.lock:
+            if stamp is None or stamp == self.disk_stamp:
+                return None
+        disk = read_snapshot(self.path)
+        if disk is None:
+            return None
+        return stamp, disk
+
+    def merge_external(self, stamp, disk):
+        """Fold another instance's data.json into self.data (main thread).
+
+        Only chats whose uid is new, newer on disk or deleted there change;
+        a chat whose answer is still streaming here is left alone. Listeners
+        are told about each change. Returns (added, updated, removed,
+        renumbered) where renumbered is [(chat, old id)] for chats whose id
+        changed, e.g. because two instances gave different chats the same one.
+        """
+        data = self.data
+        deleted = data["deleted"] = merge_deleted(data.get("deleted"), disk.get("deleted"))
+        local = {chat_uid(chat): chat for chat in data["chats"]}
+
+        added, updated, removed, renumbered = [], [], [], []
+        for chat in disk.get("chats", []):
+            uid = chat_uid(chat)
+            mine = local.pop(uid, None)
+            if mine is None:
+                if deleted.get(uid, -1) < chat.get("updated", 0):
+                    data["chats"].append(chat)
+                    added.append(chat)
+            elif chat.get("updated", 0) > mine.get("updated", 0) and not is_streaming(mine):
+                # 같은 dict를 고쳐 써서 화면과 캐시가 쥔 참조가 그대로 유효하게 한다
+                old_id = mine.get("id")
+                mine.clear()
+                mine.update(chat)
+                updated.append(mine)
+                if mine.get("id") != old_id:
+                    renumbered.append((mine, old_id))
+        for uid, mine in local.items():
+            if deleted.get(uid, -1) >= mine.get("updated", 0) and not is_streaming(mine):
+                data["chats"].remove(mine)
+                removed.append(mine)
+
+        new = {id(chat) for chat in added}
+        for chat in self._resolve_ids():
+            if id(chat) not in new:
+                renumbered.append((chat, chat["old_id"]))
+            del chat["old_id"]
+
+        with self.lock:
+            for chat in updated + removed:
+                self.encoded.pop(chat.get("id"), None)
+            for _chat, old_id in renumbered:
+                self.encoded.pop(old_id, None)
+            if not self.pending:
+                self.disk_stamp = stamp
+
+        for chat in removed:
+            self._notify("chat_removed", chat)
+        for _chat, old_id in renumbered:
+            self._notify("chat_removed", {"id": old_id})
+        for chat in added:
+            self._notify("chat_added", chat)
+        changed = {id(chat) for chat in updated}
+        for chat in updated + [chat for chat, _old_id in renumbered if id(chat) not in changed]:
+            self._notify("chat_updated", chat)
+        return added, updated, removed, renumbered
+
+    def _resolve_ids(self):
+        # 서로 다른 채팅이 같은 id를 가지면, 양쪽 인스턴스가 같은 결론을 내도록
+        # uid가 큰 쪽을 빈 id로 옮기고 다음 저장 때 알린다
+        owners = {}
+        moved = []
+        for chat in self.data["chats"]:
+            other = owners.get(chat.get("id"))
+            if other is None:
+                owners[chat.get("id")] = chat
+            elif chat_uid(chat) > chat_uid(other):
+                moved.append(chat)
+            else:
+                owners[chat.get("id")] = chat
+                moved.append(other)
+        next_id = max((chat.get("id", 0) for chat in self.data["chats"]), default=0)
+        for chat in moved:
+            next_id += 1
+            chat["old_id"] = chat.get("id")
+            chat["id"] = next_id
+            self.touch(chat)
+            self.mark_dirty(chat)
+        return moved
+
+
+class JournalBusy(RuntimeError):
+    """Another instance is writing the journal."""
+
+
+def copy_chat(chat):
+    """Copy of a chat that later changes to it or its messages do not reach."""
+    chat = dict(chat)
+    # 메시지는 키를 바꿔 쓰는 식으로만 고치므로 한 단계 복사로 충분하다
+    chat["content"] = [dict(message) for message in chat.get("content", [])]
+    return chat
+
+
+def is_streaming(chat):
+    content = chat.get("content") or []
+    return bool(content) and content[-1].get("status") == STATUS_STREAMING
+
+
+class JournalStorage(Storage):
+    """Storage that appends each change to a journal instead of rewriting data.json.
+
+    Every hook appends one small JSON line (with an increasing "seq") to
+    data.journal, so a chat turn costs one append rather than a snapshot.
+    Once the journal passes JOURNAL_LIMIT it is rotated and a snapshot
+    recording the last included seq ("journal_seq") is written on a
+    background thread, after which the rotated journal is deleted. Startup
+    replays the journal on top of the snapshot.
+
+    Records are flushed to the OS right away and fsynced when a snapshot is
+    taken and on quit. Only one instance can own the journal; the
+    constructor raises JournalBusy when another one does.
+    """
+
+    def __init__(self, path=data_file, limit=JOURNAL_LIMIT):
+        self.limit = limit
+        self.compacting = None
+        super().__init__(path)
+        # 저널은 이미 반영되어 계속 이어서 쓴다
+        self.journal_replayed = False
+        self.journal = open(self.journal_path, "a", encoding="utf-8")
+        self.journal_size = self.journal.tell()
+
+    def open_journal(self):
+        # 잠금은 종료할 때까지 쥐고 있어 다른 인스턴스가 저널을 건드리지 않게 한다
+        fd = try_lock(self.journal_path + ".lock")
+        if fd is None:
+            raise JournalBusy(self.journal_path)
+        return fd
+
+    def mark_dirty(self, chat=None):
+        # 타이머 저장 대신 다음 스냅샷에서 다시 인코딩할 채팅만 기록
+        with self.lock:
+            if chat is not None:
+                self.dirty.add(chat.get("id"))
+            self.pending = True
+
+    # 변경 훅: 기록을 남긴 뒤 기본 처리(dirty 표시, 리스너 알림)
+
+    def changed(self):
+        rest = {key: value for key, value in self.data.items() if key not in ("chats", "journal_seq", "version", "deleted")}
+        self.append({"op": "data", "data": rest})
+        super().changed()
+
+    def chat_added(self, chat):
+        chat.setdefault("uid", uuid.uuid4().hex)
+        chat.setdefault("created", time.time())
+        self.touch(chat)
+        self.append({"op": "chat", "chat": chat})
+        super().chat_added(chat)
+
+    def chats_added(self, chats):
+        # 가져온 묶음은 한 줄로 기록한다 (가져온 시각이 아닌 원래 시각을 유지)
+        for chat in chats:
+            chat.setdefault("uid", uuid.uuid4().hex)
+            chat.setdefault("created", time.time())
+            chat.setdefault("updated", chat["created"])
+        self.append({"op": "chats", "chats": chats})
+        super().chats_added(chats)
+
+    def chat_updated(self, chat):
+        self.touch(chat)
+        meta = {key: value for key, value in chat.items() if key != "content"}
+        length = len(chat["content"]) if "content" in chat else None
+        self.append({"op": "meta", "chat": meta, "length": length})
+        super().chat_updated(chat)
+
+    def chat_removed(self, chat):
+        self.append({"op": "remove", "id": chat.get("id"), "deleted": {chat_uid(chat): time.time()}})
+        super().chat_removed(chat)
+
+    def chats_cleared(self, chats=()):
+        now = time.time()
+        self.append({"op": "clear", "deleted": {chat_uid(chat): now for chat in chats}})
+        super().chats_cleared(chats)
+
+    def chat_archived(self, chat):
+        self.append({"op": "chat", "chat": chat})
+        super().chat_archived(chat)
+
+    def chat_rehydrated(self, chat):
+        self.append({"op": "chat", "chat": chat})
+        super().chat_rehydrated(chat)
+
+    def message_added(self, chat, message):
+        self.touch(chat)
+        self.append({"op": "message", "id": chat.get("id"), "message": message, "updated": chat["updated"]})
+        super().message_added(chat, message)
+
+    def message_updated(self, chat, message):
+        self.touch(chat)
+        content = chat.get("content", [])
+        # 갱신되는 메시지는 대개 마지막(스트리밍 답변)이므로 뒤에서부터 찾는다
+        for index in range(len(content) - 1, -1, -1):
+            if content[index] is message:
+                self.append({"op": "message_update", "id": chat.get("id"), "index": index, "message": message, "updated": chat["updated"]})
+                break
+        else:
+            self.append({"op": "chat", "chat": chat})
+        super().message_updated(chat, message)
+
+    def message_removed(self, chat, message):
+        # 삭제는 드물어서 채팅 전체를 다시 기록한다
+        self.touch(chat)
+        self.append({"op": "chat", "chat": chat})
+        super().message_removed(chat, message)
+
+    def append(self, record):
+        self.seq += 1
+        record["seq"] = self.seq
+        line = json.dumps(record) + "\n"
+        try:
+            self.journal.write(line)
+            self.journal.flush()
+        except OSError as e:
+            print(f"Failed to append to {self.journal_path}: {e}", file=sys.stderr)
+            return
+        self.journal_size += len(line)
+        if self.journal_size > self.limit and self.compacting is None:
+            self.compact()
+
+    # 압축
+
+    def compact(self, wait=False):
+        """Fold the journal into a new snapshot.
+
+        Chats changed since the last snapshot are copied here, on the
+        caller's thread, so that the snapshot matches the journal's seq
+        exactly; encoding and writing them happen in the background unless
+        wait is true. append() only starts a compaction when none is
+        running, so the main thread never waits for one.
+        """
+        compacting = self.compacting
+        if compacting is not None:
+            compacting.join()
+
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            self.pending = False
+        self.data["journal_seq"] = self.seq
+        chats, rest = self.snapshot(dirty, detach=True)
+
+        # 새 기록은 새 저널로; 이전 압축이 실패해 남은 .old가 있으면 이어 붙인다
+        old_path = self.journal_path + ".old"
+        self.journal.close()
+        if os.path.exists(old_path):
+            with open(old_path, "a", encoding="utf-8") as dst, open(self.journal_path, "r", encoding="utf-8") as src:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, old_path)
+        self.journal = open(self.journal_path, "a", encoding="utf-8")
+        self.journal_size = 0
+
+        def run():
+            try:
+                self.commit(*self.encode_snapshot(chats, rest))
+                os.remove(old_path)
+            except Exception as e:
+                # .old는 남겨 두고, 다음 압축 때 다시 시도
+                with self.lock:
+                    self.dirty |= dirty
+                    self.pending = True
+                print(f"Failed to compact {self.journal_path}: {e}", file=sys.stderr)
+            finally:
+                self.compacting = None
+
+        if wait:
+            run()
+        else:
+            self.compacting = threading.Thread(target=run, name="journal-compact", daemon=True)
+            self.compacting.start()
+
+    def flush(self):
+        """Make the journal durable."""
+        try:
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+        except OSError as e:
+            print(f"Failed to sync {self.journal_path}: {e}", file=sys.stderr)
+            return False
+        return True
+
+    def save_all(self):
+        """Write a full snapshot and empty the journal (used on quit)."""
+        with self.lock:
+            self.encoded = {}
+        self.compact(wait=True)
+        return self.flush()
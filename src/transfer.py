@@ -0,0 +1,308 @@
+"""Bulk export and import of threads.
+
+Export streams every selected thread through a generator pipeline
+(threads -> text chunks -> file), so only one thread's messages are held at
+a time and archived threads are decompressed one by one; the output goes to
+a temporary file that replaces the target when complete. JSONL keeps
+everything (one thread per line), including the bytes of image messages
+(base64 in "blob_data"), and is the format import reads back; Markdown and
+HTML are for reading and only link images by their path in the blob store.
+
+Import parses JSONL line by line and yields batches of chats ready for
+Storage.chats_added(), putting embedded images back into the blob store.
+Threads whose uid is already in the store are skipped, so importing the
+same file twice does nothing.
+"""
+
+import base64
+import binascii
+import html
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from . import archive, blob_store, storage
+
+JSONL = "jsonl"
+MARKDOWN = "markdown"
+HTML = "html"
+FORMATS = (JSONL, MARKDOWN, HTML)
+
+EXTENSIONS = {
+    ".jsonl": JSONL,
+    ".md": MARKDOWN,
+    ".markdown": MARKDOWN,
+    ".html": HTML,
+    ".htm": HTML,
+}
+
+# 가져오기는 이 개수만큼 모아서 한 번에 저장소에 넣는다
+IMPORT_BATCH = 200
+
+
+class Cancelled(Exception):
+    pass
+
+
+def format_for_path(path, default=MARKDOWN):
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), default)
+
+
+def select_chats(chats, query=None, starred=False):
+    """Chats whose title or messages contain query (case-insensitive), optionally only starred ones."""
+    query = (query or "").strip().lower()
+    selected = []
+    for chat in chats:
+        if starred and not chat.get("starred"):
+            continue
+        if query and not _matches(chat, query):
+            continue
+        selected.append(chat)
+    return selected
+
+
+def _matches(chat, query):
+    if query in chat.get("title", "").lower():
+        return True
+    for message in _content(chat):
+        content = message.get("content")
+        if isinstance(content, str) and query in content.lower():
+            return True
+    return False
+
+
+def _content(chat):
+    if archive.is_archived(chat):
+        try:
+            return archive.read_thread(chat)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Failed to read archived chat {chat.get('id')}: {e}", file=sys.stderr)
+            return []
+    # 목록 복사는 한 번에 일어나므로 메인 스레드가 메시지를 추가해도 안전하다
+    return list(chat.get("content", []))
+
+
+def snapshot(chats):
+    """Copies of chats for export_threads() on another thread.
+
+    Call on the thread that changes the chats (the main thread in the
+    app): streaming, renaming or starring a chat while a worker iterates
+    over it could otherwise fail with "dictionary changed size".
+    """
+    return [storage.copy_chat(chat) for chat in chats]
+
+
+def iter_threads(chats):
+    """Yield (meta, messages) per chat, reading archived messages from their files."""
+    for chat in chats:
+        meta = {key: value for key, value in chat.items() if key not in ("content", "archived")}
+        yield meta, _content(chat)
+
+
+# 형식별 렌더러: (meta, messages)를 받아 텍스트 조각을 내보낸다
+
+def render_jsonl(threads):
+    for meta, messages in threads:
+        line = dict(meta)
+        line["content"] = [_embed_blob(message) for message in messages]
+        yield json.dumps(line, ensure_ascii=False) + "\n"
+
+
+def _embed_blob(message):
+    # 다른 컴퓨터/프로필에서도 이미지가 보이도록 blob 바이트를 같이 내보낸다
+    if message.get("type") != storage.MESSAGE_IMAGE or not message.get("blob"):
+        return message
+    try:
+        data = blob_store.get(message["blob"])
+    except OSError:
+        return message
+    return dict(message, blob_data=base64.b64encode(data).decode("ascii"))
+
+
+def _restore_blob(message):
+    data = message.pop("blob_data", None)
+    if data is None:
+        return
+    try:
+        message["blob"] = blob_store.put(base64.b64decode(data))
+    except (binascii.Error, ValueError, OSError) as e:
+        print(f"Failed to import image {message.get('blob')}: {e}", file=sys.stderr)
+
+
+def _message_text(message):
+    if message.get("type") == storage.MESSAGE_IMAGE and message.get("blob"):
+        return None
+    return str(message.get("content", ""))
+
+
+def _stamp(seconds):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(seconds)) if seconds else ""
+
+
+def render_markdown(threads):
+    first = True
+    for meta, messages in threads:
+        if not first:
+            yield "\n---\n\n"
+        first = False
+        yield f"# {meta.get('title', '')}\n\n"
+        if meta.get("created"):
+            yield f"_{_stamp(meta['created'])}_\n\n"
+        for message in messages:
+            details = ", ".join(value for value in (message.get("time"), message.get("model")) if value)
+            yield f"**{message.get('role', '')}**" + (f" ({details})" if details else "") + "\n\n"
+            text = _message_text(message)
+            if text is None:
+                yield f"![image]({blob_store.blob_path(message['blob'])})\n\n"
+            else:
+                yield text.rstrip() + "\n\n"
+
+
+HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; max-width: 52em; margin: 2em auto; padding: 0 1em; line-height: 1.5; }}
+section {{ border-bottom: 1px solid #ccc; padding-bottom: 1em; margin-bottom: 2em; }}
+.message {{ margin: 1em 0; }}
+.meta {{ color: #666; font-size: 0.9em; }}
+.content {{ white-space: pre-wrap; }}
+.error .content {{ color: #c01c28; }}
+img {{ max-width: 100%; }}
+</style>
+</head>
+<body>
+"""
+
+
+def render_html(threads, title="HamoniKR Chatbot"):
+    yield HTML_HEAD.format(title=html.escape(title))
+    for meta, messages in threads:
+        yield f"<section>\n<h2>{html.escape(meta.get('title', ''))}</h2>\n"
+        for message in messages:
+            kind = html.escape(str(message.get("type", storage.MESSAGE_TEXT)))
+            details = " · ".join(
+                html.escape(str(value)) for value in (message.get("role"), message.get("time"), message.get("model")) if value
+            )
+            yield f'<div class="message {kind}">\n<div class="meta">{details}</div>\n'
+            text = _message_text(message)
+            if text is None:
+                src = html.escape("file://" + blob_store.blob_path(message["blob"]))
+                yield f'<img src="{src}" alt="image">\n'
+            else:
+                yield f'<div class="content">{html.escape(text)}</div>\n'
+            yield "</div>\n"
+        yield "</section>\n"
+    yield "</body>\n</html>\n"
+
+
+RENDERERS = {
+    JSONL: render_jsonl,
+    MARKDOWN: render_markdown,
+    HTML: render_html,
+}
+
+
+def export_threads(chats, path, fmt=None, progress=None, cancelled=None):
+    """Write chats to path in fmt (guessed from the extension if None).
+
+    progress(done, total) is called after each thread; if cancelled() turns
+    true the export stops, raises Cancelled and leaves path untouched.
+    Returns the number of threads written.
+    """
+    fmt = fmt or format_for_path(path)
+    chats = list(chats)
+    total = len(chats)
+    done = 0
+
+    def counted(threads):
+        nonlocal done
+        for thread in threads:
+            if cancelled is not None and cancelled():
+                raise Cancelled()
+            yield thread
+            done += 1
+            if progress is not None:
+                progress(done, total)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".export-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for chunk in RENDERERS[fmt](counted(iter_threads(chats))):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return done
+
+
+def read_jsonl(path):
+    """Yield the chats of an exported JSONL file, skipping lines that are not threads."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                chat = json.loads(line)
+            except ValueError:
+                print(f"{path}:{number}: not JSON, skipped", file=sys.stderr)
+                continue
+            if not isinstance(chat, dict) or not isinstance(chat.get("content"), list):
+                print(f"{path}:{number}: not a thread, skipped", file=sys.stderr)
+                continue
+            yield chat
+
+
+def import_batches(path, existing_uids, batch_size=IMPORT_BATCH):
+    """Yield lists of chats from a JSONL export, prepared for Storage.chats_added().
+
+    existing_uids is updated as chats are prepared. Safe to run on a worker
+    thread; number_chats() then gives each batch ids where it is inserted.
+    """
+    batch = []
+    for chat in read_jsonl(path):
+        uid = storage.chat_uid(chat) if chat.get("uid") else uuid.uuid4().hex
+        if uid in existing_uids:
+            continue
+        existing_uids.add(uid)
+
+        messages = []
+        for message in chat["content"]:
+            if isinstance(message, dict) and "role" in message:
+                message.pop("status", None)  # 내보낼 때 생성 중이던 답변도 완료된 것으로 본다
+                _restore_blob(message)
+                messages.append(storage.classify_message(message))
+        now = time.time()
+        chat["content"] = messages
+        chat["uid"] = uid
+        chat.setdefault("starred", False)
+        chat.setdefault("created", now)
+        chat.setdefault("updated", now)
+        chat.pop("archived", None)
+
+        batch.append(chat)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def number_chats(batch, chats):
+    """Give imported chats ids after the largest one in chats (call where they are inserted)."""
+    next_id = max((chat.get("id", 0) for chat in chats), default=0)
+    for chat in batch:
+        next_id += 1
+        chat["id"] = next_id
+        chat.setdefault("title", f"New Chat {next_id}")
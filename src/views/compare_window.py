@@ -0,0 +1,289 @@
+import threading
+
+from gi.repository import Gtk, Adw, GLib, Pango
+try:
+    from builtins import _  # provided by gettext.install in launcher
+except Exception:
+    from gettext import gettext as _  # fallback when running out of tree
+
+from ..constants import rootdir
+from ..hamonikr_threading import KillableThread
+from ..metrics import StreamMetrics
+from ..providers.base import ProviderType
+
+
+class CompareColumn(Gtk.Box):
+    """One provider/model pair in the compare view."""
+
+    def __init__(self, window, slug, model, **kwargs):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=6, **kwargs)
+
+        self.window = window
+        self.slug = slug
+        self.model = model
+        self.thread = None
+        self.metrics = None
+        self.text = ""
+        self._update_pending = False
+
+        provider = window.app.providers.get(slug)
+        name = getattr(provider, "name", slug)
+
+        header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        title = Gtk.Label(label=f"{name} · {model}" if model else name)
+        title.set_hexpand(True)
+        title.set_xalign(0)
+        title.set_ellipsize(Pango.EllipsizeMode.END)
+        title.add_css_class("heading")
+        header.append(title)
+
+        close_button = Gtk.Button(icon_name="window-close-symbolic")
+        close_button.set_tooltip_text(_("Remove column"))
+        close_button.add_css_class("flat")
+        close_button.add_css_class("circular")
+        close_button.connect("clicked", self.on_close)
+        header.append(close_button)
+        self.append(header)
+
+        self.metrics_label = Gtk.Label(label=_("Idle"))
+        self.metrics_label.set_xalign(0)
+        self.metrics_label.add_css_class("dim-label")
+        self.metrics_label.add_css_class("caption")
+        self.append(self.metrics_label)
+
+        self.label = Gtk.Label()
+        self.label.set_wrap(True)
+        self.label.set_wrap_mode(Pango.WrapMode.WORD_CHAR)
+        self.label.set_xalign(0)
+        self.label.set_yalign(0)
+        self.label.set_selectable(True)
+        self.label.add_css_class("message-content")
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_vexpand(True)
+        scrolled.set_hscrollbar_policy(Gtk.PolicyType.NEVER)
+        scrolled.set_child(self.label)
+        scrolled.add_css_class("card")
+        self.append(scrolled)
+
+        self.set_size_request(280, -1)
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, prompt, chat):
+        self.cancel()
+        self.text = ""
+        self.label.set_text("")
+        self.metrics = StreamMetrics().start()
+        self.metrics_label.set_text(_("Waiting for first token…"))
+
+        provider = self.window.app.create_provider(self.slug, self.model)
+        if provider is None:
+            self.metrics_label.set_text(_("Provider not available"))
+            return
+
+        metrics = self.metrics
+
+        def on_chunk(chunk_text):
+            metrics.on_chunk(chunk_text)
+            self.text += chunk_text or ""
+            self._schedule_update()
+
+        def run():
+            try:
+                response = provider.generate(prompt, chat, callback=on_chunk)
+            except Exception as e:
+                response = str(e)
+            GLib.idle_add(self._finish, metrics, response)
+
+        self.thread = KillableThread(target=run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        if self.running:
+            self.thread.kill()
+            self.metrics_label.set_text(_("Cancelled"))
+        self.thread = None
+
+    def _schedule_update(self):
+        # 청크마다 idle 콜백을 쌓지 않도록 한 번만 예약
+        if self._update_pending:
+            return
+        self._update_pending = True
+        GLib.idle_add(self._update)
+
+    def _update(self):
+        self._update_pending = False
+        self.label.set_text(self.text)
+        self.metrics_label.set_text(self._format_metrics())
+        return False
+
+    def _finish(self, metrics, response):
+        if metrics is not self.metrics:
+            return False  # a newer run replaced this one
+        self.thread = None
+        metrics.finish(response)
+        if isinstance(response, str) and response and not self.text:
+            self.text = response
+        self._update()
+        self.window.on_column_finished(self)
+        return False
+
+    def _format_metrics(self):
+        m = self.metrics
+        if m is None or m.ttft is None:
+            return _("Waiting for first token…")
+        parts = [_("TTFT {:.2f}s").format(m.ttft)]
+        tps = m.tokens_per_second
+        if tps is not None:
+            parts.append(_("{:.1f} tok/s").format(tps))
+        if m.finished is not None:
+            parts.append(_("{:.2f}s total").format(m.duration))
+        return " · ".join(parts)
+
+    def on_close(self, *args):
+        self.cancel()
+        self.window.remove_column(self)
+
+
+@Gtk.Template(resource_path=f"{rootdir}/ui/compare_window.ui")
+class CompareWindow(Adw.Window):
+    __gtype_name__ = "CompareWindow"
+
+    provider_slugs = []
+
+    toast_overlay = Gtk.Template.Child()
+    title = Gtk.Template.Child()
+    provider_dropdown = Gtk.Template.Child()
+    model_dropdown = Gtk.Template.Child()
+    columns_box = Gtk.Template.Child()
+    prompt_entry = Gtk.Template.Child()
+    cancel_button = Gtk.Template.Child()
+    send_button = Gtk.Template.Child()
+
+    def __init__(self, parent, **kwargs):
+        super().__init__(**kwargs)
+
+        self.parent = parent
+        self.app = parent.get_application()
+        self.columns = []
+        self._models_request = 0
+
+        self.set_transient_for(parent)
+
+        # 현재 대화를 히스토리로 사용 (원본은 변경하지 않음)
+        try:
+            self.history = list(parent.content)
+            self.title.set_subtitle(parent.chat.get("title", ""))
+        except Exception:
+            self.history = []
+
+        self.provider_slugs = [
+            p.slug for p in self.app.providers.values()
+            if p.enabled and p.provider_type == ProviderType.CHAT
+        ]
+        self.provider_dropdown.set_model(Gtk.StringList.new(
+            [self.app.providers[slug].name for slug in self.provider_slugs]
+        ))
+        if self.app.current_provider in self.provider_slugs:
+            self.provider_dropdown.set_selected(
+                self.provider_slugs.index(self.app.current_provider)
+            )
+        self.on_provider_changed()
+
+    @property
+    def selected_slug(self):
+        index = self.provider_dropdown.get_selected()
+        if 0 <= index < len(self.provider_slugs):
+            return self.provider_slugs[index]
+        return None
+
+    @property
+    def selected_model(self):
+        item = self.model_dropdown.get_selected_item()
+        return item.get_string() if item is not None else ""
+
+    @Gtk.Template.Callback()
+    def on_provider_changed(self, *args):
+        slug = self.selected_slug
+        provider = self.app.providers.get(slug)
+        if provider is None:
+            self.model_dropdown.set_model(Gtk.StringList.new([]))
+            return
+
+        current = getattr(provider, "model", None) or ""
+        self.model_dropdown.set_model(Gtk.StringList.new([current] if current else []))
+
+        # 모델 목록은 네트워크 조회가 필요할 수 있으므로 워커에서 가져온다
+        self._models_request += 1
+        request = self._models_request
+
+        def fetch():
+            try:
+                models = provider.get_available_models() or []
+            except Exception:
+                models = []
+            GLib.idle_add(self._set_models, request, current, models)
+
+        if hasattr(provider, "get_available_models"):
+            threading.Thread(target=fetch, daemon=True).start()
+
+    def _set_models(self, request, current, models):
+        if request != self._models_request:
+            return False  # provider changed meanwhile
+        models = list(dict.fromkeys(([current] if current else []) + list(models)))
+        self.model_dropdown.set_model(Gtk.StringList.new(models))
+        return False
+
+    @Gtk.Template.Callback()
+    def on_add_column(self, *args):
+        slug = self.selected_slug
+        if slug is None:
+            return
+        column = CompareColumn(self, slug, self.selected_model)
+        self.columns.append(column)
+        self.columns_box.append(column)
+
+    def remove_column(self, column):
+        if column in self.columns:
+            self.columns.remove(column)
+            self.columns_box.remove(column)
+        self._update_buttons()
+
+    @Gtk.Template.Callback()
+    def on_send(self, *args):
+        prompt = self.prompt_entry.get_text().strip()
+        if not prompt:
+            return
+        if not self.columns:
+            toast = Adw.Toast()
+            toast.set_title(_("Add at least one provider/model column"))
+            self.toast_overlay.add_toast(toast)
+            return
+
+        self.prompt_entry.set_text("")
+        self.history.append({"role": self.app.user_name, "content": prompt})
+
+        for column in self.columns:
+            # 각 컬럼이 동일한 히스토리 스냅샷을 받도록 복사본 전달
+            column.start(prompt, {"content": list(self.history)})
+        self._update_buttons()
+
+    @Gtk.Template.Callback()
+    def on_cancel(self, *args):
+        for column in self.columns:
+            column.cancel()
+        self._update_buttons()
+
+    def on_column_finished(self, column):
+        self._update_buttons()
+
+    def _update_buttons(self):
+        running = any(column.running for column in self.columns)
+        self.cancel_button.set_sensitive(running)
+
+    def do_close_request(self):
+        self.on_cancel()
+        return False
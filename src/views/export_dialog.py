@@ -1,6 +1,7 @@
 from gi.repository import Gtk, Adw, Gio, GtkSource, Gdk
 
 from ..constants import app_id, rootdir
+from ..widgets import source_style
 from .save_dialog import SaveDialog
 
 GtkSource.init()
@@ -15,21 +16,17 @@ class ExportDialog(Adw.MessageDialog):
     def __init__(self, parent, chat, **kwargs):
         super().__init__(**kwargs)
 
-        self.text: str = ""
         self.parent = parent
-        for i, x in zip(chat, range(len(chat))):
-            self.text += f"{i['role']}: {i['content']}\n"
-
-            if (x % 2) != 0:
-                self.text += "\n"
-
-        self.text = self.text[:-2]
+        self.chat = chat
+        # 문자열을 이어 붙이지 않고 조각을 모아 한 번에 합친다
+        parts = []
+        for index, message in enumerate(chat.get("content", [])):
+            parts.append(f"{message['role']}: {message['content']}\n")
+            if index % 2:
+                parts.append("\n")
+        self.text: str = "".join(parts)[:-2]
         self.buffer.set_text(self.text)
-        self._apply_sourceview_scheme()
-        try:
-            Adw.StyleManager.get_default().connect("notify::dark", self._on_style_changed)
-        except Exception:
-            pass
+        source_style.get_default().subscribe(self)
 
 
     @Gtk.Template.Callback()
@@ -39,18 +36,9 @@ class ExportDialog(Adw.MessageDialog):
     @Gtk.Template.Callback()
     def handle_response(self, dialog, response, *args, **kwargs):
         if response == "export":
-            dialog = SaveDialog(self.parent, self.text)
+            dialog = SaveDialog(self.parent, self.text, self.chat)
             dialog.set_transient_for(self.parent)
             dialog.present()
 
-    def _apply_sourceview_scheme(self):
-        try:
-            is_dark = Adw.StyleManager().get_dark()
-        except Exception:
-            is_dark = False
-        scheme_id = "Adwaita-dark" if is_dark else "Adwaita"
-        mgr = GtkSource.StyleSchemeManager()
-        self.buffer.set_style_scheme(mgr.get_scheme(scheme_id))
-
-    def _on_style_changed(self, *args):
-        self._apply_sourceview_scheme()
+    def apply_style_scheme(self, scheme):
+        self.buffer.set_style_scheme(scheme)
@@ -1,6 +1,7 @@
 from gi.repository import Gtk, Adw, Gio, Gdk
 
 from ..constants import app_id, rootdir
+from .. import transfer
 
 @Gtk.Template(resource_path=f"{rootdir}/ui/save_dialog.ui")
 class SaveDialog(Adw.MessageDialog):
@@ -10,23 +11,31 @@ class SaveDialog(Adw.MessageDialog):
     file_chooser = Gtk.Template.Child()
     location = Gtk.Template.Child()
 
-    def __init__(self, parent, text, **kwargs):
+    def __init__(self, parent, text, chat=None, **kwargs):
         super().__init__(**kwargs)
 
         self.text: str = text
+        self.chat = chat
         self.parent = parent
 
     @Gtk.Template.Callback()
     def handle_response(self, dialog, response, *args, **kwargs):
         if response == "save":
             filename = self.filename.get_text()
-            path = f"{self.directory}/{filename}.md"
+            # 확장자로 형식을 고른다 (.jsonl/.html), 없으면 지금처럼 .md
+            fmt = transfer.format_for_path(filename, None)
+            if fmt is None:
+                filename += ".md"
+            path = f"{self.directory}/{filename}"
 
             toast = Adw.Toast()
             try:
-                with open(path, "w") as f:
-                    f.write(self.text)
-            except FileNotFoundError:
+                if fmt in (transfer.JSONL, transfer.HTML) and self.chat:
+                    transfer.export_threads([self.chat], path, fmt)
+                else:
+                    with open(path, "w") as f:
+                        f.write(self.text)
+            except OSError:
                 toast.set_title(_("Unable to save the Thread"))
             else:
                 toast.set_title(_("Thread successfully saved!"))
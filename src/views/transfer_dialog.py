@@ -0,0 +1,63 @@
+import threading
+import time
+
+from gi.repository import Gtk, Adw, GLib
+
+try:
+    from builtins import _  # provided by gettext.install in launcher
+except ImportError:
+    from gettext import gettext as _  # fallback when running out of tree
+
+
+class TransferDialog(Adw.MessageDialog):
+    """Progress of a bulk export or import running on a worker thread.
+
+    progress() may be called from any thread; updates reach the bar at
+    most every UPDATE_INTERVAL seconds. Cancel sets the cancelled event the
+    worker polls.
+    """
+
+    UPDATE_INTERVAL = 0.1
+
+    def __init__(self, parent, heading, **kwargs):
+        super().__init__(heading=heading, modal=True, **kwargs)
+        self.set_transient_for(parent)
+
+        self.bar = Gtk.ProgressBar()
+        self.bar.set_show_text(True)
+        self.bar.set_margin_top(12)
+        self.set_extra_child(self.bar)
+
+        self.add_response("cancel", _("Cancel"))
+        self.set_close_response("cancel")
+        self.connect("response", self.on_response)
+
+        self.cancelled = threading.Event()
+        self.finished = False
+        self._last_update = 0
+
+    def on_response(self, _dialog, response):
+        if not self.finished:
+            self.cancelled.set()
+
+    def progress(self, done, total):
+        now = time.monotonic()
+        # 마지막 갱신은 항상 보낸다
+        if (not total or done < total) and now - self._last_update < self.UPDATE_INTERVAL:
+            return
+        self._last_update = now
+        GLib.idle_add(self._update, done, total)
+
+    def _update(self, done, total):
+        if total:
+            self.bar.set_fraction(done / total)
+            self.bar.set_text(_("{} of {}").format(done, total))
+        else:
+            # 전체 개수를 모르는 경우(가져오기)
+            self.bar.pulse()
+            self.bar.set_text(str(done))
+        return False
+
+    def finish(self):
+        self.finished = True
+        self.close()
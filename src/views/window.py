@@ -17,11 +17,14 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+from collections import OrderedDict
 from datetime import datetime
 import locale 
-import io 
-import base64
+import os
 import re
+import sys
+import threading
+import time
 
 from gi.repository import Gtk, Gio, Adw, GLib, Gdk
 try:
@@ -31,10 +34,23 @@ except Exception:
 from babel.dates import format_date, format_datetime, format_time
 
 from ..constants import app_id, build_type, rootdir
-from ..widgets.thread_item import ThreadItem
-from ..widgets.item import Item
+from ..widgets.thread_item import ThreadItem, ThreadObject
+from ..widgets.message_list import MessageList
+from ..widgets.item import planner
 from ..hamonikr_threading import KillableThread
+from .. import archive, blob_store, search_index, storage, transfer
+from ..storage import MESSAGE_TEXT, MESSAGE_IMAGE, MESSAGE_ERROR, STATUS_STREAMING, STATUS_INTERRUPTED
 from .export_dialog import ExportDialog
+from .transfer_dialog import TransferDialog
+
+# 스레드 전환 시 재사용할 메시지 목록 위젯 캐시 한도
+MAX_CACHED_THREADS = 8
+MAX_CACHED_COST = 4 * 1024 * 1024
+# 렌더 계획을 미리 만들어 둘 최근 스레드 수
+MAX_RECENT_THREADS = 10
+# 생성 중인 답변을 저장하는 간격(초)
+STREAM_CHECKPOINT_INTERVAL = 2.0
+
 
 class CustomEntry(Gtk.TextView):
     def __init__(self, **kwargs):
@@ -127,10 +143,17 @@ class CustomEntry(Gtk.TextView):
 class BavarderWindow(Adw.ApplicationWindow):
     __gtype_name__ = 'BavarderWindow'
 
+    # 손상 복구 알림은 창이 여러 개여도 한 번만 보여 준다
+    damaged_notice_shown = False
+
     split_view = Gtk.Template.Child()
     threads_list = Gtk.Template.Child()
+    threads_scroll = Gtk.Template.Child()
+    thread_search_entry = Gtk.Template.Child()
+    status_no_results = Gtk.Template.Child()
     title = Gtk.Template.Child()
     main_list = Gtk.Template.Child()
+    main_clamp = Gtk.Template.Child()
     status_no_chat = Gtk.Template.Child()
     status_no_chat_thread = Gtk.Template.Child()
     status_no_thread = Gtk.Template.Child()
@@ -145,11 +168,15 @@ class BavarderWindow(Adw.ApplicationWindow):
     main = Gtk.Template.Child()
     scroll_down_button = Gtk.Template.Child()
 
-    threads = []
-
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+        self.thread_views = OrderedDict()
+        self.recent_threads = OrderedDict()
+        self._loading_older = False
+        self._prefetch_id = 0
+        self.streaming = None
+
         self.app = Gtk.Application.get_default()
         self.settings = Gio.Settings(schema_id=app_id)
 
@@ -165,13 +192,16 @@ class BavarderWindow(Adw.ApplicationWindow):
         self.message_entry.add_css_class("chat-entry")
 
         self.scrolled_window.set_child(self.message_entry)
+        self.setup_threads_list()
         self.load_threads()
+        self.show_damaged_notice()
 
         # 로컬/클라우드 모드 토글 제거
 
         self.create_action("cancel", self.cancel, ["<primary>Escape"])
         self.create_action("clear_all", self.on_clear_all)
         self.create_action("export", self.on_export, ["<primary>e"])
+        self.create_action("search", self.on_search_action, ["<primary>f"])
 
         self.settings.bind(
             "width", self, "default-width", Gio.SettingsBindFlags.DEFAULT
@@ -196,12 +226,11 @@ class BavarderWindow(Adw.ApplicationWindow):
 
     @property
     def chat(self):
-        try:
-            return self.threads_list.get_selected_row().get_child().chat
-        except AttributeError: # create a new chat
-            #self.on_new_chat_action()
+        # 검색으로 사이드바에서 가려져도 열린 스레드는 그대로 유지한다
+        if self.current_thread is None: # no thread selected
             return {}
-        
+        return self.current_thread.chat
+
 
     @property
     def content(self):
@@ -210,22 +239,276 @@ class BavarderWindow(Adw.ApplicationWindow):
         except KeyError: # no content
             return []
 
+    def setup_threads_list(self):
+        """Sidebar: Gio.ListStore -> Gtk.FilterListModel -> Gtk.SortListModel
+        -> Gtk.SingleSelection -> Gtk.ListView.
+
+        The list view only creates ThreadItem rows for what is on screen and
+        rebinds them while scrolling; adding or removing a chat touches one
+        store item instead of rebuilding the sidebar. The filter and sorter
+        are only set while a search is active.
+        """
+        self.thread_objects = {}
+        self.current_thread = None
+        self.search_index = search_index.get_default()
+        self.app.storage.add_listener(self.search_index)
+        self.search_query = ""
+        self.search_ranks = {}
+        self._quiet_selection = False
+        self._external_change = False
+
+        self.thread_store = Gio.ListStore.new(ThreadObject)
+        self.thread_filter = Gtk.CustomFilter.new(self._filter_thread, None)
+        self.thread_sorter = Gtk.CustomSorter.new(self._compare_threads, None)
+        self.thread_filter_model = Gtk.FilterListModel.new(self.thread_store, None)
+        self.thread_model = Gtk.SortListModel.new(self.thread_filter_model, None)
+        self.thread_selection = Gtk.SingleSelection.new(self.thread_model)
+        self.thread_selection.set_autoselect(False)
+        self.thread_selection.set_can_unselect(True)
+        self.thread_selection.connect("notify::selected-item", self.on_thread_selected)
+
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", lambda _factory, list_item: list_item.set_child(ThreadItem(self)))
+        factory.connect("bind", lambda _factory, list_item: list_item.get_child().bind(list_item.get_item()))
+        factory.connect("unbind", lambda _factory, list_item: list_item.get_child().unbind())
+
+        self.threads_list.set_factory(factory)
+        self.threads_list.set_model(self.thread_selection)
+        self.threads_list.connect("activate", self.on_thread_activated)
+
     def load_threads(self):
-        self.threads_list.remove_all()
-        if self.app.data["chats"]:
-            self.thread_stack.set_visible_child(self.threads_list)
-            self.stack.set_visible_child(self.main)
-            for chat in self.app.data["chats"]:
-                thread = ThreadItem(self, chat)
-                self.threads_list.append(thread)
-                self.threads.append(thread)
+        """Replace the sidebar model with app.data["chats"] in a single splice."""
+        self.thread_objects = {}
+        self.current_thread = None
+        threads = [self.new_thread_object(chat) for chat in self.app.data["chats"]]
+        self.thread_store.splice(0, self.thread_store.get_n_items(), threads)
+
+        # 전체 색인은 워커 스레드에서 만들고, 끝나면 입력된 검색어를 다시 적용
+        self.search_index.rebuild_async(
+            self.app.data["chats"],
+            lambda: GLib.idle_add(self.refresh_thread_search),
+        )
+        self.refresh_thread_search()
 
-                try:
-                    if not chat["content"]:
-                        self.stack.set_visible_child(self.status_no_chat)
-                except KeyError:
-                    self.stack.set_visible_child(self.status_no_chat)
-            self.stack.set_visible_child(self.status_no_thread_main)
+    def show_damaged_notice(self):
+        """Tell the user once if data.json had to be salvaged at startup."""
+        storage = self.app.storage
+        if not storage.damaged or BavarderWindow.damaged_notice_shown:
+            return
+        BavarderWindow.damaged_notice_shown = True
+        toast = Adw.Toast()
+        if storage.damaged_backup:
+            toast.set_title(
+                _("Chat history was damaged and has been recovered. The original was kept as {}").format(
+                    os.path.basename(storage.damaged_backup)
+                )
+            )
+        else:
+            toast.set_title(_("Chat history was damaged and has been recovered"))
+        toast.set_timeout(0)
+        self.toast_overlay.add_toast(toast)
+
+    def new_thread_object(self, chat):
+        thread = ThreadObject(chat)
+        thread.connect("notify::title", self.on_thread_changed)
+        thread.connect("notify::starred", self.on_thread_changed)
+        self.thread_objects[chat.get("id")] = thread
+        return thread
+
+    def on_thread_changed(self, thread, _pspec):
+        if self._external_change:
+            return  # 다른 인스턴스가 이미 저장한 값
+        self.app.storage.chat_updated(thread.chat)
+
+    def add_thread(self, chat):
+        thread = self.new_thread_object(chat)
+        self.thread_store.append(thread)
+        self.update_thread_stack()
+        return thread
+
+    def add_threads(self, chats):
+        threads = [self.new_thread_object(chat) for chat in chats]
+        self.thread_store.splice(self.thread_store.get_n_items(), 0, threads)
+        self.update_thread_stack()
+
+    def remove_thread(self, chat):
+        """Delete chat from the data and drop its sidebar row and cached views."""
+        try:
+            self.app.data["chats"].remove(chat)
+        except ValueError:
+            pass
+        self.app.storage.chat_removed(chat)
+        if archive.is_archived(chat):
+            archive.remove_thread(chat)
+        self.drop_thread(chat)
+
+    def open_chat_ids(self):
+        """Ids of chats this window shows or keeps widgets for (not to be archived)."""
+        ids = set(self.thread_views)
+        if self.chat:
+            ids.add(self.chat.get("id"))
+        if self.streaming is not None:
+            ids.add(self.streaming[0].get("id"))
+        return ids
+
+    def drop_thread(self, chat, key=None):
+        """Remove chat's sidebar row and cached views (the data is left alone)."""
+        if key is None:
+            key = chat.get("id")
+        thread = self.thread_objects.pop(key, None)
+        if thread is not None:
+            if thread is self.current_thread:
+                self.current_thread = None
+            found, position = self.thread_store.find(thread)
+            if found:
+                self.thread_store.remove(position)
+        self.thread_views.pop(key, None)
+        self.recent_threads.pop(key, None)
+        self.update_thread_stack()
+
+    def apply_external_changes(self, added, updated, removed, renumbered):
+        """Show chats another instance added, changed or deleted (see Storage.merge_external)."""
+        current = self.chat
+        self._external_change = True
+        try:
+            for chat in removed:
+                self.drop_thread(chat)
+            for chat, old_id in renumbered:
+                thread = self.thread_objects.pop(old_id, None)
+                self.thread_views.pop(old_id, None)
+                self.recent_threads.pop(old_id, None)
+                if thread is not None:
+                    self.thread_objects[chat.get("id")] = thread
+            for chat in added:
+                self.add_thread(chat)
+            for chat in updated:
+                thread = self.thread_objects.get(chat.get("id"))
+                if thread is not None:
+                    thread.props.title = chat.get("title", "")
+                    thread.props.starred = chat.get("starred", False)
+                self.thread_views.pop(chat.get("id"), None)
+        finally:
+            self._external_change = False
+
+        self.refresh_thread_search()
+        if current and any(chat is current for chat in updated + removed):
+            self.threads_row_activated_cb()
+
+    def thread_position(self, thread):
+        """Position of thread in the (possibly filtered) sidebar, or None."""
+        if not self.search_query:
+            found, position = self.thread_store.find(thread)
+            return position if found else None
+        for position in range(self.thread_model.get_n_items()):
+            if self.thread_model.get_item(position) is thread:
+                return position
+        return None
+
+    def select_thread(self, chat):
+        """Select chat in the sidebar, which opens it; returns False if it is not listed."""
+        thread = self.thread_objects.get(chat.get("id"))
+        position = self.thread_position(thread) if thread is not None else None
+        if position is None:
+            return False
+        if thread is self.current_thread:
+            self.threads_row_activated_cb()
+        else:
+            self.thread_selection.set_selected(position)
+        try:
+            self.threads_list.scroll_to(position, Gtk.ListScrollFlags.NONE, None)
+        except Exception:
+            pass
+        return True
+
+    def on_thread_selected(self, *args):
+        thread = self.thread_selection.get_selected_item()
+        if thread is not None and not self._quiet_selection:
+            self.current_thread = thread
+            self.threads_row_activated_cb()
+
+    def on_thread_activated(self, list_view, position):
+        # Enter/더블클릭: 이미 선택된 행도 다시 연다 (접힌 화면에서 본문으로 이동)
+        if self.thread_model.get_item(position) is self.current_thread:
+            self.threads_row_activated_cb()
+        else:
+            self.thread_selection.set_selected(position)
+
+    def sync_thread_selection(self):
+        """Point the sidebar selection at the open thread without re-opening it."""
+        position = None
+        if self.current_thread is not None:
+            position = self.thread_position(self.current_thread)
+        self._quiet_selection = True
+        try:
+            self.thread_selection.set_selected(
+                Gtk.INVALID_LIST_POSITION if position is None else position
+            )
+        finally:
+            self._quiet_selection = False
+
+    @Gtk.Template.Callback()
+    def on_thread_search_changed(self, entry):
+        self.apply_thread_search(entry.get_text())
+
+    @Gtk.Template.Callback()
+    def on_thread_search_stopped(self, entry):
+        entry.set_text("")
+        self.apply_thread_search("")
+
+    def on_search_action(self, *args):
+        self.split_view.set_show_content(False)
+        self.thread_search_entry.grab_focus()
+
+    def refresh_thread_search(self):
+        self.apply_thread_search(self.search_query)
+        return False
+
+    def apply_thread_search(self, query):
+        """Filter and rank the sidebar by the search index."""
+        self.search_query = query.strip()
+        if not self.search_query:
+            self.search_ranks = {}
+            self.thread_filter_model.set_filter(None)
+            self.thread_model.set_sorter(None)
+        else:
+            hits = self.search_index.search(self.search_query)
+            if hits is None:
+                # 색인을 만드는 동안에는 제목만으로 거른다
+                lowered = self.search_query.lower()
+                hits = [
+                    (thread.id, 0) for thread in self.thread_store
+                    if lowered in thread.props.title.lower()
+                ]
+            self.search_ranks = {key: rank for rank, (key, _score) in enumerate(hits)}
+            if self.thread_filter_model.get_filter() is None:
+                self.thread_filter_model.set_filter(self.thread_filter)
+                self.thread_model.set_sorter(self.thread_sorter)
+            else:
+                self.thread_filter.changed(Gtk.FilterChange.DIFFERENT)
+                self.thread_sorter.changed(Gtk.SorterChange.DIFFERENT)
+        self.sync_thread_selection()
+        self.update_thread_stack()
+
+    def _filter_thread(self, thread, *args):
+        return thread.id in self.search_ranks
+
+    def _compare_threads(self, a, b, *args):
+        rank_a = self.search_ranks.get(a.id, len(self.search_ranks))
+        rank_b = self.search_ranks.get(b.id, len(self.search_ranks))
+        if rank_a < rank_b:
+            return Gtk.Ordering.SMALLER
+        if rank_a > rank_b:
+            return Gtk.Ordering.LARGER
+        return Gtk.Ordering.EQUAL
+
+    def update_thread_stack(self):
+        if self.app.data["chats"]:
+            if self.search_query and not self.search_ranks:
+                self.thread_stack.set_visible_child(self.status_no_results)
+            else:
+                self.thread_stack.set_visible_child(self.threads_scroll)
+            if not self.chat:
+                self.stack.set_visible_child(self.status_no_thread_main)
         else:
             if self.props.default_width < 500:
                 self.thread_stack.set_visible_child(self.status_no_thread)
@@ -251,14 +534,19 @@ class BavarderWindow(Adw.ApplicationWindow):
             self.has_been_allocated
         except Exception:
             self.has_been_allocated = True
-            self.load_threads()
+            # 첫 배치 때 실제 창 너비에 맞는 빈 화면을 고른다
+            self.update_thread_stack()
 
         Adw.ApplicationWindow.do_size_allocate(self, width, height, baseline)
 
-    @Gtk.Template.Callback()
     def threads_row_activated_cb(self, *args):
         self.split_view.set_show_content(True)
 
+        if archive.is_archived(self.chat) and not self.app.archiver.rehydrate(self.chat):
+            toast = Adw.Toast()
+            toast.set_title(_("Could not open the archived conversation"))
+            self.toast_overlay.add_toast(toast)
+
         try:
             self.title.set_title(self.chat["title"])
         except KeyError:
@@ -266,32 +554,95 @@ class BavarderWindow(Adw.ApplicationWindow):
 
         if self.content:
             self.stack.set_visible_child(self.main)
-            self.main_list.remove_all()
-            i = 0
-            for item in self.content:
-                i += 1
-                item = Item(self, self.chat, item)
-                self.main_list.append(item)
-            
-            for i in range(i):
-                row = self.main_list.get_row_at_index(i)
-                row.set_selectable(False)
-                row.set_activatable(False)
+            self.show_thread(self.chat)
         else:
             self.stack.set_visible_child(self.status_no_chat)
 
+    def show_thread(self, chat):
+        """Swap the chat's message list into the view, reusing a cached one if any."""
+        key = chat.get("id")
+        message_list = self.thread_views.get(key)
+        if message_list is None or message_list.chat is not chat:
+            message_list = MessageList(self, chat)
+            self.thread_views[key] = message_list
+        self.thread_views.move_to_end(key)
+        message_list.sync()
+
+        if self.main_clamp.get_child() is not message_list:
+            self.main_clamp.set_child(message_list)
+            self.main_list = message_list
+            # 스레드를 새로 열면 마지막 메시지로 이동 (레이아웃 이후)
+            GLib.idle_add(self._scroll_to_latest)
+
+        # 최근 스레드 N개, 추정 메모리 상한 안에서만 위젯 트리를 유지
+        total = sum(view.cost for view in self.thread_views.values())
+        while len(self.thread_views) > 1 and (
+            len(self.thread_views) > MAX_CACHED_THREADS or total > MAX_CACHED_COST
+        ):
+            _key, evicted = self.thread_views.popitem(last=False)
+            total -= evicted.cost
+
+        self.recent_threads[key] = chat
+        self.recent_threads.move_to_end(key)
+        while len(self.recent_threads) > MAX_RECENT_THREADS:
+            self.recent_threads.popitem(last=False)
+        self.schedule_prefetch()
+
+    def prefetch_candidates(self):
+        """Threads worth warming up: sidebar neighbours first, then recently opened ones."""
+        candidates = []
+        index = self.thread_selection.get_selected()
+        if index != Gtk.INVALID_LIST_POSITION:
+            count = self.thread_model.get_n_items()
+            for neighbour in (index + 1, index - 1, index + 2, index - 2):
+                if 0 <= neighbour < count:
+                    candidates.append(self.thread_model.get_item(neighbour).chat)
+        candidates.extend(reversed(self.recent_threads.values()))
+
+        current = self.chat
+        seen = set()
+        result = []
+        for chat in candidates:
+            key = chat.get("id")
+            if chat is current or key in seen:
+                continue
+            seen.add(key)
+            view = self.thread_views.get(key)
+            if view is not None and view.chat is chat:
+                continue  # 이미 위젯까지 만들어져 있음
+            result.append(chat)
+        return result
+
+    def schedule_prefetch(self):
+        """Plan the visible page of nearby threads while the UI is idle."""
+        if self._prefetch_id:
+            GLib.source_remove(self._prefetch_id)
+        queue = self.prefetch_candidates()
+
+        def step():
+            if not queue:
+                self._prefetch_id = 0
+                return False
+            chat = queue.pop(0)
+            # 한 번의 idle 호출에 스레드 하나씩, 계산 자체는 워커 풀에서
+            for message in chat.get("content", [])[-MessageList.PAGE_SIZE:]:
+                planner.request(message)
+            return True
+
+        self._prefetch_id = GLib.idle_add(step, priority=GLib.PRIORITY_LOW)
+
     @Gtk.Template.Callback()
     def on_new_chat_action(self, *args):
+        # 검색 중이면 새 채팅이 가려지지 않도록 검색을 먼저 해제
+        if self.search_query:
+            self.thread_search_entry.set_text("")
+            self.apply_thread_search("")
         # 새 채팅 생성
         self.app.on_new_chat_action(None, None)
         # 방금 생성된 마지막 스레드를 선택/활성화하여 중복 생성 방지
         try:
-            last_index = len(self.app.data["chats"]) - 1
-            if last_index >= 0:
-                row = self.threads_list.get_row_at_index(last_index)
-                if row:
-                    self.threads_list.select_row(row)
-                    self.threads_row_activated_cb()
+            if self.app.data["chats"]:
+                if self.select_thread(self.app.data["chats"][-1]):
                     try:
                         self.split_view.set_show_content(True)
                     except Exception:
@@ -313,6 +664,41 @@ class BavarderWindow(Adw.ApplicationWindow):
         else:
             self.scroll_down_button.set_visible(True)
 
+        if edge == Gtk.PositionType.TOP:
+            self.load_older_messages()
+
+    def _scroll_to_latest(self):
+        self.scroll_down()
+        # 마지막 페이지가 화면을 다 채우지 못하면 스크롤이 생길 때까지 이전 페이지를 더 불러온다
+        adjustment = self.main.get_vadjustment()
+        if adjustment.get_upper() <= adjustment.get_page_size():
+            self.load_older_messages()
+        return False
+
+    def load_older_messages(self):
+        """Prepend the previous page of the open thread, keeping the scroll position."""
+        message_list = self.main_list
+        if self._loading_older or not isinstance(message_list, MessageList):
+            return
+        if not message_list.has_older:
+            return
+
+        adjustment = self.main.get_vadjustment()
+        old_upper = adjustment.get_upper()
+        old_value = adjustment.get_value()
+        self._loading_older = True
+
+        def on_changed(adj):
+            adj.disconnect(handler_id)
+            # 위에 추가된 높이만큼 내려서 보고 있던 메시지가 그대로 보이게 한다
+            adj.set_value(old_value + adj.get_upper() - old_upper)
+            self._loading_older = False
+            if adj.get_upper() <= adj.get_page_size():
+                GLib.idle_add(self.load_older_messages)
+
+        handler_id = adjustment.connect("changed", on_changed)
+        message_list.load_older()
+
     def on_clear_all(self, *args):
         if self.app.data["chats"]:
             dialog = Adw.MessageDialog(
@@ -343,8 +729,9 @@ class BavarderWindow(Adw.ApplicationWindow):
             if self.app.data["chats"]:
                 if self.content:
                     self.stack.set_visible_child(self.main)
-                    self.main_list.remove_all()
+                    self.thread_views.pop(self.chat.get("id"), None)
                     del self.chat["content"]
+                    self.app.storage.chat_updated(self.chat)
                 self.stack.set_visible_child(self.status_no_chat)
 
                 toast.set_title(_("All chats cleared!"))
@@ -438,7 +825,7 @@ class BavarderWindow(Adw.ApplicationWindow):
 
     def on_export(self, *args):
         if self.content:
-            dialog = ExportDialog(self, self.chat["content"])
+            dialog = ExportDialog(self, self.chat)
             dialog.set_transient_for(self)
             dialog.present()
         else:
@@ -446,6 +833,114 @@ class BavarderWindow(Adw.ApplicationWindow):
             toast.set_title(_("Nothing to export!"))
             self.toast_overlay.add_toast(toast)
 
+    def listed_chats(self):
+        """Chats in sidebar order, limited to the search results while searching."""
+        model = self.thread_model if self.search_query else self.thread_store
+        return [model.get_item(position).chat for position in range(model.get_n_items())]
+
+    def transfer_filters(self, formats):
+        names = {
+            transfer.JSONL: (_("JSON Lines"), "*.jsonl"),
+            transfer.MARKDOWN: (_("Markdown"), "*.md"),
+            transfer.HTML: (_("HTML"), "*.html"),
+        }
+        filters = Gio.ListStore.new(Gtk.FileFilter)
+        for fmt in formats:
+            name, pattern = names[fmt]
+            file_filter = Gtk.FileFilter()
+            file_filter.set_name(name)
+            file_filter.add_pattern(pattern)
+            filters.append(file_filter)
+        return filters
+
+    def export_threads(self):
+        """Export every listed thread (or the search results) to a file."""
+        chats = self.listed_chats()
+        if not chats:
+            toast = Adw.Toast()
+            toast.set_title(_("Nothing to export!"))
+            self.toast_overlay.add_toast(toast)
+            return
+        dialog = Gtk.FileDialog(title=_("Export Threads"), modal=True)
+        dialog.set_initial_name("hamonikr-chatbot.jsonl")
+        dialog.set_filters(self.transfer_filters(transfer.FORMATS))
+        dialog.save(self, None, self.on_export_file_chosen, chats)
+
+    def on_export_file_chosen(self, dialog, result, chats):
+        try:
+            path = dialog.save_finish(result).get_path()
+        except GLib.Error:
+            return  # 취소
+        progress = TransferDialog(self, _("Exporting Threads"))
+        progress.present()
+        # 워커는 메인 스레드가 바꾸는 채팅 대신 지금의 사본을 읽는다
+        chats = transfer.snapshot(chats)
+
+        def run():
+            try:
+                count = transfer.export_threads(
+                    chats, path, transfer.format_for_path(path, transfer.JSONL),
+                    progress=progress.progress, cancelled=progress.cancelled.is_set,
+                )
+            except transfer.Cancelled:
+                message = _("Export cancelled")
+            except Exception as e:
+                print(f"Export to {path} failed: {e}", file=sys.stderr)
+                message = _("Export failed")
+            else:
+                message = _("{} threads exported").format(count)
+            GLib.idle_add(self.on_transfer_done, progress, message)
+
+        threading.Thread(target=run, name="export", daemon=True).start()
+
+    def import_threads(self):
+        """Add the threads of a JSONL export to the store."""
+        dialog = Gtk.FileDialog(title=_("Import Threads"), modal=True)
+        dialog.set_filters(self.transfer_filters((transfer.JSONL,)))
+        dialog.open(self, None, self.on_import_file_chosen)
+
+    def on_import_file_chosen(self, dialog, result):
+        try:
+            path = dialog.open_finish(result).get_path()
+        except GLib.Error:
+            return
+        existing = {storage.chat_uid(chat) for chat in self.app.data["chats"]}
+        progress = TransferDialog(self, _("Importing Threads"))
+        progress.present()
+
+        def run():
+            # 파싱은 워커에서, 저장소와 사이드바에는 묶음 단위로 메인 스레드에서 넣는다
+            count = 0
+            try:
+                for batch in transfer.import_batches(path, existing):
+                    if progress.cancelled.is_set():
+                        break
+                    GLib.idle_add(self.insert_imported, batch)
+                    count += len(batch)
+                    progress.progress(count, 0)
+            except Exception as e:
+                print(f"Import from {path} failed: {e}", file=sys.stderr)
+                message = _("Import failed after {} threads").format(count)
+            else:
+                message = _("{} threads imported").format(count)
+            GLib.idle_add(self.on_transfer_done, progress, message)
+
+        threading.Thread(target=run, name="import", daemon=True).start()
+
+    def insert_imported(self, batch):
+        transfer.number_chats(batch, self.app.data["chats"])
+        self.app.data["chats"].extend(batch)
+        self.app.storage.chats_added(batch)
+        self.add_threads(batch)
+        return False
+
+    def on_transfer_done(self, progress, message):
+        progress.finish()
+        toast = Adw.Toast()
+        toast.set_title(message)
+        self.toast_overlay.add_toast(toast)
+        return False
+
     # PROVIDER - ONLINE
     def load_provider_selector(self):
         provider_menu = Gio.Menu()
@@ -495,6 +990,10 @@ class BavarderWindow(Adw.ApplicationWindow):
         item_export.set_action_and_target_value("win.export", None)
         section_tools.append_item(item_export)
 
+        item_compare = Gio.MenuItem.new(_("Compare models"), None)
+        item_compare.set_action_and_target_value("app.compare", None)
+        section_tools.append_item(item_compare)
+
         provider_menu.append_section(None, section_tools)
 
         self.provider_selector_button.set_menu_model(provider_menu)
@@ -529,25 +1028,63 @@ class BavarderWindow(Adw.ApplicationWindow):
         self.message_entry.get_buffer().set_text("")
 
         if not self.chat:
+            # 새 채팅을 만들고 선택까지 한다
             self.on_new_chat_action()
 
-            # now get the latest row
-            row = self.threads_list.get_row_at_index(len(self.app.data["chats"]) - 1)
-
-            self.threads_list.select_row(row)
-            self.threads_row_activated_cb()
-
         self.add_user_item(prompt)
+        chat = self.chat
 
         # 스트리밍 표시를 위한 빈 어시스턴트 항목을 먼저 추가하고, 해당 위젯 라벨을 콜백에서 갱신한다
         # 1) 데이터 모델에 비어있는 어시스턴트 메시지 추가
         stream_item_dict = {
             "role": self.app.bot_name,
+            "type": MESSAGE_TEXT,
             "content": "",
             "time": self.get_time(),
             "model": "",
+            "status": STATUS_STREAMING,
         }
         self.content.append(stream_item_dict)
+        self.app.storage.message_added(chat, stream_item_dict)
+
+        self.stream_response(chat, prompt, stream_item_dict)
+        return False
+
+    def continue_generation(self, chat, message):
+        """Resume an interrupted answer, streaming onto its saved partial text."""
+        if self.streaming is not None:
+            toast = Adw.Toast()
+            toast.set_title(_("Wait for the current response to finish"))
+            self.toast_overlay.add_toast(toast)
+            return
+
+        content = chat.get("content", [])
+        index = next((i for i in range(len(content) - 1, -1, -1) if content[i] is message), None)
+        if index is None:
+            return
+
+        # 공급자에는 중단된 답변까지의 대화와 이어 쓰기 요청을, 평소 요청과 같은 모양으로 보낸다
+        prompt = _("Continue your previous answer exactly where it stopped, without repeating what you already wrote.")
+        request_chat = {
+            "content": content[:index + 1] + [
+                {"role": self.app.user_name, "content": prompt},
+                {"role": self.app.bot_name, "content": ""},
+            ]
+        }
+
+        message["status"] = STATUS_STREAMING
+        self.app.storage.message_updated(chat, message)
+        self.stream_response(chat, prompt, message, request_chat)
+
+    def stream_response(self, chat, prompt, stream_item_dict, request_chat=None):
+        """Stream the provider's answer into stream_item_dict, the last message of chat.
+
+        Text already in the message is kept and the answer is appended to
+        it. The partial answer is checkpointed through the storage hooks
+        every STREAM_CHECKPOINT_INTERVAL seconds, so a crash leaves it on
+        disk with status "streaming" (restored as interrupted).
+        """
+        self.streaming = (chat, stream_item_dict)
 
         # 2) UI 전체를 데이터 기반으로 재빌드하여 항목 추가(중복 방지)
         self.threads_row_activated_cb()
@@ -585,7 +1122,11 @@ class BavarderWindow(Adw.ApplicationWindow):
             return None
 
         tail_label = find_tail_label()
-        accumulated = {"text": ""}
+        prefix = stream_item_dict.get("content", "")
+        if not isinstance(prefix, str):
+            prefix = ""
+        accumulated = {"text": prefix}
+        last_checkpoint = {"time": time.monotonic()}
 
         def on_chunk(chunk_text: str):
             # 워커 스레드 → UI 스레드로 안전하게 전달
@@ -593,6 +1134,11 @@ class BavarderWindow(Adw.ApplicationWindow):
                 # 누적 텍스트 갱신
                 accumulated["text"] += chunk_text or ""
                 stream_item_dict["content"] = accumulated["text"]
+                # 생성 중인 답변을 주기적으로 저장 (쓰기 방식은 storage가 고른다)
+                now = time.monotonic()
+                if now - last_checkpoint["time"] >= STREAM_CHECKPOINT_INTERVAL:
+                    last_checkpoint["time"] = now
+                    self.app.storage.message_updated(chat, stream_item_dict)
                 # 가능한 한 가볍게 UI 업데이트: 한 개 라벨에 텍스트만 누적
                 nonlocal tail_label
                 if tail_label is None:
@@ -618,7 +1164,7 @@ class BavarderWindow(Adw.ApplicationWindow):
             self.toast_overlay.add_toast(self.toast)
 
             # 스트리밍 요청 시도. 공급자가 스트리밍을 지원하지 않으면 콜백이 한 번만 불린다
-            response = self.app.ask(prompt, self.chat, stream=True, callback=on_chunk)
+            response = self.app.ask(prompt, request_chat or chat, stream=True, callback=on_chunk)
 
             GLib.idle_add(cleanup, response, self.toast)
 
@@ -631,30 +1177,33 @@ class BavarderWindow(Adw.ApplicationWindow):
                 pass
 
         def cleanup(response, toast):
+            # 최종 렌더링 전에 생성 중 표시를 지운다
+            stream_item_dict.pop("status", None)
+            self.streaming = None
             try:
                 self.t.join()
                 self.toast.dismiss()
 
                 # response가 문자열이면(논-스트리밍 또는 폴백) 누적에 반영
                 if isinstance(response, str) and response:
-                    accumulated["text"] = response
-                    stream_item_dict["content"] = response
+                    accumulated["text"] = prefix + response
+                    stream_item_dict["content"] = accumulated["text"]
                     # 최종 마크다운 렌더로 교체
                     _final_rerender_for_markdown(response)
                 elif response is not None and not isinstance(response, str):
-                    # 이미지 등 바이너리 응답 처리(기존 동작 유지)
+                    # 이미지 응답은 원본 바이트를 blob 저장소에 두고 메시지에는 해시만 기록
                     try:
-                        buffered = io.BytesIO()
-                        response.save(buffered, format="JPEG")
-                        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-                        stream_item_dict["content"] = img_str
-                        _final_rerender_for_markdown(img_str)
+                        stream_item_dict["blob"] = blob_store.put_image(response)
+                        stream_item_dict["type"] = MESSAGE_IMAGE
+                        stream_item_dict["content"] = blob_store.IMAGE_PLACEHOLDER
+                        _final_rerender_for_markdown(stream_item_dict["content"])
                     except Exception:
                         # 실패 시 텍스트로 폴백
                         if accumulated["text"]:
                             _final_rerender_for_markdown(accumulated["text"])
                         else:
                             stream_item_dict["content"] = _("Sorry, I don't know what to say.")
+                            stream_item_dict["type"] = MESSAGE_ERROR
                             _final_rerender_for_markdown(stream_item_dict["content"])
                 else:
                     # 스트리밍의 경우 콜백으로 이미 누적됨 → 마지막에 정식 렌더로 교체
@@ -663,30 +1212,38 @@ class BavarderWindow(Adw.ApplicationWindow):
                     else:
                         # 아무 내용이 없다면 사과 메시지로 대체
                         stream_item_dict["content"] = _("Sorry, I don't know what to say.")
+                        stream_item_dict["type"] = MESSAGE_ERROR
                         _final_rerender_for_markdown(stream_item_dict["content"])
 
                 # 모델/타이틀 갱신 시도
                 try:
                     if accumulated["text"]:
-                        self._maybe_update_chat_title_from_assistant(accumulated["text"])
+                        self._maybe_update_chat_title_from_assistant(accumulated["text"], chat)
                 except Exception:
                     pass
 
             except AttributeError:
                 self.toast.dismiss()
-                # 취소 등으로 실패 시에도 메시지를 정리
-                stream_item_dict["content"] = _("Sorry, I don't know what to say.")
+                # 취소 등으로 실패 시에도 메시지를 정리 (받은 내용이 있으면 이어서 생성할 수 있게 남김)
+                if accumulated["text"]:
+                    stream_item_dict["status"] = STATUS_INTERRUPTED
+                else:
+                    stream_item_dict["content"] = _("Sorry, I don't know what to say.")
+                    stream_item_dict["type"] = MESSAGE_ERROR
                 _final_rerender_for_markdown(stream_item_dict["content"])
+            finally:
+                # 완성된 답변을 저장 예약하고 검색 색인에 반영
+                self.app.storage.message_updated(chat, stream_item_dict)
 
         self.t = KillableThread(target=thread_run)
         self.t.start()
-        return False
 
     # @Gtk.Template.Callback()
     # def on_emoji(self, *args):
     #     self.message_entry.do_insert_emoji(self.message_entry)
 
     def cancel(self, *args):
+        streaming, self.streaming = self.streaming, None
         try:
             self.t.kill()
             self.t.join()
@@ -700,6 +1257,14 @@ class BavarderWindow(Adw.ApplicationWindow):
             del self.t
             self.toast.dismiss()
 
+        if streaming is not None:
+            # 중단된 답변은 지금까지의 내용과 함께 "이어서 생성"할 수 있게 남긴다
+            chat, message = streaming
+            message["status"] = STATUS_INTERRUPTED
+            self.app.storage.message_updated(chat, message)
+            if chat is self.chat:
+                self.threads_row_activated_cb()
+
     def create_action(self, name, callback, shortcuts=None):
         action = Gio.SimpleAction.new(name, None)
         action.connect("activate", callback)
@@ -713,14 +1278,15 @@ class BavarderWindow(Adw.ApplicationWindow):
 
 
     def add_user_item(self, content):
-        self.content.append(
-            {
-                "role": self.app.user_name,
-                "content": content,
-                "time": self.get_time(),
-                "model": "",
-            }
-        )
+        message = {
+            "role": self.app.user_name,
+            "type": MESSAGE_TEXT,
+            "content": content,
+            "time": self.get_time(),
+            "model": "",
+        }
+        self.content.append(message)
+        self.app.storage.message_added(self.chat, message)
 
         self.threads_row_activated_cb()
 
@@ -737,6 +1303,7 @@ class BavarderWindow(Adw.ApplicationWindow):
 
         c = {
                 "role": self.app.bot_name,
+                "type": MESSAGE_TEXT,
                 "content": content,
                 "time": self.get_time(),
             }
@@ -757,6 +1324,7 @@ class BavarderWindow(Adw.ApplicationWindow):
         c["model"] = display_model
 
         self.content.append(c)
+        self.app.storage.message_added(self.chat, c)
 
         self.threads_row_activated_cb()
 
@@ -801,14 +1369,17 @@ class BavarderWindow(Adw.ApplicationWindow):
             line = line[:max_len].rstrip() + "…"
         return line
 
-    def _maybe_update_chat_title_from_assistant(self, assistant_text: str):
+    def _maybe_update_chat_title_from_assistant(self, assistant_text: str, chat=None):
         """Update the chat title from the first assistant reply if still default.
 
-        Falls back to the first user prompt if assistant text is unsuitable
-        (e.g., image/base64 or empty).
+        chat defaults to the open chat; streamed answers pass the chat they
+        belong to, which may no longer be open. Falls back to the first user
+        prompt if assistant text is unsuitable (e.g., image/base64 or empty).
         """
         try:
-            current_title = self.chat.get("title", "")
+            if chat is None:
+                chat = self.chat
+            current_title = chat.get("title", "")
             # Only auto-rename if it still looks like a fresh default title
             if not current_title.startswith("New Chat"):
                 return
@@ -824,7 +1395,7 @@ class BavarderWindow(Adw.ApplicationWindow):
             if not new_title or new_title.lower().startswith("sorry"):
                 # Fallback to user's first message if assistant text is not helpful
                 try:
-                    user_first = self.content[0]["content"]
+                    user_first = chat["content"][0]["content"]
                     new_title = self._sanitize_title_text(user_first)
                 except Exception:
                     pass
@@ -833,28 +1404,23 @@ class BavarderWindow(Adw.ApplicationWindow):
                 return
 
             # Persist into data model
-            self.chat["title"] = new_title
+            chat["title"] = new_title
 
             # Update header title if this chat is open
-            try:
-                self.title.set_title(new_title)
-            except Exception:
-                pass
-
-            # Update corresponding ThreadItem label in the sidebar
-            try:
-                current_id = self.chat.get("id")
-                for thread_item in self.threads:
-                    if getattr(thread_item, "id", None) == current_id:
-                        thread_item.label_text = new_title
-                        thread_item.label.set_text(new_title)
-                        break
-            except Exception:
-                pass
+            if chat is self.chat:
+                try:
+                    self.title.set_title(new_title)
+                except Exception:
+                    pass
 
-            # Save to disk so the new title persists
+            # Update the sidebar; bound ThreadItem rows follow the title property,
+            # and its notify handler schedules the save
             try:
-                self.app.save()
+                thread = self.thread_objects.get(chat.get("id"))
+                if thread is not None:
+                    thread.props.title = new_title
+                else:
+                    self.app.storage.chat_updated(chat)
             except Exception:
                 pass
         except Exception:
@@ -1,10 +1,15 @@
-from gi.repository import Gtk, GtkSource, Adw, Xdp
+from gi.repository import Gtk, GtkSource, Xdp, GLib
 
 from ..constants import app_id, rootdir
+from ..command_runner import CommandRunner, build_argv
+from . import source_style
 
-import subprocess
-from subprocess import SubprocessError, CompletedProcess
-import os
+import shlex
+
+try:
+    from builtins import _  # provided by gettext.install in launcher
+except Exception:
+    from gettext import gettext as _  # fallback when running out of tree
 
 GtkSource.init()
 
@@ -19,79 +24,157 @@ class CodeBlock(Gtk.Widget):
     view = Gtk.Template.Child()
     box = Gtk.Template.Child()
     output = Gtk.Template.Child()
+    run_button = Gtk.Template.Child()
+    status_label = Gtk.Template.Child()
 
     def __init__(self, result, **kwargs):
         super().__init__(**kwargs)
 
         self.command = result
+        self.runner = None
 
         self.buffer.set_text(self.command)
 
-        self._apply_sourceview_scheme()
-
-        # 테마 변경 시 즉시 반영
-        try:
-            Adw.StyleManager.get_default().connect("notify::dark", self._on_style_changed)
-        except Exception:
-            pass
-        
+        # 테마 변경은 공용 서비스가 한 번에 전달 (블록마다 핸들러를 연결하지 않음)
+        source_style.get_default().subscribe(self)
 
     @Gtk.Template.Callback()
     def run(self, widget, *args):
-        command = self.buffer.props.text.split(" ")
-        if self.command.startswith("$"):
-            command.pop(0)
+        if self.runner is not None and self.runner.running:
+            self.runner.cancel()
+            return
+
+        try:
+            command = shlex.split(self.buffer.props.text)
+        except ValueError:
+            command = self.buffer.props.text.split()
+        if command and command[0].startswith("$"):
+            command[0] = command[0][1:]
+            if not command[0]:
+                command.pop(0)
+        if not command:
+            return
 
         portal = Xdp.Portal()
         is_sandboxed = portal.running_under_sandbox()
-        output = self._run(command, allow_escaping=is_sandboxed)
-        self.output_buffer.set_text(output)
+
+        self.output_buffer.set_text("")
         self.output.set_visible(True)
+        self.status_label.set_text(_("Running…"))
+        self.status_label.set_visible(True)
+        self.run_button.set_icon_name("process-stop-symbolic")
+        self.run_button.set_tooltip_text(_("Stop"))
+
+        self.runner = CommandRunner(
+            build_argv(command, allow_escaping=is_sandboxed),
+            self._on_output,
+            self._on_finished,
+        )
+        self.runner.start()
+
+    def _on_output(self, text):
+        self.output_buffer.insert(self.output_buffer.get_end_iter(), text)
+
+    def _on_finished(self, runner):
+        self.run_button.set_icon_name("terminal-symbolic")
+        self.run_button.set_tooltip_text(_("Run"))
+
+        if runner.error:
+            status = runner.error
+        elif runner.timed_out:
+            status = _("Timed out after {}s").format(runner.timeout)
+        elif runner.cancelled:
+            status = _("Stopped")
+        elif runner.exit_status not in (None, 0):
+            status = _("Exited with code {}").format(runner.exit_status)
+        else:
+            status = _("Done")
+            if self.output_buffer.get_char_count() == 0:
+                self.output_buffer.set_text(_("Done"))
+
+        parts = [status, _("{:.2f}s").format(runner.duration)]
+        if runner.truncated:
+            parts.append(_("output truncated"))
+        self.status_label.set_text(" · ".join(parts))
+
+    def apply_style_scheme(self, scheme):
+        self.buffer.set_style_scheme(scheme)
+        self.output_buffer.set_style_scheme(scheme)
+
+
+class LazyCodeBlock(Gtk.Box):
+    """Cheap monospace placeholder that becomes a CodeBlock once scrolled into view.
+
+    Long, code-heavy threads only pay for the GtkSource views that are
+    actually shown.
+    """
 
-    def _run(self, command: list, timeout: int = None, allow_escaping: bool = False) -> CompletedProcess:
-        if allow_escaping and os.environ.get('FLATPAK_ID'):
-            command = ['flatpak-spawn', '--host'] + command
+    def __init__(self, result, **kwargs):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, **kwargs)
 
-        try:
-            process = subprocess.run(command, capture_output=True, text=True)
-            if process.returncode != 0:
-                output = process.stderr
-            else:
-                if process.stdout == "":
-                    output = _("Done")
-                else:
-                    output = process.stdout
-        except SubprocessError as e:
-            output = e.stdout
-        except FileNotFoundError:
-            raise
-
-        o = ""
-
-        for line in output.split("\n"):
-            if line == "":
-                continue
-            elif line.strip().startswith("** (flatpak-spawn:"):
-                continue
-            elif line.strip().startswith("(flatpak-spawn:"):
-                continue
-            else:
-                if line.strip() == "":
-                    o += _("Done") + "\n"
-                else:
-                    o += line + "\n"
-
-        return o
-
-    def _apply_sourceview_scheme(self):
-        try:
-            is_dark = Adw.StyleManager().get_dark()
-        except Exception:
-            is_dark = False
-        scheme_id = "Adwaita-dark" if is_dark else "Adwaita"
-        mgr = GtkSource.StyleSchemeManager()
-        self.buffer.set_style_scheme(mgr.get_scheme(scheme_id))
-        self.output_buffer.set_style_scheme(mgr.get_scheme(scheme_id))
-
-    def _on_style_changed(self, *args):
-        self._apply_sourceview_scheme()
\ No newline at end of file
+        self.command = result
+        self.code_block = None
+        self._scrolled = None
+        self._adjustment = None
+        self._handler_id = 0
+
+        self.set_vexpand(True)
+        self.set_hexpand(True)
+
+        self.placeholder = Gtk.Label(label=result)
+        self.placeholder.set_xalign(0)
+        self.placeholder.set_wrap(True)
+        self.placeholder.set_selectable(False)
+        self.placeholder.set_margin_top(5)
+        self.placeholder.set_margin_bottom(5)
+        self.placeholder.add_css_class("monospace")
+        self.placeholder.add_css_class("codeview")
+        self.placeholder.add_css_class("card")
+        self.append(self.placeholder)
+
+        self.connect("realize", self._on_realize)
+        self.connect("unrealize", self._on_unrealize)
+
+    def _on_realize(self, *args):
+        scrolled = self.get_ancestor(Gtk.ScrolledWindow)
+        if scrolled is None:
+            self.materialize()
+            return
+        self._scrolled = scrolled
+        self._adjustment = scrolled.get_vadjustment()
+        self._handler_id = self._adjustment.connect("value-changed", self._check_visible)
+        # 처음 화면에 보이는 블록은 레이아웃이 끝난 직후 바로 생성
+        GLib.idle_add(self._check_visible)
+
+    def _on_unrealize(self, *args):
+        self._disconnect()
+
+    def _disconnect(self):
+        if self._adjustment is not None and self._handler_id:
+            self._adjustment.disconnect(self._handler_id)
+        self._adjustment = None
+        self._handler_id = 0
+        self._scrolled = None
+
+    def _check_visible(self, *args):
+        if self.code_block is not None or self._adjustment is None:
+            return False
+        ok, bounds = self.compute_bounds(self._scrolled)
+        if not ok:
+            return False
+        top = bounds.get_y()
+        bottom = top + bounds.get_height()
+        # 화면 한 페이지만큼 앞서 미리 생성해 스크롤 중 깜빡임을 줄인다
+        margin = self._adjustment.get_page_size()
+        if bottom >= -margin and top <= self._scrolled.get_height() + margin:
+            self.materialize()
+        return False
+
+    def materialize(self):
+        if self.code_block is not None:
+            return
+        self._disconnect()
+        self.code_block = CodeBlock(self.command)
+        self.remove(self.placeholder)
+        self.placeholder = None
+        self.append(self.code_block)
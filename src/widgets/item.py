@@ -1,13 +1,10 @@
 from gi.repository import Gtk, Adw, Gio, GLib, Pango, GtkSource, Gdk
 
-import re
-import io
-import base64
-
-from PIL import Image, UnidentifiedImageError
-
 from ..constants import app_id, rootdir
-from .code_block import CodeBlock
+from .. import blob_store, image_cache
+from ..storage import MESSAGE_TEXT, MESSAGE_IMAGE, MESSAGE_ERROR, STATUS_STREAMING, STATUS_INTERRUPTED
+from .code_block import LazyCodeBlock
+from .render_plan import RenderPlanner, MARKUP, CODE_BLOCK, IMAGE
 
 try:
     from builtins import _  # provided by gettext.install in launcher
@@ -15,49 +12,10 @@ except ImportError:
     from gettext import gettext as _  # fallback when running out of tree
 
 
-H1="H1"
-H2="H2"
-H3="H3"
-UL="BULLET"
-OL="LIST"
-CODE="CODE"
-BOLD="BOLD"
-EMPH="EMPH"
-PRE="PRE"
-LINK="LINK"
-m2p_sections = [
-    { "name": H1, "re": re.compile(r"^(#\s+)(.*)(\s*)$"), "sub": r"<big><big><big>\2</big></big></big>" },
-    { "name": H2, "re": re.compile(r"^(##\s+)(.*)(\s*)$"), "sub": r"<big><big>\2</big></big>" },
-    { "name": H3, "re": re.compile(r"^(###\s+)(.*)(\s*)$"), "sub": r"<big>\2</big>" },
-    { "name": UL, "re": re.compile(r"^(\s*[\*\-]\s)(.*)(\s*)$"), "sub": r" • \2" },
-    { "name": OL, "re": re.compile(r"^(\s*[0-9]+\.\s)(.*)(\s*)$"), "sub": r" \1\2" },
-    { "name": CODE, "re": re.compile(r"^```[a-z_]*$"), "sub": "<tt>" },
-]
-
-m2p_styles = [
-    { "name": BOLD, "re": re.compile(r"(^|[^\*])(\*\*)(.*)(\*\*)"), "sub": r"\1<b>\3</b>" },
-    { "name": BOLD, "re": re.compile(r"(\*\*)(.*)(\*\*)([^\*]|$)"), "sub": r"<b>\3</b>\4" },
-    { "name": EMPH, "re": re.compile(r"(^|[^\*])(\*)(.*)(\*)"), "sub": r"\1<i>\3</i>" },
-    { "name": EMPH, "re": re.compile(r"(\*)(.*)(\*)([^\*]|$)"), "sub": r"<i>\3</i>\4" }, 
-    { "name": PRE, "re": re.compile(r"(`)([^`]*)(`)"), "sub": r"<tt>\2</tt>" },
-    # 링크는 아래 안전 처리에서 수행 (href 특수문자 이스케이프)
-]
-
-re_comment = re.compile(r"^\s*<!--.*-->\s*$")
-re_color = re.compile(r"^(\s*<!--\s*(fg|bg)=(#?[0-9a-z_A-Z-]*)\s*((fg|bg)=(#?[0-9a-z_A-Z-]*))?\s*-->\s*)$")
-re_reset = re.compile(r"(<!--\/-->)")
-re_uri = re.compile(r"http[s]?:\/\/[^\s']*")
-re_href = re.compile(r"href='(http[s]?:\\/\\/[^\\s]*)'")
-re_atag = re.compile(r"<a\s.*>.*(http[s]?:\\/\\/[^\\s]*).*</a>")
-re_h1line = re.compile(r"^===+\s*$")
-re_h2line = re.compile(r"^---+\s*$")
-
-m2p_escapes = [
-    [re.compile(r"<!--.*-->"), ''],
-    [re.compile(r"&"), '&amp;'],
-    [re.compile(r"<"), '&lt;'],
-    [re.compile(r">"), '&gt;'],
-]
+# 이 길이 이하의 메시지는 바로 계획을 세우고, 더 긴 메시지는 워커에서 계산
+SYNC_PLAN_SIZE = 2048
+
+planner = RenderPlanner(GLib.idle_add)
 
 
 @Gtk.Template(resource_path=f"{rootdir}/ui/item.ui")
@@ -87,80 +45,25 @@ class Item(Gtk.Box):
         self.app = self.parent.get_application()
         self.win = self.app.get_active_window()
 
-        try:
-            if not isinstance(self.content_text, Image.Image):
-                if isinstance(self.content_text, bytes):
-                    self.image = Image.open(io.BytesIO(self.content_text))
-                else:
-                    self.image = Image.open(io.BytesIO(base64.b64decode(self.content_text)))
-            else:
-                self.image = self.content_text
-        except Exception:
-            self.convert_content_to_pango()
-
-            result = ""
-            is_code = False
-            for line in self.content_markup:
-                if isinstance(line, str):
-                    if  "<tt></tt>`" in line.strip():
-                        if is_code:
-                            is_code = False
-                        else:
-                            is_code = True
-                        continue
-                if is_code or not isinstance(line, str):
-                    label = Gtk.Label()
-                    label.set_use_markup(True)
-                    label.set_wrap(True)
-                    label.set_xalign(0)
-                    label.set_wrap_mode(Pango.WrapMode.WORD)
-                    label.set_markup(result)
-                    label.set_justify(Gtk.Justification.LEFT)
-                    label.set_valign(Gtk.Align.START)
-                    label.set_hexpand(True)
-                    label.set_halign(Gtk.Align.START)
-                    label.set_selectable(True)  # 텍스트 선택 가능하게 설정
-                    label.add_css_class("message-content")  # 폰트 설정을 위한 CSS 클래스 추가
-                    self.content.append(label)
-
-                    if not isinstance(line, str):
-                        result = "\n".join(line)
-                    else:
-                        result = line.strip()
-
-                    self.content.append(CodeBlock(result))
-                    result = ""
-                else: 
-                    result += f"{line}\n"
-                
-            else:
-                if not result.strip() == "<tt></tt>`":
-                    label = Gtk.Label()
-                    label.set_use_markup(True)
-                    label.set_wrap(True)
-                    label.set_xalign(0)
-                    label.set_wrap_mode(Pango.WrapMode.WORD)
-                    label.set_markup(result)
-                    label.set_justify(Gtk.Justification.LEFT)
-                    label.set_valign(Gtk.Align.START)
-                    label.set_hexpand(True)
-                    label.set_halign(Gtk.Align.START)
-                    label.set_selectable(True)  # 텍스트 선택 가능하게 설정
-                    label.add_css_class("message-content")  # 폰트 설정을 위한 CSS 클래스 추가
-                    self.content.append(label)
+        # 메시지 종류는 저장 시(또는 migrate 시) 정해진 type으로 바로 분기한다
+        self.message_type = self.item.get("type", MESSAGE_TEXT)
+        self.blob = self.item.get("blob") if self.message_type == MESSAGE_IMAGE else None
+
+        if self.message_type == MESSAGE_ERROR:
+            self.content.add_css_class("error")
+
+        self.plan_spinner = None
+        self.interrupted_bar = None
+        status = self.item.get("status")
+        if status == STATUS_STREAMING:
+            # 생성 중인 답변은 라벨 하나에 평문으로 이어 붙이고, 끝나면 다시 렌더링된다
+            self.append_markup(GLib.markup_escape_text(str(self.content_text)))
         else:
-            picture = Gtk.Picture()
-            picture.set_halign(Gtk.Align.CENTER)
-            picture.set_can_shrink(True)
-            picture.set_content_fit(Gtk.ContentFit.FILL)
-            picture.set_visible(True)
-            picture.add_css_class("card")
-            picture.set_margin_start(12)
-            picture.set_margin_end(12)
-            picture.set_size_request(270, 270)
-            self.image.save("/tmp/image.png")
-            picture.set_file(Gio.File.new_for_path("/tmp/image.png"))
-            self.content.append(picture)
+            self.render_content()
+
+        if status == STATUS_INTERRUPTED and self.chat.get("content") and self.chat["content"][-1] is self.item:
+            self.interrupted_bar = self.make_interrupted_bar()
+            self.content.append(self.interrupted_bar)
 
         t = self.item["role"].lower()
 
@@ -188,6 +91,110 @@ class Item(Gtk.Box):
 
         self.setup()
 
+    def render_content(self):
+        plan = planner.get(self.item)
+        if plan is None and len(str(self.content_text)) <= SYNC_PLAN_SIZE:
+            plan = planner.plan_now(self.item)
+        if plan is not None:
+            self.apply_plan(plan)
+        else:
+            # 긴 메시지는 렌더 계획을 워커에서 만들고 그동안 스피너를 보여준다
+            self.plan_spinner = Gtk.Spinner()
+            self.plan_spinner.set_halign(Gtk.Align.START)
+            self.plan_spinner.start()
+            self.content.append(self.plan_spinner)
+            planner.request(self.item, self.apply_plan)
+
+    def apply_plan(self, plan):
+        """Create the content widgets for a render plan (main thread only)."""
+        if self.plan_spinner is not None:
+            self.content.remove(self.plan_spinner)
+            self.plan_spinner = None
+        for kind, value in plan:
+            if kind == MARKUP:
+                self.append_markup(value)
+            elif kind == CODE_BLOCK:
+                self.content.append(LazyCodeBlock(value))
+            elif kind == IMAGE:
+                self.content.append(self.make_picture())
+        if self.interrupted_bar is not None:
+            # 계획이 늦게 도착해도 중단 안내는 맨 아래에 둔다
+            self.content.reorder_child_after(self.interrupted_bar, self.content.get_last_child())
+        return False
+
+    def append_markup(self, markup):
+        label = Gtk.Label()
+        label.set_use_markup(True)
+        label.set_wrap(True)
+        label.set_xalign(0)
+        label.set_wrap_mode(Pango.WrapMode.WORD)
+        label.set_markup(markup)
+        label.set_justify(Gtk.Justification.LEFT)
+        label.set_valign(Gtk.Align.START)
+        label.set_hexpand(True)
+        label.set_halign(Gtk.Align.START)
+        label.set_selectable(True)  # 텍스트 선택 가능하게 설정
+        label.add_css_class("message-content")  # 폰트 설정을 위한 CSS 클래스 추가
+        self.content.append(label)
+
+    def make_interrupted_bar(self):
+        """Notice under an answer that stopped early, with a way to resume it."""
+        label = Gtk.Label(label=_("Response interrupted"))
+        label.set_xalign(0)
+        label.set_hexpand(True)
+        label.add_css_class("dim-label")
+
+        button = Gtk.Button(label=_("Continue generation"))
+        button.add_css_class("pill")
+        button.connect("clicked", self.on_continue_clicked)
+
+        box = Gtk.Box(spacing=12)
+        box.set_margin_top(6)
+        box.append(label)
+        box.append(button)
+        return box
+
+    def on_continue_clicked(self, *args):
+        # 활성 창이 비교 창일 수 있으므로 이 메시지를 가진 창에서 이어서 생성한다
+        self.parent.continue_generation(self.chat, self.item)
+
+    def make_picture(self):
+        """Image card that shows a spinner until the texture is decoded off-thread."""
+        picture = Gtk.Picture()
+        picture.set_halign(Gtk.Align.CENTER)
+        picture.set_can_shrink(True)
+        picture.set_content_fit(Gtk.ContentFit.CONTAIN)
+        picture.add_css_class("card")
+        picture.set_size_request(270, 270)
+
+        spinner = Gtk.Spinner()
+        spinner.set_halign(Gtk.Align.CENTER)
+        spinner.set_valign(Gtk.Align.CENTER)
+
+        overlay = Gtk.Overlay()
+        overlay.set_halign(Gtk.Align.CENTER)
+        overlay.set_margin_start(12)
+        overlay.set_margin_end(12)
+        overlay.set_child(picture)
+        overlay.add_overlay(spinner)
+
+        def on_texture(texture):
+            spinner.stop()
+            spinner.set_visible(False)
+            if texture is not None:
+                picture.set_paintable(texture)
+            else:
+                picture.set_alternative_text(_("Image not available"))
+
+        cache = image_cache.get_default()
+        texture = cache.lookup(self.blob)
+        if texture is not None:
+            on_texture(texture)
+        else:
+            spinner.start()
+            cache.load(self.blob, on_texture)
+        return overlay
+
     def setup(self):
         self.setup_signals()
 
@@ -218,6 +225,7 @@ class Item(Gtk.Box):
 
     def on_delete(self, *args, **kwargs):
         self.chat["content"].remove(self.item)
+        self.app.storage.message_removed(self.chat, self.item)
         self.win.threads_row_activated_cb()
 
     def on_edit(self, *args):
@@ -228,7 +236,9 @@ class Item(Gtk.Box):
             if response == Gtk.ResponseType.OK:
                 toast = Adw.Toast()
                 try:
-                    self.image.save(dialog.get_file().get_path())
+                    # 원본 바이트를 그대로 저장 (재인코딩 없음)
+                    with open(dialog.get_file().get_path(), "wb") as f:
+                        f.write(blob_store.get(self.blob))
                 except Exception as e:
                     toast.set_title(_("Failed to save the image"))
                 else:
@@ -238,9 +248,7 @@ class Item(Gtk.Box):
 
             dialog.destroy()
 
-        try:
-            self.image
-        except AttributeError:
+        if not self.blob:
             toast = Adw.Toast()
             toast.set_title(_("No image to save"))
             self.parent.toast_overlay.add_toast(toast)
@@ -285,171 +293,3 @@ class Item(Gtk.Box):
             return False  # GLib.timeout_add에서 False 반환하면 타이머 종료
         
         GLib.timeout_add(1500, restore_icon)
-
-
-
-    def convert_content_to_pango(self):
-        lines = self.content_text.split("\n")
-
-        is_code = False
-        code_lines = []
-
-        output = []
-        self.color_span_open = False
-        tt_must_close = False
-
-        def try_close_span():
-            if self.color_span_open:
-                output.append('</span>')
-                self.color_span_open = False
-            
-        def try_open_span():
-            if not self.color_span_open:
-                output.append('</span>')
-                self.color_span_open = False
-
-        def escape_line(line):
-            for escape in m2p_escapes:
-                line = re.sub(escape[0], escape[1], line)
-            return line
-
-        def escape_attr(s: str) -> str:
-            return (
-                s.replace("&", "&amp;")
-                 .replace("<", "&lt;")
-                 .replace(">", "&gt;")
-                 .replace("'", "&apos;")
-                 .replace('"', "&quot;")
-            )
-
-        re_md_link = re.compile(r"\[(?P<text>[^\]]+)\]\((?P<url>[^\s)]+)\)")
-
-        # def pad(lines, start=1, end=1):
-        #     length = 0
-        #     for line in lines:
-        #         if len(line) > 0:
-        #             length += len(line)
-        #         else:
-        #             length += 0
-        #     for line in lines:
-        #         line.rjust()
-        #     return lines.map((l) => l.padEnd(len + end, ' ').padStart(len + end + start, ' '))
-
-
-        for line in lines:
-            if not is_code:
-                colors = re_color.match(line)
-                if colors or re_reset.match(line):
-                    try_close_span()
-                
-
-                if colors:
-                    try_close_span()
-                    if self.color_span_open:
-                        try_close_span()
-
-                    if colors[2] == 'fg':
-                        fg = colors[3]
-                    elif colors[5] == 'fg':
-                        fg = colors[6]
-                    else:
-                        fg = ""
-                    
-                    if colors[2] == 'bg':
-                        fg = colors[3]
-                    elif colors[5] == 'bg':
-                        fg = colors[6]
-                    else:
-                        fg = ""
-                    
-                    attrs = ''
-
-                    if fg != '':
-                        attrs += f" foreground='{fg}'"
-                    
-
-                    if bg != '':
-                        attrs += f" background='{bg}'"
-
-                    if attrs != '':
-                        output.append("<span {attrs}>")
-                        self.color_span_open = True
-            
-            if re_comment.match(line):
-                continue
-
-            code_start = False
-
-            if is_code:
-                result = line
-            else:
-                result = escape_line(line)
-
-            for exp in m2p_sections:
-                name = exp["name"]
-                regexp = exp["re"]
-                sub = exp["sub"]
-                if regexp.match(line):
-                    if name == CODE:
-                        if not is_code:
-                            code_start = True
-                            is_code = True
-
-                            result = ""
-
-                            #if self.color_span_open:
-                            #    result = '<tt>'
-                            #    tt_must_close = False
-                            #else:
-                            #    result = "<span foreground='#bbb' background='#222'>" + '<tt>'
-                            #    tt_must_close = True
-                        else:
-                            is_code = False
-                            #output.append(...pad(code_lines).map(escape_line))
-                            output.append(code_lines)
-                            code_lines = []
-                            #result = '</tt>'
-                            if tt_must_close:
-                                result += '</span>'
-                                tt_must_close = False
-                    else:
-                        if is_code:
-                            result = line
-                        else:
-                            # 섹션 치환은 이스케이프된 문자열(result)에 적용해야 &/< />가 보존됩니다.
-                            result = re.sub(regexp, sub, result)
-
-            if is_code and not code_start:
-                code_lines.append(result)
-                continue
-            
-
-            if re_h1line.match(line):
-                output.append(re.sub(m2p_sections[0]["re"], m2p_sections[0]["sub"], f"# {output.pop()}"))
-                continue
-            
-
-            if re_h2line.match(line):
-                output.append(re.sub(m2p_sections[1]["re"], m2p_sections[1]["sub"], f"# {output.pop()}"))
-                continue
-            
-            for style in m2p_styles:
-                regexp = style["re"]
-                sub = style["sub"]
-                result = re.sub(regexp, sub, result)
-            
-
-            # 마크다운 링크 [text](url) → 안전한 앵커로 변환 (텍스트도 이스케이프)
-            result = re_md_link.sub(lambda m: f"<a href='{escape_attr(m.group('url'))}'>{escape_line(m.group('text'))}</a>", result)
-
-            # 벌거벗은 URL을 안전하게 감싸기 (이미 링크 포함이면 패스)
-            if not (re_href.search(result) or re_atag.search(result)):
-                for m in re.finditer(re_uri, result):
-                    u = m.group(0)
-                    result = result.replace(u, f"<a href='{escape_attr(u)}'>{escape_line(u)}</a>")
-
-            output.append(result)
-
-        try_close_span()
-
-        self.content_markup = output
@@ -0,0 +1,105 @@
+from gi.repository import Gtk
+
+from .item import Item
+
+
+def message_signature(message):
+    """Cheap identity of a message as rendered: same dict, type, status and content."""
+    content = message.get("content", "")
+    return (
+        id(message),
+        message.get("type"),
+        message.get("status"),
+        hash(content) if isinstance(content, str) else id(content),
+    )
+
+
+class MessageList(Gtk.ListBox):
+    """Realized Item rows for one chat.
+
+    Only the last PAGE_SIZE messages are rendered at first; load_older()
+    prepends earlier pages as the user scrolls up. sync() only rebuilds the
+    rows after the first message that changed, so appending a message or
+    finishing a streamed answer touches one row instead of the whole
+    thread. The window keeps recent instances around and swaps them into
+    the view when switching threads.
+    """
+
+    PAGE_SIZE = 30
+    ROW_COST = 2048  # 위젯 트리 오버헤드 추정치 (텍스트 외)
+
+    def __init__(self, window, chat, **kwargs):
+        super().__init__(**kwargs)
+
+        self.window = window
+        self.chat = chat
+        self.signatures = []
+        self.first_index = None
+        self.cost = 0
+
+        self.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.set_show_separators(False)
+        self.set_hexpand(True)
+        self.set_vexpand(False)
+        self.set_margin_start(5)
+        self.set_margin_end(5)
+        self.add_css_class("message-list")
+        self.add_css_class("background")
+
+    @property
+    def has_older(self):
+        return bool(self.first_index)
+
+    def sync(self):
+        content = self.chat.get("content", [])
+        if self.first_index is None or self.first_index > len(content):
+            # 처음 열 때(또는 앞부분이 삭제되었을 때)는 마지막 페이지만 렌더링
+            self.clear()
+            self.first_index = max(0, len(content) - self.PAGE_SIZE)
+
+        visible = content[self.first_index:]
+        signatures = [message_signature(message) for message in visible]
+
+        keep = 0
+        for old, new in zip(self.signatures, signatures):
+            if old != new:
+                break
+            keep += 1
+
+        # 바뀐 메시지부터 끝까지의 행만 다시 만든다
+        for index in range(len(self.signatures) - 1, keep - 1, -1):
+            self.remove(self.get_row_at_index(index))
+
+        for index, message in enumerate(visible[keep:], keep):
+            self.insert_item(message, index)
+
+        self.signatures = signatures
+        self.update_cost()
+
+    def load_older(self):
+        """Prepend the previous page of messages; returns False if there is none."""
+        if not self.has_older:
+            return False
+        content = self.chat.get("content", [])
+        start = max(0, self.first_index - self.PAGE_SIZE)
+        older = content[start:self.first_index]
+        for index, message in enumerate(older):
+            self.insert_item(message, index)
+        self.signatures = [message_signature(message) for message in older] + self.signatures
+        self.first_index = start
+        self.update_cost()
+        return True
+
+    def insert_item(self, message, position):
+        self.insert(Item(self.window, self.chat, message), position)
+        row = self.get_row_at_index(position)
+        row.set_selectable(False)
+        row.set_activatable(False)
+
+    def clear(self):
+        self.remove_all()
+        self.signatures = []
+
+    def update_cost(self):
+        content = self.chat.get("content", [])[self.first_index or 0:]
+        self.cost = sum(len(str(message.get("content", ""))) + self.ROW_COST for message in content)
@@ -0,0 +1,354 @@
+"""Markdown → render plan conversion for chat messages.
+
+A render plan is a list of ``(kind, value)`` blocks: ``("markup", pango)``
+for text labels, ``("code", source)`` for code blocks and
+``("image", digest)`` for blob images. Building it is pure Python, so it
+can run on worker threads; Item only turns a finished plan into widgets.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MARKUP = "markup"
+CODE_BLOCK = "code"
+IMAGE = "image"
+
+
+
+H1="H1"
+H2="H2"
+H3="H3"
+UL="BULLET"
+OL="LIST"
+CODE="CODE"
+BOLD="BOLD"
+EMPH="EMPH"
+PRE="PRE"
+LINK="LINK"
+m2p_sections = [
+    { "name": H1, "re": re.compile(r"^(#\s+)(.*)(\s*)$"), "sub": r"<big><big><big>\2</big></big></big>" },
+    { "name": H2, "re": re.compile(r"^(##\s+)(.*)(\s*)$"), "sub": r"<big><big>\2</big></big>" },
+    { "name": H3, "re": re.compile(r"^(###\s+)(.*)(\s*)$"), "sub": r"<big>\2</big>" },
+    { "name": UL, "re": re.compile(r"^(\s*[\*\-]\s)(.*)(\s*)$"), "sub": r" • \2" },
+    { "name": OL, "re": re.compile(r"^(\s*[0-9]+\.\s)(.*)(\s*)$"), "sub": r" \1\2" },
+    { "name": CODE, "re": re.compile(r"^```[a-z_]*$"), "sub": "<tt>" },
+]
+
+m2p_styles = [
+    { "name": BOLD, "re": re.compile(r"(^|[^\*])(\*\*)(.*)(\*\*)"), "sub": r"\1<b>\3</b>" },
+    { "name": BOLD, "re": re.compile(r"(\*\*)(.*)(\*\*)([^\*]|$)"), "sub": r"<b>\3</b>\4" },
+    { "name": EMPH, "re": re.compile(r"(^|[^\*])(\*)(.*)(\*)"), "sub": r"\1<i>\3</i>" },
+    { "name": EMPH, "re": re.compile(r"(\*)(.*)(\*)([^\*]|$)"), "sub": r"<i>\3</i>\4" }, 
+    { "name": PRE, "re": re.compile(r"(`)([^`]*)(`)"), "sub": r"<tt>\2</tt>" },
+    # 링크는 아래 안전 처리에서 수행 (href 특수문자 이스케이프)
+]
+
+re_comment = re.compile(r"^\s*<!--.*-->\s*$")
+re_color = re.compile(r"^(\s*<!--\s*(fg|bg)=(#?[0-9a-z_A-Z-]*)\s*((fg|bg)=(#?[0-9a-z_A-Z-]*))?\s*-->\s*)$")
+re_reset = re.compile(r"(<!--\/-->)")
+re_uri = re.compile(r"http[s]?:\/\/[^\s']*")
+re_href = re.compile(r"href='(http[s]?://[^\s]*)'")
+re_atag = re.compile(r"<a\s.*>.*(http[s]?://[^\s]*).*</a>")
+re_h1line = re.compile(r"^===+\s*$")
+re_h2line = re.compile(r"^---+\s*$")
+
+m2p_escapes = [
+    [re.compile(r"<!--.*-->"), ''],
+    [re.compile(r"&"), '&amp;'],
+    [re.compile(r"<"), '&lt;'],
+    [re.compile(r">"), '&gt;'],
+]
+
+
+
+re_md_link = re.compile(r"\[(?P<text>[^\]]+)\]\((?P<url>[^\s)]+)\)")
+re_tag = re.compile(r"<(/?)([a-zA-Z]+)[^>]*?(/?)>")
+
+# 이 크기를 넘는 텍스트는 문단 단위 라벨 여러 개로 나눠 Pango 레이아웃 비용을 나눈다
+CHUNK_SIZE = 4096
+
+
+def escape_line(line):
+    for escape in m2p_escapes:
+        line = re.sub(escape[0], escape[1], line)
+    return line
+
+
+def escape_attr(s: str) -> str:
+    return (
+        s.replace("&", "&amp;")
+         .replace("<", "&lt;")
+         .replace(">", "&gt;")
+         .replace("'", "&apos;")
+         .replace('"', "&quot;")
+    )
+
+
+def convert_to_pango(text):
+    """Convert markdown text to a list of Pango markup lines.
+
+    Fenced code blocks come back as lists of raw source lines.
+    """
+    lines = text.split("\n")
+
+    is_code = False
+    code_lines = []
+
+    output = []
+    color_span_open = False
+    tt_must_close = False
+
+    def try_close_span():
+        nonlocal color_span_open
+        if color_span_open:
+            output.append('</span>')
+            color_span_open = False
+
+    for line in lines:
+        if not is_code:
+            colors = re_color.match(line)
+            if colors or re_reset.match(line):
+                try_close_span()
+
+            if colors:
+                if colors[2] == 'fg':
+                    fg = colors[3]
+                elif colors[5] == 'fg':
+                    fg = colors[6]
+                else:
+                    fg = ""
+
+                if colors[2] == 'bg':
+                    bg = colors[3]
+                elif colors[5] == 'bg':
+                    bg = colors[6]
+                else:
+                    bg = ""
+
+                attrs = ''
+
+                if fg != '':
+                    attrs += f" foreground='{escape_attr(fg)}'"
+
+                if bg != '':
+                    attrs += f" background='{escape_attr(bg)}'"
+
+                if attrs != '':
+                    output.append(f"<span{attrs}>")
+                    color_span_open = True
+
+        if re_comment.match(line):
+            continue
+
+        code_start = False
+
+        if is_code:
+            result = line
+        else:
+            result = escape_line(line)
+
+        for exp in m2p_sections:
+            name = exp["name"]
+            regexp = exp["re"]
+            sub = exp["sub"]
+            if regexp.match(line):
+                if name == CODE:
+                    if not is_code:
+                        code_start = True
+                        is_code = True
+
+                        result = ""
+                    else:
+                        is_code = False
+                        output.append(code_lines)
+                        code_lines = []
+                        if tt_must_close:
+                            result += '</span>'
+                            tt_must_close = False
+                else:
+                    if is_code:
+                        result = line
+                    else:
+                        # 섹션 치환은 이스케이프된 문자열(result)에 적용해야 &/< />가 보존됩니다.
+                        result = re.sub(regexp, sub, result)
+
+        if is_code and not code_start:
+            code_lines.append(result)
+            continue
+
+        if re_h1line.match(line) and output and isinstance(output[-1], str):
+            output.append(re.sub(m2p_sections[0]["re"], m2p_sections[0]["sub"], f"# {output.pop()}"))
+            continue
+
+        if re_h2line.match(line) and output and isinstance(output[-1], str):
+            output.append(re.sub(m2p_sections[1]["re"], m2p_sections[1]["sub"], f"# {output.pop()}"))
+            continue
+
+        for style in m2p_styles:
+            regexp = style["re"]
+            sub = style["sub"]
+            result = re.sub(regexp, sub, result)
+
+        # 마크다운 링크 [text](url) → 안전한 앵커로 변환 (텍스트도 이스케이프)
+        result = re_md_link.sub(lambda m: f"<a href='{escape_attr(m.group('url'))}'>{escape_line(m.group('text'))}</a>", result)
+
+        # 벌거벗은 URL을 안전하게 감싸기 (이미 링크 포함이면 패스)
+        if not (re_href.search(result) or re_atag.search(result)):
+            result = re_uri.sub(lambda m: f"<a href='{escape_attr(m.group(0))}'>{escape_line(m.group(0))}</a>", result)
+
+        output.append(result)
+
+    if is_code and code_lines:
+        # 닫히지 않은 코드 블록(스트리밍 중 등)도 버리지 않는다
+        output.append(code_lines)
+
+    try_close_span()
+
+    return output
+
+
+def balanced_markup(markup):
+    """True if every tag opened in markup is closed in it, in order."""
+    stack = []
+    for closing, tag, self_closing in re_tag.findall(markup):
+        if self_closing:
+            continue
+        if not closing:
+            stack.append(tag)
+        elif not stack or stack.pop() != tag:
+            return False
+    return not stack
+
+
+def split_markup(markup, chunk_size=CHUNK_SIZE):
+    """Split large label markup at paragraph (blank line) boundaries.
+
+    Falls back to line boundaries for text without paragraphs, and to the
+    unsplit markup if a span would end up cut in half.
+    """
+    if len(markup) <= chunk_size:
+        return [markup]
+
+    chunks = []
+    current = []
+    size = 0
+    for line in markup.split("\n"):
+        current.append(line)
+        size += len(line) + 1
+        if size >= chunk_size and (not line.strip() or size >= chunk_size * 2):
+            chunks.append("\n".join(current).strip("\n"))
+            current = []
+            size = 0
+    if current:
+        chunks.append("\n".join(current).strip("\n"))
+
+    chunks = [chunk for chunk in chunks if chunk]
+    if len(chunks) > 1 and not all(balanced_markup(chunk) for chunk in chunks):
+        return [markup]
+    return chunks or [markup]
+
+
+def build_plan(message):
+    """Render plan for a chat message dict."""
+    if message.get("type") == "image" and message.get("blob"):
+        return [(IMAGE, message["blob"])]
+
+    content = message.get("content", "")
+    if not isinstance(content, str):
+        content = str(content)
+
+    plan = []
+
+    def add_markup(markup):
+        plan.extend((MARKUP, chunk) for chunk in split_markup(markup))
+
+    result = ""
+    for line in convert_to_pango(content):
+        if isinstance(line, str):
+            # 닫는 ``` 줄은 인라인 코드 치환을 거쳐 이 표식으로 남는다
+            if line.strip() == "<tt></tt>`":
+                continue
+            result += f"{line}\n"
+        else:
+            if result.strip():
+                add_markup(result)
+            plan.append((CODE_BLOCK, "\n".join(line)))
+            result = ""
+
+    if result.strip() or not plan:
+        add_markup(result)
+    return plan
+
+
+def plan_key(message):
+    content = message.get("content", "")
+    return (message.get("type"), message.get("blob"), content if isinstance(content, str) else str(content))
+
+
+class RenderPlanner:
+    """Computes render plans on a worker pool and keeps recent ones in an LRU.
+
+    deliver(func, *args) must run func on the UI thread (GLib.idle_add);
+    callbacks passed to request() are invoked through it with the plan.
+    """
+
+    def __init__(self, deliver, workers=2, max_plans=512):
+        self.deliver = deliver
+        self.max_plans = max_plans
+        self.plans = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render-plan")
+
+    def get(self, message):
+        """Cached plan for message, or None."""
+        key = plan_key(message)
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.plans.move_to_end(key)
+            return plan
+
+    def plan_now(self, message):
+        """Compute (or fetch) the plan on the calling thread."""
+        plan = self.get(message)
+        if plan is None:
+            plan = build_plan(message)
+            self._store(plan_key(message), plan)
+        return plan
+
+    def request(self, message, callback=None):
+        """Compute the plan in the background; callback(plan) runs via deliver."""
+        key = plan_key(message)
+        plan = self.get(message)
+        if plan is not None:
+            if callback is not None:
+                self.deliver(callback, plan)
+            return
+        with self.lock:
+            if key in self.pending:
+                if callback is not None:
+                    self.pending[key].append(callback)
+                return
+            self.pending[key] = [callback] if callback is not None else []
+        self.pool.submit(self._run, key, dict(message))
+
+    def _run(self, key, message):
+        try:
+            plan = build_plan(message)
+        except Exception:
+            plan = [(MARKUP, escape_line(str(message.get("content", ""))))]
+        self._store(key, plan)
+        with self.lock:
+            callbacks = self.pending.pop(key, [])
+        for callback in callbacks:
+            self.deliver(callback, plan)
+
+    def _store(self, key, plan):
+        with self.lock:
+            self.plans[key] = plan
+            self.plans.move_to_end(key)
+            while len(self.plans) > self.max_plans:
+                self.plans.popitem(last=False)
@@ -0,0 +1,49 @@
+"""Shared GtkSource style scheme for every source view in the app.
+
+One StyleSchemeManager and a single notify::dark handler on the global
+Adw.StyleManager; widgets subscribe instead of connecting their own handler,
+and are dropped automatically once they are finalized.
+"""
+
+import weakref
+
+from gi.repository import Adw, GtkSource
+
+
+class SourceStyleService:
+    def __init__(self):
+        self.manager = GtkSource.StyleSchemeManager.get_default()
+        self.subscribers = weakref.WeakSet()
+        self.style_manager = Adw.StyleManager.get_default()
+        self.style_manager.connect("notify::dark", self._on_dark_changed)
+
+    @property
+    def scheme(self):
+        scheme_id = "Adwaita-dark" if self.style_manager.get_dark() else "Adwaita"
+        return self.manager.get_scheme(scheme_id)
+
+    def subscribe(self, widget):
+        """Call widget.apply_style_scheme(scheme) now and on every theme change."""
+        self.subscribers.add(widget)
+        widget.apply_style_scheme(self.scheme)
+
+    def unsubscribe(self, widget):
+        self.subscribers.discard(widget)
+
+    def _on_dark_changed(self, *args):
+        scheme = self.scheme
+        for widget in list(self.subscribers):
+            try:
+                widget.apply_style_scheme(scheme)
+            except Exception:
+                pass
+
+
+_default = None
+
+
+def get_default():
+    global _default
+    if _default is None:
+        _default = SourceStyleService()
+    return _default
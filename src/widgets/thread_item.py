@@ -1,9 +1,45 @@
-from gi.repository import Gtk, Adw, Gio, GLib
+from gi.repository import Gtk, Adw, Gio, GLib, GObject
 
 from ..constants import app_id, rootdir
 
+
+class ThreadObject(GObject.Object):
+    """List model item for one chat in the sidebar.
+
+    title and starred are mirrored into the chat dict, so rows bound to
+    them and the saved data always agree.
+    """
+
+    __gtype_name__ = "ThreadObject"
+
+    title = GObject.Property(type=str, default="")
+    starred = GObject.Property(type=bool, default=False)
+
+    def __init__(self, chat):
+        super().__init__(title=chat.get("title", ""), starred=chat.get("starred", False))
+        self.chat = chat
+        self.connect("notify::title", self._on_title_changed)
+        self.connect("notify::starred", self._on_starred_changed)
+
+    @property
+    def id(self):
+        return self.chat.get("id")
+
+    def _on_title_changed(self, *args):
+        self.chat["title"] = self.props.title
+
+    def _on_starred_changed(self, *args):
+        self.chat["starred"] = self.props.starred
+
+
 @Gtk.Template(resource_path=f"{rootdir}/ui/thread_item.ui")
 class ThreadItem(Gtk.Box):
+    """Sidebar row widget.
+
+    Rows are created by the list view's factory and recycled: bind() points
+    an existing row at another ThreadObject instead of building a new one.
+    """
+
     __gtype_name__ = "ThreadItem"
 
     label = Gtk.Template.Child()
@@ -11,24 +47,54 @@ class ThreadItem(Gtk.Box):
 
     edit_mode = False
 
-    def __init__(self, parent, chat, **kwargs):
+    def __init__(self, parent, **kwargs):
         super().__init__(**kwargs)
 
-        self.chat = chat
-        self.id = chat["id"]
-        self.label_text = chat["title"]
-        self.is_starred = chat.get("starred", False)
-
-        self.label.set_text(self.label_text)
+        self.thread = None
+        self.chat = {}
+        self.id = None
+        self._bindings = []
+        self._star_handler = 0
+        self.pending_thread = None
 
         self.parent = parent
         self.settings = parent.settings
 
         self.app = self.parent.get_application()
-        self.win = self.app.get_active_window()
+        self.win = self.parent
 
         self.setup()
 
+    def bind(self, thread):
+        self.unbind()
+        self.thread = thread
+        self.chat = thread.chat
+        self.id = thread.id
+        self._bindings.append(
+            thread.bind_property("title", self.label, "text", GObject.BindingFlags.SYNC_CREATE)
+        )
+        self._star_handler = thread.connect("notify::starred", self.update_star)
+        self.update_star()
+
+    def unbind(self):
+        for binding in self._bindings:
+            binding.unbind()
+        self._bindings = []
+        if self.thread is not None and self._star_handler:
+            self.thread.disconnect(self._star_handler)
+        self._star_handler = 0
+        self.thread = None
+        self.chat = {}
+        self.id = None
+
+    @property
+    def label_text(self):
+        return self.thread.props.title if self.thread is not None else ""
+
+    @property
+    def is_starred(self):
+        return self.thread is not None and self.thread.props.starred
+
     def setup(self):
         self.setup_signals()
 
@@ -37,7 +103,22 @@ class ThreadItem(Gtk.Box):
         evk.set_button(3)
         self.add_controller(evk)
 
-        #self.update_star()
+        # 이미 선택된 행을 다시 누르면 선택 변경 신호가 없으므로 직접 연다
+        # (접힌 화면에서 사이드바로 돌아왔다가 같은 스레드를 고르는 경우)
+        click = Gtk.GestureClick.new()
+        click.set_button(1)
+        click.connect("pressed", self.on_pressed)
+        click.connect("released", self.on_released)
+        self.add_controller(click)
+        self._was_selected = False
+
+    def on_pressed(self, *args):
+        self._was_selected = self.thread is not None and self.win.chat is self.chat
+
+    def on_released(self, *args):
+        if self._was_selected:
+            self._was_selected = False
+            self.win.threads_row_activated_cb()
 
     def show_menu(self, gesture, data, x, y):
         self.popover.set_parent(self)
@@ -59,6 +140,8 @@ class ThreadItem(Gtk.Box):
             self.set_accels_for_action(f"app.{name}", shortcuts)
 
     def on_edit_button_clicked(self, *args):
+        # 대화상자가 열린 동안 이 행이 다른 스레드에 재사용될 수 있으므로 대상을 기억해 둔다
+        self.pending_thread = self.thread
         box = Gtk.Box(
                 orientation=Gtk.Orientation.VERTICAL,
                 margin_top=12,
@@ -93,21 +176,21 @@ class ThreadItem(Gtk.Box):
         dialog.present()
         
     def on_edit_response(self, _widget, response):
-        if response == "edit":
-            self.label_text = self.row.get_text()
-            self.chat["title"] = self.label_text
-            self.win.title.set_title(self.label_text)
-            self.label.set_text(self.label_text)
+        thread = self.pending_thread
+        self.pending_thread = None
+        if response == "edit" and thread is not None:
+            thread.props.title = self.row.get_text()
+            if self.win.chat is thread.chat:
+                self.win.title.set_title(thread.props.title)
 
             toast = Adw.Toast()
             toast.set_title(_("Title Edited"))
             self.win.toast_overlay.add_toast(toast)
     def on_star(self, *args):
-        self.is_starred =  not self.is_starred
-        self.update_star()
+        if self.thread is not None:
+            self.thread.props.starred = not self.thread.props.starred
 
-    def update_star(self):
-        self.chat["starred"] = self.is_starred
+    def update_star(self, *args):
         if self.is_starred:
             #self.star_button.set_icon_name("starred-symbolic")
             self.label.set_css_classes(["accent"])
@@ -116,6 +199,7 @@ class ThreadItem(Gtk.Box):
             self.label.set_css_classes([])
 
     def on_delete(self, *args):
+        self.pending_thread = self.thread
 
         dialog = Adw.MessageDialog(
             heading=_("Delete Thread"),
@@ -135,13 +219,11 @@ class ThreadItem(Gtk.Box):
         dialog.present()
 
     def on_delete_response(self, _widget, response):
-        if response == "delete":
-            self.app.data["chats"].remove(self.chat)
-            self.win.load_threads()
+        thread = self.pending_thread
+        self.pending_thread = None
+        if response == "delete" and thread is not None:
+            self.win.remove_thread(thread.chat)
 
             toast = Adw.Toast()
             toast.set_title(_("Thread Deleted"))
             self.win.toast_overlay.add_toast(toast)
-    
-
-